@@ -0,0 +1,106 @@
+import argparse
+import json
+import re
+import time
+from difflib import SequenceMatcher
+import numpy as np
+
+from whisper_segmentor import load_audio_pcm, load_asr_model, group_words_into_sentences, SAMPLE_RATE, ASR_BACKENDS
+
+def _words(result):
+    # 전사 결과의 단어 목록 [{"text", "start", "end"}, ...]
+    return [{"text": w['word'].strip(), "start": w['start'], "end": w['end']}
+            for segment in result.get('segments', []) for w in segment.get('words') or []]
+
+def _normalize(text):
+    return re.sub(r"[^\w]", "", text.lower())
+
+def word_timing_drift(reference, candidate):
+    """
+    두 단어 목록을 정규화한 텍스트로 정렬(difflib)하고, 같은 단어로 짝지어진 단어들의 시작 / 끝 시각 차이(초) 통계
+    match_rate: 기준 단어 중 후보에서 같은 단어로 찾은 비율
+    """
+    matcher = SequenceMatcher(None, [_normalize(w['text']) for w in reference],
+                              [_normalize(w['text']) for w in candidate], autojunk=False)
+    pairs = [(reference[block.a + k], candidate[block.b + k])
+             for block in matcher.get_matching_blocks() for k in range(block.size)]
+    if not pairs:
+        return {"matched": 0, "match_rate": 0.0}
+    start_diff = np.abs([r['start'] - c['start'] for r, c in pairs])
+    end_diff = np.abs([r['end'] - c['end'] for r, c in pairs])
+    return {
+        "matched": len(pairs),
+        "match_rate": len(pairs) / max(len(reference), 1),
+        "start_mean": float(start_diff.mean()),
+        "start_median": float(np.median(start_diff)),
+        "start_p90": float(np.percentile(start_diff, 90)),
+        "end_mean": float(end_diff.mean()),
+        "end_p90": float(np.percentile(end_diff, 90)),
+    }
+
+def benchmark_audio(media_path, models, language=None, reference="openai-whisper"):
+    """
+    한 번 디코딩한 오디오를 각 백엔드로 전사해 처리 시간과 실시간 대비 배수(real-time factor = 처리 시간 / 길이),
+    문장 세그먼트 수, 기준 백엔드 대비 단어 타이밍 차이를 계산 (models: {백엔드 이름: 로드된 모델})
+    """
+    audio = load_audio_pcm(media_path)
+    duration = len(audio) / SAMPLE_RATE
+    report = {"media": media_path, "duration_sec": duration, "backends": {}}
+    words = {}
+    for backend, model in models.items():
+        t0 = time.perf_counter()
+        result = model.transcribe(audio, language=language, word_timestamps=True)
+        elapsed = time.perf_counter() - t0
+        words[backend] = _words(result)
+        report["backends"][backend] = {
+            "sec": elapsed,
+            "rtf": elapsed / max(duration, 1e-9),
+            "words": len(words[backend]),
+            "sentences": len(group_words_into_sentences(words[backend])),
+        }
+    for backend in models:
+        if backend != reference and reference in words:
+            report["backends"][backend]["drift"] = word_timing_drift(words[reference], words[backend])
+    return report
+
+def print_report(report):
+    print(f"\n📊 {report['media']} ({report['duration_sec']:.1f}s)")
+    for backend, result in report["backends"].items():
+        line = (f"  - {backend}: {result['sec']:.2f}s (RTF {result['rtf']:.3f}), "
+                f"단어 {result['words']}개 / 문장 {result['sentences']}개")
+        if "drift" in result:
+            d = result["drift"]
+            if d["matched"]:
+                line += (f", 기준 대비 단어 일치 {d['match_rate']:.1%}, 시작 차이 평균 {d['start_mean']:.3f}s"
+                         f" / p90 {d['start_p90']:.3f}s, 끝 차이 평균 {d['end_mean']:.3f}s")
+            else:
+                line += ", 기준과 일치하는 단어 없음"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--media_paths", nargs="+", required=True, help="비교할 영상 / 오디오 목록")
+    parser.add_argument("--model_size", default="base", help="Whisper 모델 크기 (모든 백엔드 공통)")
+    parser.add_argument("--backends", nargs="+", default=ASR_BACKENDS, choices=ASR_BACKENDS)
+    parser.add_argument("--compute_type", default=None, help="faster-whisper compute_type (기본: CPU int8, GPU float16)")
+    parser.add_argument("--language", default=None, help="언어 고정 (예: ko, en). 지정하지 않으면 백엔드별 자동 감지")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--output_json", default=None, help="결과를 저장할 JSON 경로")
+    args = parser.parse_args()
+
+    # 모델 로딩 시간은 한 번만 들고 영상마다 전사 시간만 측정
+    models = {}
+    for backend in args.backends:
+        t0 = time.perf_counter()
+        models[backend] = load_asr_model(args.model_size, args.device, backend=backend, compute_type=args.compute_type)
+        print(f"📦 {backend} 로딩 {time.perf_counter() - t0:.2f}s")
+
+    reports = []
+    for media_path in args.media_paths:
+        report = benchmark_audio(media_path, models, language=args.language, reference=args.backends[0])
+        print_report(report)
+        reports.append(report)
+
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=4)
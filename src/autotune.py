@@ -0,0 +1,193 @@
+# autotune.py
+# 현재 머신에서 짧은 합성 벤치마크를 돌려 특징 추출 batch_size / 스레드 수와 PGL_SUM 스레드 수를 고르고
+# 프로필(JSON)로 저장. run_pipeline은 이 프로필을 자동으로 읽어 지정하지 않은 값의 기본값으로 사용
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+import torch
+
+from extract_features_module import (load_inception_v3, load_backbone, AdaptedBackbone, _model_cache_dir,
+                                     FEATURE_BACKENDS, FEATURE_BACKBONES)
+from networks.feature_adapter import FeatureAdapter
+from networks.pgl_sum.pgl_sum import PGL_SUM
+from pgl_module import prepare_inference, DEFAULT_ATTENTION_CHUNK
+
+PROFILE_VERSION = 1
+
+# 프로필 위치: VIDEOSUMMARY_TUNE_PROFILE 환경 변수, 없으면 모델 캐시 디렉토리의 tune_profile.json
+def default_profile_path():
+    return os.environ.get("VIDEOSUMMARY_TUNE_PROFILE", os.path.join(_model_cache_dir(), "tune_profile.json"))
+
+# 후보 intra-op 스레드 수: 1, 2, 4, ... (코어 수 이하) + 코어 수
+def default_thread_counts():
+    cores = os.cpu_count() or 1
+    counts = {cores}
+    n = 1
+    while n < cores:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+def apply_thread_settings(num_threads=None, interop_threads=None):
+    """torch intra-op / inter-op 스레드 수 설정. inter-op은 병렬 작업이 한 번이라도 돌면 바꿀 수 없으므로 실패하면 무시"""
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if interop_threads and torch.get_num_interop_threads() != interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            print(f"⚠️ inter-op 스레드 수를 {interop_threads}로 바꿀 수 없어 {torch.get_num_interop_threads()}를 그대로 사용합니다.")
+
+def _timed(fn, min_seconds, min_repeats=2):
+    # 한 번 워밍업 후 min_seconds 이상, min_repeats회 이상 반복한 평균 시간(초)
+    fn()
+    repeats = 0
+    start = time.perf_counter()
+    while repeats < min_repeats or time.perf_counter() - start < min_seconds:
+        fn()
+        repeats += 1
+    return (time.perf_counter() - start) / repeats
+
+def _benchmark_model(device, backbone, backend, num_threads):
+    # 속도만 재므로 경량 백본의 어댑터는 학습된 가중치 대신 같은 크기의 새 어댑터를 사용
+    if backbone == "inception_v3":
+        return load_inception_v3(device, backend=backend, num_threads=num_threads)
+    model = AdaptedBackbone(load_backbone(backbone, device, num_threads=num_threads),
+                            FeatureAdapter(FEATURE_BACKBONES[backbone]["dim"]).eval().to(device)).eval()
+    return torch.compile(model) if backend == "compile" else model
+
+# 한 (intra, inter) 스레드 설정에 대한 벤치마크 (새 프로세스에서 실행: inter-op 스레드 수는 프로세스당 한 번만 설정 가능)
+@torch.no_grad()
+def _benchmark_worker(num_threads, interop_threads, device, backbone, backend, batch_sizes, seq_len, min_seconds,
+                      attention_chunk=DEFAULT_ATTENTION_CHUNK):
+    apply_thread_settings(num_threads, interop_threads)
+    model = _benchmark_model(device, backbone, backend, num_threads)
+    height, width = FEATURE_BACKBONES[backbone]["input_size"]
+
+    feature_results = []
+    for batch_size in batch_sizes:
+        x = torch.randn(batch_size, 3, height, width).to(device).contiguous(memory_format=torch.channels_last)
+        seconds = _timed(lambda: model(x), min_seconds)
+        feature_results.append({"batch_size": batch_size, "frames_per_sec": batch_size / seconds})
+
+    # run_pgl_module과 같은 추론 설정 (query chunk attention, 가중치 미반환)
+    pgl = prepare_inference(PGL_SUM(input_size=1024, output_size=1024, num_segments=4, heads=8,
+                                    fusion="add", pos_enc="absolute").to(device), attention_chunk)
+    x = torch.randn(1, seq_len, 1024).to(device)
+    mask = torch.ones((1, seq_len), dtype=torch.bool).to(device)
+    pgl_seconds = _timed(lambda: pgl(x, mask), min_seconds)
+
+    return {"num_threads": num_threads, "interop_threads": interop_threads,
+            "feature": feature_results, "pgl_sec_per_forward": pgl_seconds}
+
+def calibrate(device="cpu", backbone="inception_v3", backend="eager", batch_sizes=(8, 16, 32, 64),
+              thread_counts=None, interop_counts=(1, 2), seq_len=600, min_seconds=2.0, output_path=None,
+              attention_chunk=DEFAULT_ATTENTION_CHUNK):
+    """
+    스레드 설정 (thread_counts x interop_counts)마다 새 프로세스에서
+    - 특징 추출 모델 (backbone / backend) 을 batch_sizes의 합성 입력으로 추론해 초당 프레임 수
+    - PGL_SUM 순전파 (seq_len행, 1fps 기준 seq_len초 영상, run_pgl_module과 같은 attention_chunk 추론 설정) 시간
+    을 재고, 특징 추출은 처리량이 가장 높은 설정, PGL_SUM은 가장 빠른 스레드 설정을 골라 프로필로 저장
+    """
+    thread_counts = thread_counts or default_thread_counts()
+    output_path = output_path or default_profile_path()
+    ctx = multiprocessing.get_context("spawn")
+
+    results = []
+    for num_threads in thread_counts:
+        for interop_threads in interop_counts:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+                result = executor.submit(_benchmark_worker, num_threads, interop_threads, device, backbone, backend,
+                                         list(batch_sizes), seq_len, min_seconds, attention_chunk).result()
+            best = max(result["feature"], key=lambda r: r["frames_per_sec"])
+            print(f"⏱️ 스레드 {num_threads} / inter-op {interop_threads}: "
+                  f"특징 추출 최고 {best['frames_per_sec']:.1f} fps (batch {best['batch_size']}), "
+                  f"PGL_SUM {result['pgl_sec_per_forward'] * 1000:.1f} ms", flush=True)
+            results.append(result)
+
+    feature_best = max(((r, f) for r in results for f in r["feature"]), key=lambda rf: rf[1]["frames_per_sec"])
+    pgl_best = min(results, key=lambda r: r["pgl_sec_per_forward"])
+    profile = {
+        "version": PROFILE_VERSION,
+        "host": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "device": device,
+        "feature": {
+            "backbone": backbone,
+            "backend": backend,
+            "batch_size": feature_best[1]["batch_size"],
+            "num_threads": feature_best[0]["num_threads"],
+            "interop_threads": feature_best[0]["interop_threads"],
+            "frames_per_sec": feature_best[1]["frames_per_sec"],
+        },
+        "pgl": {
+            "num_threads": pgl_best["num_threads"],
+            "interop_threads": pgl_best["interop_threads"],
+            "seq_len": seq_len,
+            "attention_chunk": attention_chunk or 0,
+            "sec_per_forward": pgl_best["pgl_sec_per_forward"],
+        },
+        "results": results,
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    # 쓰다가 죽거나 동시에 튜닝해도 프로필이 깨지지 않도록 임시 파일에 쓰고 교체
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, output_path)
+    print(f"✅ 튜닝 프로필 저장 완료: {output_path}")
+    return profile
+
+def load_tune_profile(path=None):
+    """저장된 튜닝 프로필 (없거나 읽을 수 없으면 None)"""
+    path = path or default_profile_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 튜닝 프로필({path})을 읽을 수 없어 무시합니다: {e}")
+        return None
+    if profile.get("version") != PROFILE_VERSION:
+        return None
+    return profile
+
+def tuned_settings(profile, section, device, **match):
+    """
+    프로필의 section("feature" / "pgl") 설정. 다른 device나 다른 머신(코어 수)에서 잰 값이거나
+    match(예: backbone=..., backend=...)가 다르면 빈 dict
+    """
+    if not profile or section not in profile:
+        return {}
+    if profile.get("device") != device or profile.get("cpu_count") != os.cpu_count():
+        return {}
+    settings = profile[section]
+    if any(settings.get(key) != value for key, value in match.items()):
+        return {}
+    return settings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--feature_backbone", default="inception_v3", choices=list(FEATURE_BACKBONES))
+    parser.add_argument("--feature_backend", default="eager", choices=FEATURE_BACKENDS)
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[8, 16, 32, 64])
+    parser.add_argument("--threads", type=int, nargs="+", default=None, help="후보 intra-op 스레드 수 (기본: 1, 2, 4, ..., 코어 수)")
+    parser.add_argument("--interop_threads", type=int, nargs="+", default=[1, 2], help="후보 inter-op 스레드 수")
+    parser.add_argument("--seq_len", type=int, default=600, help="PGL_SUM 벤치마크 입력 길이 (1fps 기준 초)")
+    parser.add_argument("--attention_chunk", type=int, default=DEFAULT_ATTENTION_CHUNK, help="PGL_SUM attention chunk 행 수 (run_pipeline --attention_chunk와 같게)")
+    parser.add_argument("--min_seconds", type=float, default=2.0, help="설정당 최소 측정 시간(초)")
+    parser.add_argument("--output", default=None, help="프로필 저장 경로 (기본: VIDEOSUMMARY_TUNE_PROFILE 또는 캐시 디렉토리)")
+    args = parser.parse_args()
+
+    calibrate(device=args.device, backbone=args.feature_backbone, backend=args.feature_backend,
+              batch_sizes=args.batch_sizes, thread_counts=args.threads, interop_counts=args.interop_threads,
+              seq_len=args.seq_len, min_seconds=args.min_seconds, output_path=args.output,
+              attention_chunk=args.attention_chunk)
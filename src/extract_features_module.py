@@ -1,56 +1,462 @@
 import torch
+import torch.nn.functional as F
 import h5py
 import numpy as np
-import torchvision.models as models
-import torchvision.transforms as transforms
 import os
 import json
-from sklearn.decomposition import PCA
+import hashlib
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from sklearn.decomposition import PCA, IncrementalPCA
 from decord import VideoReader, cpu
-from PIL import Image
 from transnetv2 import TransNetV2
+from model_store import load_torchvision_model, transnetv2_model_dir
+from shot_detector import HistogramShotDetector
+from networks.feature_adapter import FeatureAdapter
+from feature_store import FeatureStoreWriter, ExtractionCheckpoint, DEFAULT_COMPRESSION, open_features, load_timestamps, save_transitions, load_transitions, set_transition_threshold
 
-# Inception V3 로드
-def load_inception_v3(device):
-    print("📦 InceptionV3 모델 로딩 중...")
-    model = models.inception_v3(weights="DEFAULT")
+# 특징 추출 백엔드
+#  - "eager": PyTorch fp32 + channels_last
+#  - "compile": eager 모델을 torch.compile
+#  - "onnx": 내보낸 ONNX 그래프를 onnxruntime으로 실행
+#  - "onnx_int8": ONNX 그래프를 onnxruntime 동적 양자화(int8)한 뒤 실행
+FEATURE_BACKENDS = ["eager", "compile", "onnx", "onnx_int8"]
+
+# 특징 백본: 풀링 특징 차원과 입력 크기 (inception_v3 외에는 FeatureAdapter로 1024차원에 맞춰 사용)
+FEATURE_BACKBONES = {
+    "inception_v3": {"dim": 2048, "input_size": (299, 299)},
+    "mobilenet_v3_large": {"dim": 960, "input_size": (224, 224)},
+    "efficientnet_b0": {"dim": 1280, "input_size": (224, 224)},
+}
+
+# 장면 전환 검출 엔진
+#  - "transnetv2": TransNetV2 신경망 (기본값)
+#  - "histogram": 색 히스토그램 + 프레임 차이 기반 고전적 검출기 (shot_detector.HistogramShotDetector, 모델 로딩 없음)
+SCENE_ENGINES = ["transnetv2", "histogram"]
+
+# ONNX 등 변환된 모델을 저장할 캐시 디렉토리
+def _model_cache_dir():
+    cache_dir = os.environ.get("VIDEOSUMMARY_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "videosummary"))
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+class OnnxInceptionV3:
+    """onnxruntime으로 실행하는 InceptionV3 특징 추출기 (torch 모델과 같은 방식으로 호출)"""
+
+    def __init__(self, onnx_path, num_threads=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        out = self.session.run(None, {self.input_name: x.detach().cpu().contiguous().numpy()})[0]
+        return torch.from_numpy(out)
+
+ONNX_OPSET = 17
+
+def _state_dict_digest(model):
+    # 가중치(state_dict 전체: 이름, dtype, shape, 값)의 sha256
+    digest = hashlib.sha256()
+    for name, tensor in sorted(model.state_dict().items()):
+        tensor = tensor.detach().cpu().contiguous()
+        digest.update(f"{name}:{tensor.dtype}:{tuple(tensor.shape)}".encode())
+        digest.update(tensor.numpy().tobytes())
+    return digest.hexdigest()
+
+def _onnx_cache_key(model, input_shape):
+    # 가중치 / torch, torchvision 버전 / opset / 입력 크기가 하나라도 바뀌면 다른 파일로 다시 내보냄
+    import torchvision
+    digest = hashlib.sha256(json.dumps({
+        "weights": _state_dict_digest(model), "torch": torch.__version__, "torchvision": torchvision.__version__,
+        "opset": ONNX_OPSET, "input_shape": list(input_shape)}, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+# InceptionV3를 ONNX로 내보냄 (같은 가중치 / 버전으로 내보낸 파일이 있으면 재사용), int8=True면 동적 양자화 버전까지 생성
+def export_inception_onnx(model, int8=False, cache_dir=None):
+    cache_dir = cache_dir or _model_cache_dir()
+    input_shape = (1, 3, 299, 299)
+    key = _onnx_cache_key(model, input_shape)
+    onnx_path = os.path.join(cache_dir, f"inception_v3.{key}.onnx")
+    if not os.path.exists(onnx_path):
+        print(f"📦 InceptionV3 ONNX 내보내는 중... ({onnx_path})")
+        dummy = torch.randn(*input_shape)
+        _write_atomic(onnx_path, lambda tmp: torch.onnx.export(
+            model.cpu(), dummy, tmp, input_names=["frames"], output_names=["features"],
+            dynamic_axes={"frames": {0: "batch"}, "features": {0: "batch"}}, opset_version=ONNX_OPSET))
+    if not int8:
+        return onnx_path
+
+    int8_path = os.path.join(cache_dir, f"inception_v3.{key}.int8.onnx")
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        print(f"📦 InceptionV3 ONNX int8 동적 양자화 중... ({int8_path})")
+        _write_atomic(int8_path, lambda tmp: quantize_dynamic(onnx_path, tmp, weight_type=QuantType.QUInt8))
+    return int8_path
+
+# 같은 디렉토리의 프로세스별 임시 파일에 쓴 뒤 os.replace로 교체
+# 동시에 내보내는 워커가 반쯤 쓰인 파일을 읽거나, 중단된 내보내기가 캐시 키 아래에 깨진 파일을 남기지 않도록 함
+def _write_atomic(path, write_fn):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write_fn(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+# fc를 제거한 InceptionV3 (torch 모델)
+def _inception_v3_backbone():
+    model = load_torchvision_model("inception_v3")
     model.fc = torch.nn.Identity()
-    return model.to(device).eval()
+    return model.eval()
+
+# Inception V3 로드
+# num_threads: torch 백엔드는 torch.set_num_threads, onnx 백엔드는 intra-op 스레드 수로 사용
+def load_inception_v3(device, backend="eager", num_threads=None):
+    print(f"📦 InceptionV3 모델 로딩 중... (backend: {backend})")
+    if backend not in FEATURE_BACKENDS:
+        raise ValueError(f"지원하지 않는 backend입니다: {backend} (지원: {FEATURE_BACKENDS})")
+    model = _inception_v3_backbone()
+
+    if backend in ("onnx", "onnx_int8"):
+        onnx_path = export_inception_onnx(model, int8=(backend == "onnx_int8"))
+        return OnnxInceptionV3(onnx_path, num_threads=num_threads)
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    model = model.to(device).to(memory_format=torch.channels_last)
+    if backend == "compile":
+        model = torch.compile(model)
+    return model
+
+# 분류기를 떼어 낸 경량 백본 (풀링 특징 반환, input_size 속성으로 입력 크기를 알려줌)
+def load_backbone(name, device, num_threads=None):
+    print(f"📦 {name} 백본 로딩 중...")
+    if name in ("mobilenet_v3_large", "efficientnet_b0"):
+        model = load_torchvision_model(name)
+    else:
+        raise ValueError(f"지원하지 않는 백본입니다: {name} (지원: {list(FEATURE_BACKBONES)})")
+    model.classifier = torch.nn.Identity()
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    model = model.eval().to(device).to(memory_format=torch.channels_last)
+    model.input_size = FEATURE_BACKBONES[name]["input_size"]
+    return model
+
+class AdaptedBackbone(torch.nn.Module):
+    """경량 백본 + FeatureAdapter: 프레임을 바로 1024차원(InceptionV3 + PCA 공간) 특징으로 변환"""
+
+    def __init__(self, backbone, adapter):
+        super().__init__()
+        self.backbone = backbone
+        self.adapter = adapter
+        self.input_size = backbone.input_size
+
+    def forward(self, x):
+        return self.adapter(self.backbone(x))
+
+# 학습된 어댑터 체크포인트({"backbone", "in_size", "out_size", "state_dict"})로 백본 + 어댑터 구성
+def load_adapted_backbone(adapter_path, device, num_threads=None):
+    checkpoint = torch.load(adapter_path, map_location=device)
+    adapter = FeatureAdapter(checkpoint["in_size"], out_size=checkpoint["out_size"])
+    adapter.load_state_dict(checkpoint["state_dict"])
+    backbone = load_backbone(checkpoint["backbone"], device, num_threads=num_threads)
+    return AdaptedBackbone(backbone, adapter.eval().to(device)).eval()
+
+# 어댑터 체크포인트의 기본 위치: 요약 모델 체크포인트와 같은 디렉토리
+def default_adapter_path(ckpt_path, backbone):
+    return os.path.join(os.path.dirname(os.path.abspath(ckpt_path)), f"feature_adapter_{backbone}.pt")
+
+# 특징 추출 모델 로드
+# backbone이 inception_v3면 load_inception_v3 (2048-d, 이후 PCA), 그 외에는 adapter_path의 어댑터를 붙여 1024-d를 바로 출력
+# 경량 백본은 eager / compile 백엔드만 지원
+def load_feature_model(device, backbone="inception_v3", backend="eager", num_threads=None, adapter_path=None):
+    if backbone == "inception_v3":
+        return load_inception_v3(device, backend=backend, num_threads=num_threads)
+    if backend not in ("eager", "compile"):
+        raise ValueError(f"{backbone} 백본은 eager / compile 백엔드만 지원합니다: {backend}")
+    if adapter_path is None or not os.path.exists(adapter_path):
+        raise FileNotFoundError(f"{backbone} 백본용 어댑터 파일이 없습니다: {adapter_path} (train_feature_adapter.py로 학습)")
+    model = load_adapted_backbone(adapter_path, device, num_threads=num_threads)
+    if backend == "compile":
+        model = torch.compile(model)
+    return model
+
+# 모델 입력 크기 (load_feature_model 결과의 input_size, 없으면 InceptionV3 크기)
+def _model_input_size(model):
+    return getattr(model, "input_size", FEATURE_BACKBONES["inception_v3"]["input_size"])
+
+# 백그라운드 스레드에서 iterator를 돌려 bounded queue로 넘겨주는 제너레이터 (디코딩과 추론을 겹치기 위함)
+def _prefetch(iterator, max_prefetch=2):
+    buffer = queue.Queue(maxsize=max_prefetch)
+    stop_event = threading.Event()
+    end_marker = object()
+
+    def put(item):
+        while not stop_event.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+        except Exception as e:
+            put(e)
+        put(end_marker)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is end_marker:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # 소비 측에서 중단된 경우에도 producer가 put에서 멈추지 않도록 정리
+        stop_event.set()
+        thread.join()
+
+# InceptionV3 입력 정규화 상수 (ToTensor의 /255를 합쳐 uint8 스케일로 보관)
+_INCEPTION_MEAN = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1) * 255
+_INCEPTION_STD = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1) * 255
+
+# uint8 NHWC 프레임 배치를 InceptionV3 입력 텐서로 변환 (리사이즈 -> float -> 정규화, 배치 단위)
+# PIL 객체를 만들지 않고, 리사이즈를 uint8에서 먼저 수행해 원본 해상도의 float 사본을 만들지 않음
+# 결과는 channels_last 메모리 배치 그대로 반환 (eager 백엔드가 추가 복사 없이 사용)
+def preprocess_frames(frames, size=(299, 299)):
+    x = torch.from_numpy(frames).permute(0, 3, 1, 2)  # channels_last 뷰, 복사 없음
+    if tuple(x.shape[-2:]) != tuple(size):
+        x = F.interpolate(x, size=size, mode="bilinear", align_corners=False, antialias=True)
+    x = x.float()
+    return x.sub_(_INCEPTION_MEAN).div_(_INCEPTION_STD)
+
+class StaticFrameFilter:
+    """직전에 실제로 추론한 프레임과 거의 같은 프레임을 골라냄 (강의, 화면 녹화 등 정지 구간용)
+    32x32 흑백 썸네일의 평균 절대 차이(0~255)가 threshold 이하이면 중복으로 보고 이전 특징을 재사용"""
+
+    thumb_size = (32, 32)
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.num_inferred = 0
+        self.num_skipped = 0
+        self._last_thumb = None
+
+    def select(self, frames):
+        """frames(uint8 NHWC) 중 추론할 위치 목록과, 각 프레임이 사용할 추론 결과 번호(전체 기준) 목록을 반환"""
+        thumbs = _resize_frames(frames, self.thumb_size).astype(np.float32).mean(axis=3)
+        keep, refs = [], []
+        for i, thumb in enumerate(thumbs):
+            if self._last_thumb is not None and np.abs(thumb - self._last_thumb).mean() <= self.threshold:
+                self.num_skipped += 1
+            else:
+                self._last_thumb = thumb
+                self.num_inferred += 1
+                keep.append(i)
+            refs.append(self.num_inferred - 1)
+        return keep, refs
+
+    def report(self):
+        total = self.num_inferred + self.num_skipped
+        print(f"⏭️ 정적 프레임 건너뜀: {self.num_skipped}/{total} 프레임 (추론 {self.num_inferred}회)")
+
+# 샘플링된 프레임 인덱스를 chunk 단위(get_batch)로 디코딩 + 전처리
+# frame_filter가 있으면 중복 프레임은 전처리/추론 대상에서 빼고, 각 프레임이 참조할 추론 결과 번호(refs)를 함께 넘김
+def _iter_frame_batches(vr, frame_idxs, chunk_size, frame_filter=None, input_size=(299, 299)):
+    for start in range(0, len(frame_idxs), chunk_size):
+        idxs = frame_idxs[start:start + chunk_size]
+        frames = vr.get_batch(idxs).asnumpy()
+        if frame_filter is None:
+            yield idxs, preprocess_frames(frames, input_size), None
+            continue
+        keep, refs = frame_filter.select(frames)
+        yield idxs, (preprocess_frames(frames[keep], input_size) if keep else None), refs
+
+# decode_size=(height, width)를 주면 디코더 단계에서 바로 축소해서 받음 (4K 원본을 통째로 디코딩하지 않음)
+# num_threads: 디코더 스레드 수 (0이면 decord 기본값)
+def _open_video_reader(video_path, decode_size=None, num_threads=0):
+    if decode_size is None:
+        return VideoReader(video_path, ctx=cpu(0), num_threads=num_threads)
+    height, width = decode_size
+    return VideoReader(video_path, ctx=cpu(0), width=width, height=height, num_threads=num_threads)
+
+# 목표 인덱스를 max_offset 프레임 이내의 가장 가까운 키프레임으로 옮김 (GOP 중간 프레임까지 디코딩하지 않도록)
+# 허용 범위 안에 키프레임이 없으면 원래 인덱스를 그대로 사용
+def _snap_to_keyframes(frame_idxs, key_idxs, max_offset):
+    if len(key_idxs) == 0 or len(frame_idxs) == 0:
+        return list(frame_idxs)
+    keys = np.sort(np.asarray(key_idxs))
+    targets = np.asarray(frame_idxs)
+    pos = np.searchsorted(keys, targets)
+    left = keys[np.clip(pos - 1, 0, len(keys) - 1)]
+    right = keys[np.clip(pos, 0, len(keys) - 1)]
+    nearest = np.where(np.abs(targets - left) <= np.abs(right - targets), left, right)
+    snapped = np.where(np.abs(nearest - targets) <= max_offset, nearest, targets)
+    return snapped.tolist()
+
+class _FeatureCollector:
+    """배치별 추론 결과를 샘플 프레임 순서의 행으로 정리 (StaticFrameFilter 참조 해소)
+    writer가 있으면 행을 바로 디스크에 추가하고, 없으면 메모리에 모아 둠"""
+
+    def __init__(self, writer=None):
+        self.writer = writer
+        self._rows = []
+        self._timestamps = []
+        self._num_inferred = 0
+        self._last_row = None
+
+    def add(self, batch_feats, refs, timestamps):
+        # refs가 None이면 batch_feats가 샘플 프레임과 1:1
+        if refs is None:
+            rows = batch_feats
+        else:
+            # 중복 프레임은 이번 배치의 추론 결과 또는 그 직전에 추론한 행만 참조함
+            base = self._num_inferred
+            pool = batch_feats if batch_feats is not None else np.zeros((0, self._last_row.shape[0]), dtype=self._last_row.dtype)
+            if self._last_row is not None:
+                pool = np.concatenate([self._last_row[np.newaxis], pool])
+                base -= 1
+            rows = pool[np.asarray(refs) - base]
+        if batch_feats is not None and len(batch_feats) > 0:
+            self._num_inferred += len(batch_feats)
+            self._last_row = batch_feats[-1]
+        if self.writer is not None:
+            self.writer.append(rows, timestamps)
+        else:
+            self._rows.append(rows)
+            self._timestamps.append(np.asarray(timestamps, dtype=np.float64))
+
+    def result(self):
+        """(features, timestamps). writer로 저장한 경우 features는 None"""
+        if self.writer is not None:
+            return None, None
+        return np.concatenate(self._rows, axis=0), np.concatenate(self._timestamps)
 
 # 특징 추출 batch_size를 늘리면 훨씬 속도가 빨라질것 2^n 값으로 유지
-def extract_features(video_path, model, device, batch_size=32):
+# prefetch: 디코딩 스레드가 미리 준비해 둘 배치 수 (0이면 추론 스레드에서 직접 디코딩)
+# sampling: "uniform"(정확히 1초 간격) 또는 "keyframe"(keyframe_tolerance초 이내면 가장 가까운 키프레임 사용)
+# projection: load_pca_projection 결과를 주면 배치마다 바로 1024차원으로 투영해서 반환
+# static_threshold: StaticFrameFilter 기준값. 지정하면 직전 추론 프레임과 거의 같은 프레임은 추론하지 않고 특징을 재사용
+# writer: FeatureStoreWriter를 주면 특징 행을 배치마다 바로 디스크에 추가 (이때 반환되는 features는 None)
+# return_timestamps=True면 (features, 각 행의 시간(초)) 반환
+def extract_features(video_path, model, device, batch_size=32, prefetch=2,
+                     decode_size=(299, 299), sampling="uniform", keyframe_tolerance=0.5, projection=None,
+                     static_threshold=None, writer=None, return_timestamps=False):
     print("🎞️ 프레임 특징 추출 중... (Decord + 배치 처리, 메모리 최적화)")
-    ctx = cpu(0)
-    vr = VideoReader(video_path, ctx=ctx)
+    vr = _open_video_reader(video_path, decode_size)
     fps = vr.get_avg_fps()
     print(f"📌 평균 FPS: {fps}")
+    frame_idxs = _sample_frame_idxs(vr, sampling, keyframe_tolerance)
+
+    frame_filter = StaticFrameFilter(static_threshold) if static_threshold is not None else None
+    collector = _FeatureCollector(writer)
+    _infer_sampled_frames(vr, frame_idxs, model, device, collector, batch_size, prefetch, projection, frame_filter)
+
+    if frame_filter is not None:
+        frame_filter.report()
+    features, timestamps = collector.result()
+    if return_timestamps:
+        return features, timestamps
+    return features
+
+# 1초 간격 샘플 프레임 인덱스 (sampling: extract_features 참고)
+def _sample_frame_idxs(vr, sampling="uniform", keyframe_tolerance=0.5):
+    fps = vr.get_avg_fps()
     frame_idxs = list(range(0, len(vr), int(round(fps))))
+    if sampling == "keyframe":
+        snapped = _snap_to_keyframes(frame_idxs, vr.get_key_indices(), int(round(fps * keyframe_tolerance)))
+        moved = sum(a != b for a, b in zip(frame_idxs, snapped))
+        print(f"🔑 키프레임 샘플링: {moved}/{len(frame_idxs)} 프레임을 키프레임으로 대체")
+        frame_idxs = snapped
+    elif sampling != "uniform":
+        raise ValueError(f"지원하지 않는 sampling 방식입니다: {sampling}")
+    return frame_idxs
 
-    transform = transforms.Compose([
-        transforms.Resize((299, 299)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                             std=[0.229, 0.224, 0.225]),
-    ])
+# frame_idxs 프레임을 batch_size 단위로 디코딩/추론하여 collector에 추가
+def _infer_sampled_frames(vr, frame_idxs, model, device, collector, batch_size=32, prefetch=2,
+                          projection=None, frame_filter=None):
+    fps = vr.get_avg_fps()
+    total_frames = len(vr)
+    batches = _iter_frame_batches(vr, frame_idxs, batch_size, frame_filter, _model_input_size(model))
+    if prefetch > 0:
+        batches = _prefetch(batches, max_prefetch=prefetch)
 
-    feats = []
-    batch = []
-    for i, idx in enumerate(frame_idxs):
-        frame = vr[idx].asnumpy()
-        img = Image.fromarray(frame)
-        batch.append(transform(img))
+    for idxs, tensor_batch, batch_refs in batches:
+        batch_feats = None
+        if tensor_batch is not None:
+            with torch.inference_mode():
+                batch_feats = _project(model(tensor_batch.to(device)), projection).cpu().numpy()
+        collector.add(batch_feats, batch_refs, np.asarray(idxs) / fps)
 
         # ✅ 프레임 처리 진행 상황 출력
-        print(f"📸 처리 중... {idx}/{len(vr)} 프레임", flush=True)
+        print(f"📸 처리 중... {idxs[-1]}/{total_frames} 프레임", flush=True)
+
+# 샤드 worker 프로세스마다 한 번만 로드한 모델
+_shard_model = None
+
+def _init_shard_worker(device, backend, num_threads, backbone="inception_v3", adapter_path=None):
+    global _shard_model
+    torch.set_num_threads(num_threads)
+    _shard_model = load_feature_model(device, backbone=backbone, backend=backend, num_threads=num_threads,
+                                      adapter_path=adapter_path)
+
+def _extract_shard(video_path, frame_idxs, device, decode_size, batch_size, pca_path, static_threshold, num_threads):
+    vr = _open_video_reader(video_path, decode_size, num_threads=num_threads)
+    projection = load_pca_projection(pca_path, device) if pca_path is not None else None
+    frame_filter = StaticFrameFilter(static_threshold) if static_threshold is not None else None
+    collector = _FeatureCollector()
+    _infer_sampled_frames(vr, frame_idxs, _shard_model, device, collector, batch_size,
+                          projection=projection, frame_filter=frame_filter)
+    if frame_filter is not None:
+        frame_filter.report()
+    return collector.result()
 
-        if len(batch) == batch_size or i == len(frame_idxs) - 1:
-            tensor_batch = torch.stack(batch).to(device)
-            with torch.no_grad():
-                batch_feats = model(tensor_batch).cpu().numpy()
-                feats.append(batch_feats)
-            batch = []
+# 샘플 프레임을 시간순으로 num_shards개 구간으로 나눠 각각 별도 프로세스에서 디코딩 + 추론한 뒤 순서대로 이어 붙임
+# 작은 배치에서는 한 프로세스의 intra-op 스레드를 늘려도 잘 빨라지지 않으므로, 코어를 샤드 프로세스로 나눠 씀
+# num_threads: 샤드당 torch/디코더 스레드 수 (None이면 CPU 코어 수 / num_shards)
+# pca_path: 고정 투영 파일. 주면 각 샤드에서 바로 1024차원으로 투영
+# backbone / adapter_path: load_feature_model 참고
+# 반환값: (features, timestamps)
+def extract_features_sharded(video_path, num_shards, device="cpu", backend="eager", num_threads=None,
+                             batch_size=32, decode_size=(299, 299), sampling="uniform", keyframe_tolerance=0.5,
+                             pca_path=None, static_threshold=None, backbone="inception_v3", adapter_path=None):
+    vr = _open_video_reader(video_path, decode_size)
+    frame_idxs = _sample_frame_idxs(vr, sampling, keyframe_tolerance)
+    del vr
+    num_shards = max(1, min(num_shards, len(frame_idxs)))
+    num_threads = num_threads or max(1, (os.cpu_count() or 1) // num_shards)
+    bounds = np.linspace(0, len(frame_idxs), num_shards + 1).astype(int)
+    shards = [frame_idxs[bounds[i]:bounds[i + 1]] for i in range(num_shards)]
+    print(f"🧩 특징 추출 샤드 {num_shards}개 (샤드당 {len(shards[0])}프레임 내외, 스레드 {num_threads}개)")
+    # ONNX 파일은 부모 프로세스에서 한 번만 내보내고, 워커는 캐시된 파일을 로드만 함
+    if backbone == "inception_v3" and backend in ("onnx", "onnx_int8"):
+        export_inception_onnx(_inception_v3_backbone(), int8=(backend == "onnx_int8"))
 
-    return np.concatenate(feats, axis=0)
+    # fork는 이미 초기화된 torch/decord 스레드 상태를 물려받으므로 spawn 사용
+    with ProcessPoolExecutor(max_workers=num_shards, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_shard_worker,
+                             initargs=(device, backend, num_threads, backbone, adapter_path)) as executor:
+        futures = [executor.submit(_extract_shard, video_path, shard, device, decode_size, batch_size,
+                                   pca_path, static_threshold, num_threads) for shard in shards]
+        results = [future.result() for future in futures]
+    features = np.concatenate([feats for feats, _ in results], axis=0)
+    timestamps = np.concatenate([ts for _, ts in results])
+    return features, timestamps
 
 # PCA 적용
 def apply_pca(features, max_components=1024):
@@ -64,20 +470,341 @@ def apply_pca(features, max_components=1024):
         pca_features = np.pad(pca_features, ((0, 0), (0, max_components - n_components)))
     return pca_features
 
-# 특징 저장
-def save_to_h5(features, output_h5):
-    os.makedirs(os.path.dirname(output_h5), exist_ok=True)
-    with h5py.File(output_h5, "w") as hf:
-        hf.create_dataset("features", data=features)
+# IncrementalPCA 학습 (고정 투영이 없을 때의 대체 경로)
+# rows는 numpy 배열 또는 h5 데이터셋 (h5면 batch_rows 구간만 읽으므로 전체 행렬을 메모리에 올리지 않음)
+# 반환값: (ipca, 배치 행 수). 행이 2개 미만이면 ipca는 None
+def _fit_incremental_pca(rows, max_components=1024, batch_rows=4096):
+    n_samples = rows.shape[0]
+    n_components = min(n_samples, rows.shape[1], max_components)
+    step = max(batch_rows, n_components)
+    if n_samples < 2:
+        return None, step
+    ipca = IncrementalPCA(n_components=n_components)
+    # partial_fit 배치는 n_components 행 이상이어야 하므로 마지막 자투리는 앞 배치에 합침
+    bounds = list(range(0, n_samples, step)) + [n_samples]
+    if len(bounds) > 2 and bounds[-1] - bounds[-2] < n_components:
+        bounds.pop(-2)
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        ipca.partial_fit(rows[start:stop])
+    return ipca, step
+
+def _incremental_pca_transform(ipca, rows, max_components=1024):
+    if ipca is None:
+        return np.asarray(rows)
+    pca_features = ipca.transform(rows)
+    if ipca.n_components_ < max_components:
+        pca_features = np.pad(pca_features, ((0, 0), (0, max_components - ipca.n_components_)))
+    return pca_features
+
+# IncrementalPCA 적용 (메모리에 있는 특징, 샤드 추출 경로)
+def apply_incremental_pca(features, max_components=1024, batch_rows=4096):
+    if features.shape[0] < 2:
+        return features
+    ipca, step = _fit_incremental_pca(features, max_components, batch_rows)
+    return np.concatenate([_incremental_pca_transform(ipca, features[start:start + step], max_components)
+                           for start in range(0, features.shape[0], step)])
+
+# IncrementalPCA 적용 (디스크의 특징 저장소 → output_h5)
+# raw_h5의 투영 전 특징을 batch_rows 구간씩 읽어 partial_fit 하고, 다시 구간씩 변환해 바로 output_h5에 추가
+def apply_incremental_pca_h5(raw_h5, output_h5, max_components=1024, batch_rows=4096, dtype="float32",
+                             compression=DEFAULT_COMPRESSION):
+    timestamps = load_timestamps(raw_h5)
+    with open_features(raw_h5) as rows, \
+            FeatureStoreWriter(output_h5, dtype=dtype, compression=compression) as writer:
+        ipca, step = _fit_incremental_pca(rows, max_components, batch_rows)
+        for start in range(0, rows.shape[0], step):
+            writer.append(_incremental_pca_transform(ipca, rows[start:start + step], max_components),
+                          timestamps[start:start + step])
+
+# 오프라인에서 코퍼스로 학습한 고정 PCA 투영 로드 (.npz: mean [D], components [K, D])
+# 반환값 (weight [D, K], bias [K])로 features @ weight - bias 한 번에 투영
+def load_pca_projection(path, device="cpu"):
+    data = np.load(path)
+    weight = torch.from_numpy(data["components"]).float().t().contiguous().to(device)
+    bias = torch.from_numpy(data["mean"]).float().to(device) @ weight
+    return weight, bias
+
+def _project(feats, projection):
+    if projection is None:
+        return feats
+    weight, bias = projection
+    return torch.addmm(-bias, feats, weight)
+
+# 고정 투영 파일의 기본 위치: 체크포인트와 같은 디렉토리
+def default_pca_path(ckpt_path):
+    return os.path.join(os.path.dirname(os.path.abspath(ckpt_path)), "inception_pca_1024.npz")
+
+# 추출된 특징을 1024차원으로 축소 (fixed 투영 / adapter는 추출 단계에서 이미 1024차원)
+def reduce_features(features, pca_mode):
+    if pca_mode in ("fixed", "adapter"):
+        return features
+    if pca_mode == "incremental":
+        return apply_incremental_pca(features)
+    return apply_pca(features)
+
+# 특징 저장 (시간축 chunk, 행별 timestamps 포함)
+def save_to_h5(features, output_h5, timestamps=None, sample_rate=1.0, dtype="float32", chunk_rows=256,
+               compression=DEFAULT_COMPRESSION):
+    with FeatureStoreWriter(output_h5, dtype=dtype, chunk_rows=chunk_rows, sample_rate=sample_rate,
+                            compression=compression) as writer:
+        for start in range(0, features.shape[0], chunk_rows):
+            writer.append(features[start:start + chunk_rows],
+                          None if timestamps is None else timestamps[start:start + chunk_rows])
+
+# 장면 전환 엔진별 스트리밍 검출기 (push / take_predictions / finish, start_frame으로 체크포인트 재개)
+def _make_scene_stream(engine, total_frames=None, start_frame=0):
+    if engine == "transnetv2":
+        print("🎬 TransNetV2로 장면 전환 감지 중...")
+        return TransNetV2Stream(TransNetV2(model_dir=transnetv2_model_dir()), total_frames=total_frames, start_frame=start_frame)
+    if engine == "histogram":
+        print("🎬 히스토그램 검출기로 장면 전환 감지 중...")
+        return HistogramShotDetector(total_frames=total_frames, start_frame=start_frame)
+    raise ValueError(f"지원하지 않는 scene engine입니다: {engine} (지원: {SCENE_ENGINES})")
 
 # TransNetV2를 이용한 장면 전환 감지
-def detect_scenes_transnetv2(video_path, threshold=0.5):
-    print("🎬 TransNetV2로 장면 전환 감지 중...")
-    model = TransNetV2()
-    video_frames, single_frame_predictions, _ = model.predict_video(video_path)
-    scene_changes = np.where(single_frame_predictions > threshold)[0]
+def detect_scenes_transnetv2(video_path, threshold=0.5, chunk_size=256, prefetch=2, return_predictions=False):
+    return detect_scenes(video_path, threshold, engine="transnetv2", chunk_size=chunk_size, prefetch=prefetch,
+                         return_predictions=return_predictions)
+
+# 장면 전환 감지
+# predict_video처럼 영상 전체를 메모리에 올리지 않고, 48x27로 chunk_size 프레임씩 디코딩해 검출기에 흘려보냄
+# return_predictions=True면 (scene_changes, total_frames, single_frame_pred, all_frames_pred) 반환
+def detect_scenes(video_path, threshold=0.5, engine="transnetv2", chunk_size=256, prefetch=2, return_predictions=False):
+    vr = _open_video_reader(video_path, (27, 48))
+    total_frames = len(vr)
+    stream = _make_scene_stream(engine, total_frames=total_frames)
+    chunks = (vr.get_batch(list(range(start, min(start + chunk_size, total_frames)))).asnumpy()
+              for start in range(0, total_frames, chunk_size))
+    if prefetch > 0:
+        chunks = _prefetch(chunks, max_prefetch=prefetch)
+    for frames in chunks:
+        stream.push(frames)
+    single_frame_predictions, all_frames_predictions = stream.finish()
+    scene_changes = _threshold_scenes(single_frame_predictions, threshold)
     print(f"✅ {len(scene_changes)}개의 장면 전환점 검출 완료")
-    return scene_changes.tolist(), video_frames.shape[0]
+    if return_predictions:
+        return scene_changes, total_frames, single_frame_predictions, all_frames_predictions
+    return scene_changes, total_frames
+
+# 프레임별 전환 확률 -> 장면 전환 프레임 인덱스
+def _threshold_scenes(single_frame_predictions, threshold):
+    return np.where(np.asarray(single_frame_predictions) > threshold)[0].tolist()
+
+# uint8 NHWC 프레임 배치를 size=(H, W)로 축소
+def _resize_frames(frames, size):
+    x = torch.from_numpy(frames).permute(0, 3, 1, 2)
+    x = F.interpolate(x, size=size, mode="bilinear", align_corners=False, antialias=True)
+    return x.permute(0, 2, 3, 1).contiguous().numpy()
+
+class TransNetV2Stream:
+    """TransNetV2.predict_frames와 동일한 윈도우(100프레임, 앞뒤 25프레임 문맥, stride 50)를
+    프레임이 들어오는 대로 처리한다. 전체 프레임을 메모리에 올리지 않는다.
+    start_frame(stride의 배수)을 주면 체크포인트에서 이어서 예측: 이때 push는 start_frame - context 프레임부터 시작"""
+
+    window, context, stride = 100, 25, 50
+
+    def __init__(self, model, total_frames=None, start_frame=0):
+        if start_frame % self.stride != 0:
+            raise ValueError(f"start_frame({start_frame})은 {self.stride}의 배수여야 합니다.")
+        self.model = model
+        self.total_frames = total_frames
+        self.start_frame = start_frame
+        self.num_frames = 0
+        # 재개 시 앞쪽 context 프레임은 문맥으로만 쓰이고 예측 대상이 아님
+        self._lead = self.context if start_frame else 0
+        self._taken = 0
+        self._buffer = None
+        self._single = []
+        self._all = []
+
+    def push(self, frames):
+        if len(frames) == 0:
+            return
+        if self._buffer is None and self.start_frame == 0:
+            # 첫 윈도우는 첫 프레임 복사본으로 앞쪽을 채움
+            self._buffer = np.concatenate([np.repeat(frames[:1], self.context, axis=0), frames])
+        elif self._buffer is None:
+            self._buffer = frames
+        else:
+            self._buffer = np.concatenate([self._buffer, frames])
+        self.num_frames += len(frames)
+        self._drain()
+
+    def _drain(self):
+        while len(self._buffer) >= self.window:
+            single_frame_pred, all_frames_pred = self.model.predict_raw(self._buffer[np.newaxis, :self.window])
+            self._single.append(single_frame_pred.numpy()[0, self.context:self.context + self.stride, 0])
+            self._all.append(all_frames_pred.numpy()[0, self.context:self.context + self.stride, 0])
+            self._buffer = self._buffer[self.stride:]
+            total = self.total_frames or self.start_frame + self.num_frames - self._lead
+            done = self.start_frame + self._taken + len(self._single) * self.stride
+            print(f"[TransNetV2] Processing video frames {min(done, total)}/{total}", flush=True)
+
+    def take_predictions(self):
+        """지금까지 확정된 예측 중 아직 가져가지 않은 (single, all)을 반환 (체크포인트 커밋용)"""
+        if not self._single:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+        single_frame_pred = np.concatenate(self._single)
+        all_frames_pred = np.concatenate(self._all)
+        self._taken += len(single_frame_pred)
+        self._single, self._all = [], []
+        return single_frame_pred, all_frames_pred
+
+    def finish(self):
+        """마지막 프레임 복사본으로 뒤쪽을 채워 남은 윈도우를 처리하고,
+        take_predictions로 가져가지 않은 나머지 (single, all) 예측을 반환"""
+        num_predicted = self.num_frames - self._lead
+        if num_predicted <= 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+        remainder = num_predicted % self.stride
+        no_padded_frames_end = self.context + self.stride - (remainder if remainder != 0 else self.stride)
+        self._buffer = np.concatenate([self._buffer, np.repeat(self._buffer[-1:], no_padded_frames_end, axis=0)])
+        self._drain()
+        single_frame_pred, all_frames_pred = self.take_predictions()
+        remaining = num_predicted - (self._taken - len(single_frame_pred))
+        return single_frame_pred[:remaining], all_frames_pred[:remaining]
+
+# 영상을 한 번만 순차 디코딩하여 두 스트림으로 분배
+#  - TransNetV2용: 전체 프레임, 48x27
+#  - InceptionV3용: 샘플링된(1fps) 프레임, 전처리 완료 텐서 (+ 샘플 프레임 인덱스, frame_filter 사용 시 참조 번호)
+def _iter_shared_decode(vr, sample_idxs, chunk_size, frame_filter=None, start_frame=0, input_size=(299, 299)):
+    sample_set = set(sample_idxs)
+    total_frames = len(vr)
+    for start in range(start_frame, total_frames, chunk_size):
+        idxs = list(range(start, min(start + chunk_size, total_frames)))
+        frames = vr.get_batch(idxs).asnumpy()
+        low_res = _resize_frames(frames, (27, 48))
+        picked = [i for i, idx in enumerate(idxs) if idx in sample_set]
+        picked_idxs = [idxs[i] for i in picked]
+        refs = None
+        if picked and frame_filter is not None:
+            keep, refs = frame_filter.select(frames[picked])
+            picked = [picked[i] for i in keep]
+        sampled = preprocess_frames(frames[picked], input_size) if picked else None
+        yield idxs, low_res, sampled, picked_idxs, refs
+
+# 한 번의 디코딩으로 InceptionV3 특징과 TransNetV2 장면 전환을 함께 계산
+# scene_engine: SCENE_ENGINES 참고 (아래 TransNetV2 설명은 histogram 엔진에도 똑같이 적용됨)
+# parallel_models=True면 TransNetV2를 별도 스레드에서 InceptionV3와 동시에 실행
+# decode_size는 InceptionV3 입력 크기로 디코딩하고, TransNetV2용 48x27은 거기서 다시 축소
+# checkpoint: ExtractionCheckpoint를 주면 특징 행을 checkpoint에 쓰고, 영상 checkpoint_seconds초 분량마다
+#   특징 행과 TransNetV2 예측을 커밋. 이전에 커밋된 내용이 있으면 그 지점부터 이어서 디코딩
+# 반환값: (features, timestamps, scene_changes, total_frames, fps, (single_frame_pred, all_frames_pred))
+#   writer/checkpoint를 주면 features/timestamps는 None
+def extract_features_and_scenes(video_path, model, device, batch_size=32, threshold=0.5,
+                                parallel_models=True, prefetch=2, decode_chunk=16, decode_size=(299, 299),
+                                projection=None, static_threshold=None, writer=None,
+                                checkpoint=None, checkpoint_seconds=60.0, scene_engine="transnetv2"):
+    print("🎞️ 프레임 특징 추출 중... (단일 디코딩: InceptionV3 + TransNetV2)")
+    vr = _open_video_reader(video_path, decode_size)
+    fps = vr.get_avg_fps()
+    total_frames = len(vr)
+    print(f"📌 평균 FPS: {fps}")
+    sample_idxs = list(range(0, total_frames, int(round(fps))))
+
+    if checkpoint is not None:
+        writer = checkpoint
+        if checkpoint.complete:
+            print("♻️ 체크포인트에 추출 결과가 모두 있어 디코딩을 건너뜁니다.")
+            single_frame_predictions, all_frames_predictions = checkpoint.load_predictions()
+            scene_changes = _threshold_scenes(single_frame_predictions, threshold)
+            print(f"✅ {len(scene_changes)}개의 장면 전환점 검출 완료")
+            return (None, None, scene_changes, total_frames, fps,
+                    (single_frame_predictions, all_frames_predictions))
+        sample_idxs = sample_idxs[checkpoint.committed_rows:]
+        resume_frame = checkpoint.committed_predictions
+    else:
+        resume_frame = 0
+
+    stream = _make_scene_stream(scene_engine, total_frames=total_frames, start_frame=resume_frame)
+    # 재개 시 TransNetV2는 앞쪽 문맥 프레임부터, InceptionV3는 남은 첫 샘플부터 필요
+    transnet_start = max(0, resume_frame - stream.context)
+    decode_start = min([transnet_start] + sample_idxs[:1])
+    commit_every = max(int(round(fps * checkpoint_seconds)), 1) if checkpoint is not None else None
+    last_commit = decode_start
+    stream_lock = threading.Lock()
+    low_res_queue = queue.Queue(maxsize=max(prefetch, 1) * 4)
+    transnet_errors = []
+    if parallel_models:
+        def transnet_worker():
+            while True:
+                frames = low_res_queue.get()
+                if frames is None:
+                    break
+                # 오류가 나도 큐는 계속 비워서 디코딩 쪽이 막히지 않게 함
+                if not transnet_errors:
+                    try:
+                        with stream_lock:
+                            stream.push(frames)
+                    except Exception as e:
+                        transnet_errors.append(e)
+        transnet_thread = threading.Thread(target=transnet_worker, daemon=True)
+        transnet_thread.start()
+
+    frame_filter = StaticFrameFilter(static_threshold) if static_threshold is not None else None
+    chunks = _iter_shared_decode(vr, sample_idxs, decode_chunk, frame_filter, start_frame=decode_start,
+                                 input_size=_model_input_size(model))
+    if prefetch > 0:
+        chunks = _prefetch(chunks, max_prefetch=prefetch)
+
+    collector = _FeatureCollector(writer)
+    pending, pending_idxs, pending_refs = [], [], []
+    try:
+        for idxs, low_res, sampled, sampled_idxs, sample_refs in chunks:
+            if idxs[0] < transnet_start:
+                low_res = low_res[transnet_start - idxs[0]:]
+            if parallel_models:
+                low_res_queue.put(low_res)
+            else:
+                stream.push(low_res)
+            if sampled is not None:
+                pending.append(sampled)
+            pending_idxs.extend(sampled_idxs)
+            if sample_refs is not None:
+                pending_refs.extend(sample_refs)
+            commit_due = commit_every is not None and idxs[-1] + 1 - last_commit >= commit_every
+            if sum(len(b) for b in pending) >= batch_size or idxs[-1] == total_frames - 1 or commit_due:
+                if pending_idxs:
+                    batch_feats = None
+                    if pending:
+                        with torch.inference_mode():
+                            batch_feats = _project(model(torch.cat(pending).to(device)), projection).cpu().numpy()
+                    collector.add(batch_feats, pending_refs if frame_filter is not None else None,
+                                  np.asarray(pending_idxs) / fps)
+                    pending, pending_idxs, pending_refs = [], [], []
+                # ✅ 프레임 처리 진행 상황 출력
+                print(f"📸 처리 중... {idxs[-1]}/{total_frames} 프레임", flush=True)
+            if commit_due:
+                # 커밋 시점까지 추론한 특징 행과 TransNetV2가 확정한 예측을 함께 저장
+                with stream_lock:
+                    checkpoint.append_predictions(*stream.take_predictions())
+                checkpoint.commit()
+                last_commit = idxs[-1] + 1
+    finally:
+        if parallel_models:
+            low_res_queue.put(None)
+            transnet_thread.join()
+    if transnet_errors:
+        raise transnet_errors[0]
+
+    single_frame_predictions, all_frames_predictions = stream.finish()
+    if checkpoint is not None:
+        checkpoint.append_predictions(single_frame_predictions, all_frames_predictions)
+        checkpoint.commit(complete=True)
+        single_frame_predictions, all_frames_predictions = checkpoint.load_predictions()
+    scene_changes = _threshold_scenes(single_frame_predictions, threshold)
+    print(f"✅ {len(scene_changes)}개의 장면 전환점 검출 완료")
+    if frame_filter is not None:
+        frame_filter.report()
+    features, timestamps = collector.result()
+    return (features, timestamps, scene_changes, total_frames, fps,
+            (single_frame_predictions, all_frames_predictions))
+
+# 체크포인트가 같은 영상/설정에서 만들어졌는지 확인하기 위한 식별 문자열
+def _checkpoint_signature(video_path, **config):
+    stat = os.stat(video_path)
+    return json.dumps({"video": os.path.abspath(video_path), "size": stat.st_size,
+                       "mtime": int(stat.st_mtime), **config}, sort_keys=True, default=str)
 
 # 장면 구간 JSON으로 저장
 def save_segments_to_json(scene_changes, output_json, total_frames, fps):
@@ -97,15 +824,147 @@ def save_segments_to_json(scene_changes, output_json, total_frames, fps):
     print("✅ 장면 구간 JSON 저장 완료")
 
 # 특징 추출 및 TransNetV2 장면 분할 파이프라인
-def extract_features_pipe(video_path, output_h5, output_json, device="cuda"):
+# shared_decode=True면 영상을 한 번만 디코딩해 두 모델이 같이 사용
+# sampling="keyframe"은 프레임을 건너뛰며 읽는 shared_decode=False 경로에서만 의미가 있음 (공유 디코딩은 모든 프레임을 순차 디코딩)
+# pca_mode: "per_video"(영상마다 PCA 학습), "fixed"(pca_path의 고정 투영, 없으면 incremental로 대체), "incremental"
+# backend / num_threads: load_inception_v3 참고
+# static_threshold: StaticFrameFilter 기준값 (None이면 모든 샘플 프레임을 추론)
+# feature_dtype: 저장할 특징 dtype ("float32" 또는 "float16")
+# feature_compression: 특징 데이터셋 압축 (feature_store.FEATURE_COMPRESSIONS, 기본 lzf)
+# 고정 투영(fixed)을 쓰면 PCA 후처리가 없으므로 추출하면서 바로 output_h5에 행을 추가
+# incremental이면 투영 전 특징을 체크포인트(또는 {output_h5}.raw)에 쓰고, 거기서 구간씩 읽어 PCA를 학습/적용
+#   (샤드 추출 경로는 샤드 결과를 메모리에서 합치므로 메모리의 특징으로 PCA)
+# resumable=True면 (shared_decode 경로에서) {output_h5}.partial 체크포인트에 checkpoint_seconds초 분량마다 커밋하고,
+#   중단 후 다시 실행하면 마지막 커밋 지점부터 이어서 추출. 끝나면 체크포인트는 최종 파일로 바뀌거나 삭제됨
+# num_shards > 1이면 InceptionV3 특징을 extract_features_sharded로 여러 프로세스에서 나눠 추출하고
+#   (이때 num_threads는 샤드당 스레드 수), TransNetV2는 그동안 현재 프로세스에서 따로 실행 (shared_decode/resumable 미사용)
+# scene_threshold: 장면 전환 판정 기준. TransNetV2 프레임별 확률은 output_h5에 함께 저장되므로
+#   나중에 기준만 바꿀 때는 rederive_scenes_json으로 모델 없이 장면 JSON을 다시 만들 수 있음
+# scene_engine: 장면 전환 검출 엔진 (SCENE_ENGINES 참고, 같은 _scenes.json 형식으로 저장)
+# backbone: FEATURE_BACKBONES 참고. inception_v3가 아니면 adapter_path의 어댑터로 1024차원을 바로 만들고 PCA는 쓰지 않음
+# decode_size: None이면 백본 입력 크기로 디코딩
+def extract_features_pipe(video_path, output_h5, output_json, device="cuda",
+                          shared_decode=True, parallel_models=True, decode_size=None, sampling="uniform",
+                          pca_mode="per_video", pca_path=None, backend="eager", num_threads=None,
+                          static_threshold=None, feature_dtype="float32", resumable=True, checkpoint_seconds=60.0,
+                          num_shards=1, scene_threshold=0.5, scene_engine="transnetv2",
+                          backbone="inception_v3", adapter_path=None, batch_size=32,
+                          feature_compression=DEFAULT_COMPRESSION):
     os.makedirs(os.path.dirname(output_h5), exist_ok=True)
     os.makedirs(os.path.dirname(output_json), exist_ok=True)
+    if decode_size is None:
+        decode_size = FEATURE_BACKBONES[backbone]["input_size"]
+
+    projection = None
+    if backbone != "inception_v3":
+        print(f"🪶 경량 백본 사용: {backbone} + 어댑터 ({adapter_path})")
+        pca_mode = "adapter"
+    elif pca_mode == "fixed":
+        if pca_path is not None and os.path.exists(pca_path):
+            print(f"📐 고정 PCA 투영 사용: {pca_path}")
+            projection = load_pca_projection(pca_path, device)
+        else:
+            print(f"⚠️ 고정 PCA 투영 파일({pca_path})이 없어 IncrementalPCA로 대체합니다.")
+            pca_mode = "incremental"
+
+    if num_shards > 1:
+        with ThreadPoolExecutor(max_workers=1) as scene_executor:
+            scene_future = scene_executor.submit(detect_scenes, video_path, scene_threshold, engine=scene_engine,
+                                                 return_predictions=True)
+            features, timestamps = extract_features_sharded(
+                video_path, num_shards, device=device, backend=backend, num_threads=num_threads,
+                batch_size=batch_size, decode_size=decode_size, sampling=sampling, static_threshold=static_threshold,
+                pca_path=pca_path if projection is not None else None, backbone=backbone, adapter_path=adapter_path)
+            scene_changes, total_frames, *predictions = scene_future.result()
+        fps = VideoReader(video_path, cpu(0)).get_avg_fps()
+        save_segments_to_json(scene_changes, output_json, total_frames, fps)
+        save_to_h5(reduce_features(features, pca_mode), output_h5, timestamps=timestamps, dtype=feature_dtype,
+                   compression=feature_compression)
+        save_transitions(output_h5, *predictions, fps, threshold=scene_threshold, engine=scene_engine)
+        return
 
-    model = load_inception_v3(device)
-    features = extract_features(video_path, model, device)
-    pca_features = apply_pca(features)
-    save_to_h5(pca_features, output_h5)
+    model = load_feature_model(device, backbone=backbone, backend=backend, num_threads=num_threads,
+                               adapter_path=adapter_path)
+    # 추출 결과가 바로 최종 1024차원 특징인지 (PCA 후처리 없음)
+    final_rows = projection is not None or pca_mode == "adapter"
+    # 투영 전 특징을 디스크에 쓰고 IncrementalPCA를 구간 단위로 적용하는지
+    streaming_pca = pca_mode == "incremental"
+    raw_h5 = None
+    checkpoint = None
+    if resumable and shared_decode:
+        # 투영 전 특징(2048-d)은 PCA 입력이므로 float32로 보관
+        signature = _checkpoint_signature(video_path, pca_mode=pca_mode, pca_path=pca_path if projection is not None else None,
+                                          decode_size=decode_size, static_threshold=static_threshold,
+                                          feature_dtype=feature_dtype, scene_engine=scene_engine,
+                                          backbone=backbone, adapter_path=adapter_path,
+                                          feature_compression=feature_compression)
+        checkpoint = ExtractionCheckpoint(output_h5 + ".partial", signature,
+                                          dtype=feature_dtype if final_rows else "float32",
+                                          compression=feature_compression)
+        writer = checkpoint
+        raw_h5 = checkpoint.path
+    elif streaming_pca:
+        raw_h5 = output_h5 + ".raw"
+        writer = FeatureStoreWriter(raw_h5, dtype="float32", compression=feature_compression)
+    else:
+        writer = FeatureStoreWriter(output_h5, dtype=feature_dtype, compression=feature_compression) if final_rows else None
+    try:
+        if shared_decode:
+            features, timestamps, scene_changes, total_frames, fps, predictions = extract_features_and_scenes(
+                video_path, model, device, batch_size=batch_size, threshold=scene_threshold,
+                parallel_models=parallel_models,
+                decode_size=decode_size,
+                projection=projection, static_threshold=static_threshold,
+                writer=writer if checkpoint is None else None,
+                checkpoint=checkpoint, checkpoint_seconds=checkpoint_seconds, scene_engine=scene_engine)
+        else:
+            features, timestamps = extract_features(
+                video_path, model, device, batch_size=batch_size, decode_size=decode_size, sampling=sampling,
+                projection=projection,
+                static_threshold=static_threshold, writer=writer, return_timestamps=True)
+        if checkpoint is not None and not final_rows and not streaming_pca:
+            features, timestamps = checkpoint.load_rows()
+    finally:
+        if writer is not None:
+            writer.close()
 
-    scene_changes, total_frames = detect_scenes_transnetv2(video_path)
-    fps = VideoReader(video_path, cpu(0)).get_avg_fps()
+    if not shared_decode:
+        scene_changes, total_frames, *predictions = detect_scenes(
+            video_path, scene_threshold, engine=scene_engine, return_predictions=True)
+        fps = VideoReader(video_path, cpu(0)).get_avg_fps()
+    # 최종 특징 파일을 마지막에 만들어야, 중간에 죽었을 때 run_pipeline이 완료로 오인하지 않음
     save_segments_to_json(scene_changes, output_json, total_frames, fps)
+
+    if streaming_pca:
+        apply_incremental_pca_h5(raw_h5, output_h5, dtype=feature_dtype, compression=feature_compression)
+        if checkpoint is not None:
+            checkpoint.discard()
+        else:
+            os.remove(raw_h5)
+    elif not final_rows:
+        pca_features = reduce_features(features, pca_mode)
+        save_to_h5(pca_features, output_h5, timestamps=timestamps, dtype=feature_dtype,
+                   compression=feature_compression)
+        if checkpoint is not None:
+            checkpoint.discard()
+    elif checkpoint is not None:
+        checkpoint.finalize(output_h5)
+    save_transitions(output_h5, *predictions, fps, threshold=scene_threshold, engine=scene_engine)
+
+# output_h5에 저장된 TransNetV2 프레임별 확률로 장면 JSON을 다시 만듦 (모델 재실행 없음)
+# only_if_changed=True면 마지막으로 사용한 threshold와 다를 때만 다시 만듦
+# 반환값: 다시 만들었으면 True, 저장된 확률이 없거나 바꿀 필요가 없으면 False
+def rederive_scenes_json(h5_path, output_json, threshold=0.5, only_if_changed=False):
+    cached = load_transitions(h5_path)
+    if cached is None:
+        print(f"⚠️ {h5_path}에 저장된 장면 전환 예측이 없어 장면 JSON을 다시 만들 수 없습니다.")
+        return False
+    single_frame_predictions, _, attrs = cached
+    if only_if_changed and attrs.get("threshold") == threshold:
+        return False
+    scene_changes = _threshold_scenes(single_frame_predictions, threshold)
+    engine = attrs.get("engine", "transnetv2")
+    print(f"✂️ 저장된 {engine} 예측으로 장면 재계산 (threshold {threshold}): {len(scene_changes)}개의 장면 전환점")
+    save_segments_to_json(scene_changes, output_json, len(single_frame_predictions), float(attrs["fps"]))
+    set_transition_threshold(h5_path, threshold)
+    return True
@@ -0,0 +1,241 @@
+# feature_store.py
+import os
+from contextlib import contextmanager
+import numpy as np
+import h5py
+
+FEATURES_KEY = "features"
+TIMESTAMPS_KEY = "timestamps"
+# TransNetV2 프레임별 전환 확률 (원본 프레임 단위, 임계값 적용 전)
+TRANSITIONS_KEY = "transnet_single"
+ALL_TRANSITIONS_KEY = "transnet_all"
+# features 데이터셋 압축 (h5py 내장 필터). lzf는 빠르고, gzip은 더 작지만 느림. "none"이면 압축하지 않음
+FEATURE_COMPRESSIONS = ["lzf", "gzip", "none"]
+DEFAULT_COMPRESSION = "lzf"
+
+class FeatureStoreWriter:
+    """
+    프레임 특징을 시간축으로 chunk된 H5 데이터셋에 행 단위로 이어 붙여 저장
+    - features: [N, D], chunk=(chunk_rows, D), dtype float32 또는 float16
+    - timestamps: [N] 각 행의 시간(초)
+    - features.attrs["sample_rate"]: 초당 행 수
+    - compression: FEATURE_COMPRESSIONS 중 하나 (chunk 단위로 압축되므로 행 구간만 읽을 때도 해당 chunk만 풂)
+    """
+
+    def __init__(self, h5_path, dtype="float32", chunk_rows=256, compression=DEFAULT_COMPRESSION, sample_rate=1.0,
+                 mode="w"):
+        assert compression in FEATURE_COMPRESSIONS or compression is None, f"지원하는 압축: {FEATURE_COMPRESSIONS}"
+        dirname = os.path.dirname(h5_path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self.h5_path = h5_path
+        self.dtype = np.dtype(dtype)
+        self.chunk_rows = chunk_rows
+        self.compression = None if compression == "none" else compression
+        self.sample_rate = sample_rate
+        self.file = h5py.File(h5_path, mode)
+        self.features = self.file.get(FEATURES_KEY)
+        self.timestamps = self.file.get(TIMESTAMPS_KEY)
+
+    def __len__(self):
+        return 0 if self.features is None else self.features.shape[0]
+
+    def _create(self, dim):
+        # 차원은 첫 append 때 결정
+        self.features = self.file.create_dataset(
+            FEATURES_KEY, shape=(0, dim), maxshape=(None, dim), dtype=self.dtype,
+            chunks=(self.chunk_rows, dim), compression=self.compression)
+        self.features.attrs["sample_rate"] = self.sample_rate
+        self.timestamps = self.file.create_dataset(
+            TIMESTAMPS_KEY, shape=(0,), maxshape=(None,), dtype="float64", chunks=(self.chunk_rows,))
+
+    def append(self, rows, timestamps=None):
+        """rows [K, D]를 끝에 추가. timestamps가 없으면 sample_rate로 계산"""
+        rows = np.asarray(rows)
+        if rows.ndim != 2 or rows.shape[0] == 0:
+            return
+        if self.features is None:
+            self._create(rows.shape[1])
+        start = self.features.shape[0]
+        stop = start + rows.shape[0]
+        if timestamps is None:
+            timestamps = np.arange(start, stop) / self.sample_rate
+        self.features.resize(stop, axis=0)
+        self.features[start:stop] = rows.astype(self.dtype, copy=False)
+        self.timestamps.resize(stop, axis=0)
+        self.timestamps[start:stop] = np.asarray(timestamps, dtype=np.float64)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+@contextmanager
+def open_features(h5_path):
+    """features 데이터셋을 메모리에 올리지 않고 연다 (슬라이싱한 행이 든 chunk만 읽음)"""
+    with h5py.File(h5_path, "r") as hf:
+        yield hf[FEATURES_KEY]
+
+def load_features(h5_path, start=None, stop=None, dtype=np.float32):
+    """features의 [start:stop] 행만 읽어 dtype(기본 float32)으로 반환"""
+    with open_features(h5_path) as features:
+        return np.asarray(features[start:stop]).astype(dtype, copy=False)
+
+def load_timestamps(h5_path):
+    """각 행의 시간(초). 예전 형식(timestamps 없음)이면 sample_rate(기본 1.0)로 계산"""
+    with h5py.File(h5_path, "r") as hf:
+        if TIMESTAMPS_KEY in hf:
+            return np.asarray(hf[TIMESTAMPS_KEY])
+        features = hf[FEATURES_KEY]
+        sample_rate = features.attrs.get("sample_rate", 1.0)
+        return np.arange(features.shape[0]) / sample_rate
+
+def save_transitions(h5_path, single_frame_pred, all_frames_pred, fps, threshold=None, engine="transnetv2"):
+    """TransNetV2(또는 다른 장면 전환 엔진)의 프레임별 전환 확률을 특징 파일에 함께 저장 (있으면 덮어씀)
+    attrs: fps, 만든 엔진, 마지막으로 장면 JSON을 만든 threshold"""
+    with h5py.File(h5_path, "a") as hf:
+        for key, values in ((TRANSITIONS_KEY, single_frame_pred), (ALL_TRANSITIONS_KEY, all_frames_pred)):
+            if key in hf:
+                del hf[key]
+            hf.create_dataset(key, data=np.asarray(values, dtype=np.float32), chunks=True)
+        hf[TRANSITIONS_KEY].attrs["fps"] = fps
+        hf[TRANSITIONS_KEY].attrs["engine"] = engine
+        if threshold is not None:
+            hf[TRANSITIONS_KEY].attrs["threshold"] = threshold
+
+def load_transitions(h5_path):
+    """(single_frame_pred, all_frames_pred, attrs). 저장된 예측이 없으면 None"""
+    with h5py.File(h5_path, "r") as hf:
+        if TRANSITIONS_KEY not in hf:
+            return None
+        return (np.asarray(hf[TRANSITIONS_KEY]), np.asarray(hf[ALL_TRANSITIONS_KEY]),
+                dict(hf[TRANSITIONS_KEY].attrs))
+
+def has_transitions(h5_path):
+    """장면 전환 예측이 저장돼 있는지 (예측 저장 이전에 만든 파일이면 False)"""
+    with h5py.File(h5_path, "r") as hf:
+        return TRANSITIONS_KEY in hf and ALL_TRANSITIONS_KEY in hf
+
+def set_transition_threshold(h5_path, threshold):
+    with h5py.File(h5_path, "a") as hf:
+        hf[TRANSITIONS_KEY].attrs["threshold"] = threshold
+
+class ExtractionCheckpoint:
+    """
+    특징 추출 진행 상황을 시간 chunk 단위로 커밋하는 H5 체크포인트 (보통 {output_h5}.partial)
+    - features / timestamps: 커밋된 특징 행 (FeatureStoreWriter 형식)
+    - transnet_single / transnet_all (TRANSITIONS_KEY / ALL_TRANSITIONS_KEY): 커밋된 TransNetV2 프레임별 전환 확률
+    - attrs: signature(영상/설정 식별 문자열), committed_rows, committed_predictions, complete
+    append()는 메모리에만 쌓고 commit() 때 디스크에 기록하므로, 중단되면 마지막 커밋 시점부터 재개
+    """
+
+    def __init__(self, path, signature, dtype="float32", compression=DEFAULT_COMPRESSION):
+        self.path = path
+        if os.path.exists(path) and not self._matches(path, signature):
+            print(f"⚠️ 체크포인트({path})가 현재 영상/설정과 달라 처음부터 다시 추출합니다.")
+            os.remove(path)
+        try:
+            self.writer = FeatureStoreWriter(path, dtype=dtype, compression=compression, mode="a")
+        except OSError as e:
+            print(f"⚠️ 체크포인트({path})를 열 수 없어 처음부터 다시 추출합니다: {e}")
+            os.remove(path)
+            self.writer = FeatureStoreWriter(path, dtype=dtype, compression=compression, mode="a")
+
+        attrs = self.writer.file.attrs
+        attrs["signature"] = signature
+        self.committed_rows = int(attrs.get("committed_rows", 0))
+        self.committed_predictions = int(attrs.get("committed_predictions", 0))
+        self.complete = bool(attrs.get("complete", False))
+        self._truncate()
+        if self.committed_rows or self.committed_predictions:
+            print(f"♻️ 체크포인트에서 재개: 특징 {self.committed_rows}행, TransNetV2 {self.committed_predictions}프레임")
+        self._rows, self._timestamps = [], []
+        self._single, self._all = [], []
+
+    @staticmethod
+    def _matches(path, signature):
+        try:
+            with h5py.File(path, "r") as hf:
+                return hf.attrs.get("signature") == signature
+        except OSError:
+            return False
+
+    def _prediction_dataset(self, name):
+        f = self.writer.file
+        if name not in f:
+            f.create_dataset(name, shape=(0,), maxshape=(None,), dtype="float32", chunks=(4096,))
+        return f[name]
+
+    def _truncate(self):
+        # 마지막 커밋 이후에 쓰다 만 행은 버림
+        if self.writer.features is not None and self.writer.features.shape[0] > self.committed_rows:
+            self.writer.features.resize(self.committed_rows, axis=0)
+            self.writer.timestamps.resize(self.committed_rows, axis=0)
+        for name in (TRANSITIONS_KEY, ALL_TRANSITIONS_KEY):
+            dataset = self._prediction_dataset(name)
+            if dataset.shape[0] > self.committed_predictions:
+                dataset.resize(self.committed_predictions, axis=0)
+
+    def append(self, rows, timestamps=None):
+        """특징 행 추가 (commit 전까지는 메모리에만 보관)"""
+        self._rows.append(np.asarray(rows))
+        self._timestamps.append(np.asarray(timestamps, dtype=np.float64))
+
+    def append_predictions(self, single_frame_pred, all_frames_pred):
+        """TransNetV2 예측 추가 (commit 전까지는 메모리에만 보관)"""
+        self._single.append(np.asarray(single_frame_pred, dtype=np.float32))
+        self._all.append(np.asarray(all_frames_pred, dtype=np.float32))
+
+    def commit(self, complete=False):
+        """쌓아 둔 행/예측을 기록하고 커밋 위치를 갱신. complete=True면 추출이 끝났음을 표시"""
+        if self._rows:
+            self.writer.append(np.concatenate(self._rows), np.concatenate(self._timestamps))
+            self.committed_rows = len(self.writer)
+        if self._single:
+            for name, chunks in ((TRANSITIONS_KEY, self._single), (ALL_TRANSITIONS_KEY, self._all)):
+                values = np.concatenate(chunks)
+                dataset = self._prediction_dataset(name)
+                start = dataset.shape[0]
+                dataset.resize(start + len(values), axis=0)
+                dataset[start:] = values
+            self.committed_predictions = self._prediction_dataset(TRANSITIONS_KEY).shape[0]
+        self._rows, self._timestamps = [], []
+        self._single, self._all = [], []
+        attrs = self.writer.file.attrs
+        attrs["committed_rows"] = self.committed_rows
+        attrs["committed_predictions"] = self.committed_predictions
+        attrs["complete"] = self.complete = self.complete or complete
+        self.writer.flush()
+
+    def load_rows(self):
+        """커밋된 (features, timestamps)"""
+        if self.writer.features is None:
+            return None, None
+        return np.asarray(self.writer.features), np.asarray(self.writer.timestamps)
+
+    def load_predictions(self):
+        """커밋된 (single_frame_pred, all_frames_pred)"""
+        return (np.asarray(self._prediction_dataset(TRANSITIONS_KEY)),
+                np.asarray(self._prediction_dataset(ALL_TRANSITIONS_KEY)))
+
+    def close(self):
+        self.writer.close()
+
+    def finalize(self, output_h5):
+        """체크포인트 파일을 그대로 최종 특징 파일로 사용"""
+        self.writer.close()
+        os.replace(self.path, output_h5)
+
+    def discard(self):
+        self.writer.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
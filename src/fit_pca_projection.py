@@ -0,0 +1,75 @@
+import argparse
+import os
+import numpy as np
+from sklearn.decomposition import IncrementalPCA
+
+from extract_features_module import load_inception_v3, extract_features, default_pca_path
+
+def list_videos(video_dir, exts=(".mp4", ".mkv", ".mov", ".avi", ".webm")):
+    """디렉토리 내 영상 파일 목록 (정렬)"""
+    return sorted(
+        os.path.join(video_dir, name) for name in os.listdir(video_dir)
+        if name.lower().endswith(exts)
+    )
+
+def fit_pca_projection(video_paths, output_path, device="cpu", n_components=1024, batch_rows=4096):
+    """
+    여러 영상의 InceptionV3 특징(2048-d)으로 IncrementalPCA를 학습하고
+    mean / components를 .npz로 저장 (extract_features_module.load_pca_projection에서 사용)
+    """
+    model = load_inception_v3(device)
+    ipca = IncrementalPCA(n_components=n_components)
+    buffer = []
+    buffered_rows = 0
+    fitted_rows = 0
+
+    for i, video_path in enumerate(video_paths):
+        print(f"🎞️ [{i + 1}/{len(video_paths)}] {video_path}", flush=True)
+        try:
+            feats = extract_features(video_path, model, device)
+        except Exception as e:
+            print(f"⚠️ 특징 추출 실패, 건너뜀: {e}")
+            continue
+        buffer.append(feats)
+        buffered_rows += feats.shape[0]
+
+        # partial_fit 배치는 n_components 행 이상이어야 하므로 충분히 모였을 때만 학습
+        if buffered_rows >= max(batch_rows, n_components):
+            ipca.partial_fit(np.concatenate(buffer))
+            fitted_rows += buffered_rows
+            buffer, buffered_rows = [], 0
+
+    if buffer:
+        if fitted_rows == 0 and buffered_rows < n_components:
+            raise ValueError(f"학습 프레임 수({buffered_rows})가 n_components({n_components})보다 적습니다.")
+        if buffered_rows >= n_components:
+            ipca.partial_fit(np.concatenate(buffer))
+            fitted_rows += buffered_rows
+        else:
+            print(f"⚠️ 마지막 {buffered_rows}개 프레임은 n_components보다 적어 학습에서 제외합니다.")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    np.savez(
+        output_path,
+        mean=ipca.mean_.astype(np.float32),
+        components=ipca.components_.astype(np.float32),
+        explained_variance_ratio=ipca.explained_variance_ratio_.astype(np.float32),
+    )
+    print(f"✅ 고정 PCA 투영 저장 완료: {output_path} (학습 프레임 수: {fitted_rows}, "
+          f"설명 분산: {ipca.explained_variance_ratio_.sum():.4f})")
+    return output_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video_dir", required=True, help="PCA 학습에 사용할 영상 디렉토리")
+    parser.add_argument("--fine_ckpt", default=None, help="모델 체크포인트 경로 (.pkl). 지정하면 그 옆에 저장")
+    parser.add_argument("--output", default=None, help="저장할 .npz 경로")
+    parser.add_argument("--device", default="cpu", help="cpu 또는 cuda")
+    parser.add_argument("--n_components", type=int, default=1024)
+    args = parser.parse_args()
+
+    if args.output is None and args.fine_ckpt is None:
+        parser.error("--output 또는 --fine_ckpt 중 하나는 지정해야 합니다.")
+    output_path = args.output or default_pca_path(args.fine_ckpt)
+
+    fit_pca_projection(list_videos(args.video_dir), output_path, device=args.device, n_components=args.n_components)
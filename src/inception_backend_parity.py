@@ -0,0 +1,69 @@
+import argparse
+import time
+import numpy as np
+from sklearn.decomposition import PCA
+
+from extract_features_module import load_inception_v3, extract_features, FEATURE_BACKENDS
+
+def compare_pca_features(reference, candidate, max_components=1024):
+    """
+    fp32 기준 특징으로 학습한 PCA를 두 특징에 똑같이 적용한 뒤 비교
+    (영상마다 PCA를 따로 학습하면 축의 부호/순서가 달라 비교할 수 없으므로 기준 PCA를 공유)
+    """
+    n_components = min(reference.shape[0], reference.shape[1], max_components)
+    pca = PCA(n_components=n_components).fit(reference)
+    ref_pca = pca.transform(reference)
+    cand_pca = pca.transform(candidate)
+
+    ref_norm = np.linalg.norm(ref_pca, axis=1)
+    cand_norm = np.linalg.norm(cand_pca, axis=1)
+    cosine = np.sum(ref_pca * cand_pca, axis=1) / np.maximum(ref_norm * cand_norm, 1e-12)
+    rel_error = np.linalg.norm(ref_pca - cand_pca, axis=1) / np.maximum(ref_norm, 1e-12)
+    return {
+        "cosine_mean": float(np.mean(cosine)),
+        "cosine_min": float(np.min(cosine)),
+        "rel_error_mean": float(np.mean(rel_error)),
+        "max_abs_diff": float(np.max(np.abs(ref_pca - cand_pca))),
+    }
+
+def run_parity_check(video_path, backends, device="cpu", num_threads=None, min_cosine=0.99):
+    """fp32 eager 특징을 기준으로 각 백엔드의 1024차원 PCA 특징 일치도와 소요 시간을 출력"""
+    timings = {}
+
+    def timed_extract(backend):
+        model = load_inception_v3(device, backend=backend, num_threads=num_threads)
+        start = time.perf_counter()
+        feats = extract_features(video_path, model, device)
+        timings[backend] = time.perf_counter() - start
+        return feats
+
+    reference = timed_extract("eager")
+    all_passed = True
+    print("\n📊 백엔드 일치도 (기준: eager fp32)")
+    print(f"  - eager: {timings['eager']:.2f}s, {reference.shape[0]} 프레임")
+    for backend in backends:
+        if backend == "eager":
+            continue
+        candidate = timed_extract(backend)
+        result = compare_pca_features(reference, candidate)
+        passed = result["cosine_min"] >= min_cosine
+        all_passed = all_passed and passed
+        print(f"  - {backend}: {timings[backend]:.2f}s (x{timings['eager'] / timings[backend]:.2f}), "
+              f"cosine 평균 {result['cosine_mean']:.5f} / 최소 {result['cosine_min']:.5f}, "
+              f"상대 오차 {result['rel_error_mean']:.5f}, 최대 차이 {result['max_abs_diff']:.5f} "
+              f"{'✅' if passed else '❌'}")
+    return all_passed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video_path", required=True, help="비교에 사용할 영상")
+    parser.add_argument("--backends", nargs="+", default=[b for b in FEATURE_BACKENDS if b != "eager"],
+                        choices=FEATURE_BACKENDS, help="비교할 백엔드 목록")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--num_threads", type=int, default=None)
+    parser.add_argument("--min_cosine", type=float, default=0.99, help="통과 기준 최소 cosine 유사도")
+    args = parser.parse_args()
+
+    ok = run_parity_check(args.video_path, args.backends, device=args.device,
+                          num_threads=args.num_threads, min_cosine=args.min_cosine)
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,60 @@
+# interval_index.py
+import numpy as np
+
+class IntervalIndex:
+    """
+    [start, end) 구간 목록에 대한 이분 탐색 인덱스 (구간끼리 겹쳐도 됨)
+    시작 시각으로 정렬하고 "앞쪽 구간들의 end 최대값"(max_end)을 함께 두어
+    질의 한 번에 O(log N + 결과 수)로 겹치는 구간을 찾음
+    반환하는 인덱스는 모두 처음 넘겨준 목록 기준 (원래 순서)
+    """
+
+    def __init__(self, starts, ends):
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1)
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1)
+        self.order = np.argsort(starts, kind="stable")
+        self.starts = starts[self.order]
+        self.ends = ends[self.order]
+        self.max_end = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    @classmethod
+    def from_dicts(cls, items, start_key="start", end_key="end"):
+        """dict 목록(Whisper 세그먼트 등)으로 생성. 키가 없으면 0"""
+        return cls([item.get(start_key, 0) for item in items], [item.get(end_key, 0) for item in items])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def query(self, start, end, min_overlap=None):
+        """
+        [start, end)와 겹치는 구간의 인덱스 (원래 순서)
+        min_overlap이 None이면 조금이라도 겹치는 구간 (s < end and e > start),
+        아니면 겹치는 길이 min(e, end) - max(s, start) >= min_overlap인 구간
+        """
+        if min_overlap is None:
+            hi = np.searchsorted(self.starts, end, side="left")
+            lo = np.searchsorted(self.max_end[:hi], start, side="right")
+            idx = lo + np.flatnonzero(self.ends[lo:hi] > start)
+        else:
+            # 후보 범위는 부동소수점 오차만큼 넉넉히 잡고, 겹치는 길이는 아래에서 정확히 다시 계산
+            hi = np.searchsorted(self.starts, end - min_overlap + 1e-9, side="right")
+            lo = np.searchsorted(self.max_end[:hi], start + min_overlap - 1e-9, side="left")
+            overlap = np.minimum(self.ends[lo:hi], end) - np.maximum(self.starts[lo:hi], start)
+            idx = lo + np.flatnonzero(overlap >= min_overlap)
+        return np.sort(self.order[idx])
+
+    def any_overlap(self, starts, ends):
+        """질의 구간들 [starts[i], ends[i]) 각각이 어떤 구간과든 겹치는지 (bool 배열, 질의 전체를 한 번에 계산)"""
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        if len(self.starts) == 0:
+            return np.zeros(starts.shape, dtype=bool)
+        # 질의 end보다 먼저 시작한 구간들 중 end 최대값이 질의 start보다 크면 겹침
+        hi = np.searchsorted(self.starts, ends, side="left")
+        return (hi > 0) & (self.max_end[np.maximum(hi - 1, 0)] > starts)
+
+    def starting_in(self, start, end):
+        """시작 시각이 [start, end) 안에 있는 구간의 인덱스 (원래 순서)"""
+        lo = np.searchsorted(self.starts, start, side="left")
+        hi = np.searchsorted(self.starts, end, side="left")
+        return np.sort(self.order[lo:hi])
@@ -1,7 +1,7 @@
 # knapsack_module.py
 import json
 import numpy as np
-import h5py
+from feature_store import open_features
 from sklearn.metrics.pairwise import cosine_similarity
 
 def load_file(json_filename):
@@ -13,17 +13,17 @@ def load_file(json_filename):
 def get_segment_average_vectors(h5_filename, segments, fps):
     """
     H5 파일에서 프레임 feature를 불러와서 각 세그먼트별 평균 벡터를 계산
+    (전체 features를 메모리에 올리지 않고 세그먼트 구간의 행만 읽음)
     """
-    with h5py.File(h5_filename, 'r') as f:
-        features = f['features'][:]  # shape: (num_frames, feature_dim)
     segment_avg_dict = {}
-    for seg in segments:
-        start_time = seg['start_time']
-        end_time = seg['end_time']
-        start_frame = int(start_time * fps)
-        end_frame = int(end_time * fps)
-        seg_vector = np.mean(features[start_frame:end_frame+1], axis=0)
-        segment_avg_dict[seg['segment_id']] = seg_vector
+    with open_features(h5_filename) as features:  # shape: (num_frames, feature_dim)
+        for seg in segments:
+            start_time = seg['start_time']
+            end_time = seg['end_time']
+            start_frame = int(start_time * fps)
+            end_frame = int(end_time * fps)
+            seg_vector = np.mean(np.asarray(features[start_frame:end_frame+1], dtype=np.float32), axis=0)
+            segment_avg_dict[seg['segment_id']] = seg_vector
     return segment_avg_dict
 
 def greedy_submodular_knapsack_selection(segment_ids, segment_vectors, importance, sorted_combined, budget_time, weight=1.0):
@@ -233,16 +233,28 @@ class Solver(object):
         """
         for name, param in net.named_parameters():
             if 'weight' in name and "norm" not in name:
-                if init_type == "normal":
-                    nn.init.normal_(param, mean=0.0, std=init_gain)
-                elif init_type == "xavier":
-                    nn.init.xavier_uniform_(param, gain=np.sqrt(2.0))  # ReLU activation function
-                elif init_type == "kaiming":
-                    nn.init.kaiming_uniform_(param, mode="fan_in", nonlinearity="relu")
-                elif init_type == "orthogonal":
-                    nn.init.orthogonal_(param, gain=np.sqrt(2.0))      # ReLU activation function
-                else:
-                    raise NotImplementedError(f"initialization method {init_type} is not implemented.")
+                # The packed QKV weight of the fused attention is initialized per (Q/K/V, head) block,
+                # i.e. with the same fan-in/fan-out as the separate per-head Linear layers
+                blocks = [param.data]
+                if name.endswith("qkv.weight"):
+                    blocks = param.data.chunk(3 * net.get_submodule(name.rsplit('.', 2)[0]).heads, dim=0)
+                # The stacked local attention weights (SegmentedSelfAttention) are initialized per segment, the same way
+                elif name.endswith("qkv_weight"):
+                    heads = net.get_submodule(name.rsplit('.', 1)[0]).heads
+                    blocks = [block for segment in param.data for block in segment.chunk(3 * heads, dim=0)]
+                elif name.endswith("out_weight"):
+                    blocks = list(param.data)
+                for block in blocks:
+                    if init_type == "normal":
+                        nn.init.normal_(block, mean=0.0, std=init_gain)
+                    elif init_type == "xavier":
+                        nn.init.xavier_uniform_(block, gain=np.sqrt(2.0))  # ReLU activation function
+                    elif init_type == "kaiming":
+                        nn.init.kaiming_uniform_(block, mode="fan_in", nonlinearity="relu")
+                    elif init_type == "orthogonal":
+                        nn.init.orthogonal_(block, gain=np.sqrt(2.0))      # ReLU activation function
+                    else:
+                        raise NotImplementedError(f"initialization method {init_type} is not implemented.")
             elif 'bias' in name:
                 nn.init.constant_(param, 0.1)
 
@@ -0,0 +1,263 @@
+# model_store.py
+# 네트워크 없이 모델 가중치를 불러오기 위한 로컬 모델 저장소
+#  - <store>/manifest.json: 모델 이름 -> 파일(또는 디렉토리) 경로, sha256, 크기, 출처
+#  - <store>/verified.json: 검증한 파일의 (sha256, 크기, 수정 시각) 기록 -> 파일이 바뀌지 않았으면 다시 해시하지 않음
+#  - python model_store.py --populate 로 한 번 채워 두면 이후 로더는 허브 / 다운로드 없이 저장소에서 로드
+#  - VIDEOSUMMARY_OFFLINE=1이면 저장소에 없는 모델은 네트워크로 받지 않고 오류
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import torch
+
+MANIFEST_FILE = "manifest.json"
+VERIFIED_FILE = "verified.json"
+SILERO_VAD_REPO = "snakers4/silero-vad"
+WHISPER_SIZES = ["tiny", "base", "small", "medium", "large"]
+TORCHVISION_MODELS = {
+    "inception_v3": "Inception_V3_Weights",
+    "mobilenet_v3_large": "MobileNet_V3_Large_Weights",
+    "efficientnet_b0": "EfficientNet_B0_Weights",
+}
+
+# 이번 프로세스에서 이미 검증한 모델 (같은 작업에서 여러 번 로드해도 stat 한 번)
+_verified_in_process = {}
+
+def store_dir():
+    """VIDEOSUMMARY_MODEL_STORE, 없으면 VIDEOSUMMARY_CACHE(기본 ~/.cache/videosummary)/models"""
+    cache_dir = os.environ.get("VIDEOSUMMARY_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "videosummary"))
+    return os.environ.get("VIDEOSUMMARY_MODEL_STORE", os.path.join(cache_dir, "models"))
+
+def offline():
+    return os.environ.get("VIDEOSUMMARY_OFFLINE", "0") not in ("", "0", "false", "False")
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_json(path, data):
+    # 쓰다가 죽어도 기존 파일이 깨지지 않도록 임시 파일에 쓰고 교체
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+
+def _files(path):
+    # 디렉토리면 안의 모든 파일 (상대 경로 순으로 정렬, 캐시 파일 제외)
+    if os.path.isfile(path):
+        return [path]
+    files = []
+    for root, dirs, names in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in ("__pycache__", ".git"))
+        files.extend(os.path.join(root, name) for name in sorted(names) if not name.endswith(".pyc"))
+    return files
+
+def _fingerprint(path):
+    # 다시 해시할지 판단하는 값: 파일별 (상대 경로, 크기, 수정 시각)
+    return [[os.path.relpath(f, path), os.path.getsize(f), os.stat(f).st_mtime_ns] for f in _files(path)]
+
+def file_sha256(path):
+    """파일 sha256. 디렉토리면 (상대 경로 + 내용)을 정렬된 순서로 이어 붙인 sha256"""
+    digest = hashlib.sha256()
+    for f in _files(path):
+        if os.path.isdir(path):
+            digest.update(os.path.relpath(f, path).replace(os.sep, "/").encode())
+        with open(f, "rb") as fp:
+            for block in iter(lambda: fp.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def resolve(name, root=None):
+    """
+    저장소에 있는 모델의 경로 (manifest에 없으면 None)
+    처음 쓸 때 sha256을 manifest와 비교하고 verified.json에 기록해 두며, 이후에는 파일이 그대로면 해시를 생략
+    체크섬이 다르면 RuntimeError
+    """
+    root = root or store_dir()
+    entry = _read_json(os.path.join(root, MANIFEST_FILE)).get("models", {}).get(name)
+    if entry is None:
+        return None
+    path = os.path.join(root, entry["path"])
+    if _verified_in_process.get((root, name)) == entry["sha256"]:
+        return path
+    if not os.path.exists(path):
+        raise RuntimeError(f"모델 저장소에 {name} 파일이 없습니다: {path} (model_store.py --populate로 다시 채우세요)")
+
+    verified_path = os.path.join(root, VERIFIED_FILE)
+    verified = _read_json(verified_path)
+    fingerprint = _fingerprint(path)
+    record = verified.get(name)
+    if record is None or record["sha256"] != entry["sha256"] or record["fingerprint"] != fingerprint:
+        print(f"🔐 모델 저장소 검증 중: {name}", flush=True)
+        if file_sha256(path) != entry["sha256"]:
+            raise RuntimeError(f"모델 저장소의 {name} 체크섬이 manifest와 다릅니다: {path}")
+        verified[name] = {"sha256": entry["sha256"], "fingerprint": fingerprint}
+        _write_json(verified_path, verified)
+    _verified_in_process[(root, name)] = entry["sha256"]
+    return path
+
+def _missing(name):
+    # 저장소에 없는 모델: 오프라인이면 오류, 아니면 기존 방식(허브 / 다운로드)으로 로드
+    if offline():
+        raise RuntimeError(f"오프라인 모드인데 모델 저장소({store_dir()})에 {name}이(가) 없습니다. "
+                           f"model_store.py --populate로 미리 채우세요.")
+
+def load_silero_vad():
+    """Silero VAD (model, utils). 저장소의 허브 저장소 사본에서 로컬로 로드"""
+    path = resolve("silero_vad")
+    if path is not None:
+        return torch.hub.load(repo_or_dir=path, model="silero_vad", source="local", trust_repo=True)
+    _missing("silero_vad")
+    return torch.hub.load(repo_or_dir=SILERO_VAD_REPO, model="silero_vad", trust_repo=True)
+
+def whisper_model(size):
+    """whisper.load_model에 넘길 값: 저장소의 체크포인트 경로 (경로로 넘기면 whisper가 매번 해시하지 않음), 없으면 size"""
+    path = resolve(f"whisper_{size}")
+    if path is not None:
+        return path
+    _missing(f"whisper_{size}")
+    return size
+
+def faster_whisper_model(size):
+    """faster_whisper.WhisperModel에 넘길 값: 저장소의 CTranslate2 모델 디렉토리, 없으면 size (Hugging Face에서 받음)"""
+    path = resolve(f"faster_whisper_{size}")
+    if path is not None:
+        return path
+    _missing(f"faster_whisper_{size}")
+    return size
+
+def load_torchvision_model(name):
+    """분류기가 붙은 사전학습 torchvision 모델 (eval 전). 저장소의 가중치로 만들고, 없으면 weights="DEFAULT" """
+    from torchvision import models
+    path = resolve(name)
+    if path is None:
+        _missing(name)
+        return getattr(models, name)(weights="DEFAULT")
+    weights = getattr(models, TORCHVISION_MODELS[name]).DEFAULT
+    kwargs = {"num_classes": len(weights.meta["categories"])}
+    if name == "inception_v3":
+        # weights를 줄 때 torchvision이 바꾸는 설정과 같게
+        kwargs.update(aux_logits=True, transform_input=True, init_weights=False)
+    model = getattr(models, name)(weights=None, **kwargs)
+    model.load_state_dict(torch.load(path, map_location="cpu"))
+    return model
+
+def transnetv2_model_dir():
+    """TransNetV2(model_dir=...)에 넘길 값: 저장소의 SavedModel 디렉토리, 없으면 None (패키지에 들어 있는 가중치 사용)"""
+    path = resolve("transnetv2")
+    if path is None:
+        _missing("transnetv2")
+    return path
+
+def _transnetv2_package_weights():
+    # transnetv2 패키지에 들어 있는 SavedModel 디렉토리 (import하면 TensorFlow를 불러오므로 위치만 찾음)
+    spec = importlib.util.find_spec("transnetv2")
+    if spec is None or not spec.origin:
+        raise RuntimeError("transnetv2 패키지를 찾을 수 없습니다.")
+    return os.path.join(os.path.dirname(spec.origin), "transnetv2-weights")
+
+# 저장소 채우기 (네트워크가 되는 곳에서 한 번 실행)
+def _add(manifest, root, name, rel_path, source):
+    path = os.path.join(root, rel_path)
+    manifest.setdefault("models", {})[name] = {
+        "path": rel_path,
+        "sha256": file_sha256(path),
+        "size": sum(os.path.getsize(f) for f in _files(path)),
+        "source": source,
+    }
+    print(f"✅ {name}: {rel_path}")
+
+def populate(root=None, whisper_sizes=("base",), torchvision_names=("inception_v3",), silero_vad=True, transnetv2=True,
+             faster_whisper_sizes=()):
+    """필요한 모델을 받아 저장소에 넣고 manifest / 검증 기록 갱신"""
+    root = root or store_dir()
+    os.makedirs(root, exist_ok=True)
+    manifest = _read_json(os.path.join(root, MANIFEST_FILE))
+
+    if silero_vad:
+        torch.hub.load(repo_or_dir=SILERO_VAD_REPO, model="silero_vad", trust_repo=True)
+        owner, repo = SILERO_VAD_REPO.split("/")
+        hub_dir = next(os.path.join(torch.hub.get_dir(), d) for d in os.listdir(torch.hub.get_dir())
+                       if d.startswith(f"{owner}_{repo}_"))
+        target = os.path.join(root, "silero-vad")
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        shutil.copytree(hub_dir, target, ignore=shutil.ignore_patterns(".git", "__pycache__", "*.pyc"))
+        _add(manifest, root, "silero_vad", "silero-vad", f"torch.hub:{SILERO_VAD_REPO}")
+
+    for size in whisper_sizes:
+        import whisper
+        url = whisper._MODELS[size]
+        whisper_dir = os.path.join(root, "whisper")
+        whisper._download(url, whisper_dir, in_memory=False)
+        _add(manifest, root, f"whisper_{size}", os.path.join("whisper", os.path.basename(url)), url)
+
+    for size in faster_whisper_sizes:
+        from faster_whisper import download_model
+        rel_path = os.path.join("faster-whisper", size)
+        download_model(size, output_dir=os.path.join(root, rel_path))
+        _add(manifest, root, f"faster_whisper_{size}", rel_path, f"faster_whisper.download_model:{size}")
+
+    for name in torchvision_names:
+        from torchvision import models
+        weights = getattr(models, TORCHVISION_MODELS[name]).DEFAULT
+        torchvision_dir = os.path.join(root, "torchvision")
+        torch.hub.load_state_dict_from_url(weights.url, model_dir=torchvision_dir, progress=True)
+        _add(manifest, root, name, os.path.join("torchvision", os.path.basename(weights.url)), weights.url)
+
+    if transnetv2:
+        # TransNetV2는 TensorFlow SavedModel 디렉토리를 통째로 복사 (manifest에는 디렉토리 내용 전체의 sha256)
+        target = os.path.join(root, "transnetv2")
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        shutil.copytree(_transnetv2_package_weights(), target)
+        _add(manifest, root, "transnetv2", "transnetv2", "transnetv2 package (transnetv2-weights)")
+
+    _write_json(os.path.join(root, MANIFEST_FILE), manifest)
+    for name in manifest.get("models", {}):
+        resolve(name, root)
+    print(f"📦 모델 저장소 준비 완료: {root}")
+    return manifest
+
+def verify(root=None):
+    """저장소 전체를 다시 해시해 검증 (검증 기록 무시). 실패한 모델 이름 목록 반환"""
+    root = root or store_dir()
+    manifest = _read_json(os.path.join(root, MANIFEST_FILE))
+    failed = []
+    verified = {}
+    for name, entry in manifest.get("models", {}).items():
+        path = os.path.join(root, entry["path"])
+        if os.path.exists(path) and file_sha256(path) == entry["sha256"]:
+            verified[name] = {"sha256": entry["sha256"], "fingerprint": _fingerprint(path)}
+            print(f"✅ {name}")
+        else:
+            failed.append(name)
+            print(f"❌ {name}: 파일이 없거나 체크섬이 다릅니다 ({path})")
+    _write_json(os.path.join(root, VERIFIED_FILE), verified)
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--store", default=None, help="모델 저장소 디렉토리 (기본: VIDEOSUMMARY_MODEL_STORE 또는 캐시 디렉토리/models)")
+    parser.add_argument("--populate", action="store_true", help="모델을 받아 저장소를 채움 (네트워크 필요)")
+    parser.add_argument("--verify", action="store_true", help="저장소 전체 체크섬 재검증")
+    parser.add_argument("--whisper_sizes", nargs="*", default=["base"], choices=WHISPER_SIZES)
+    parser.add_argument("--faster_whisper_sizes", nargs="*", default=[], choices=WHISPER_SIZES,
+                        help="faster-whisper 백엔드용 CTranslate2 모델 크기")
+    parser.add_argument("--backbones", nargs="*", default=["inception_v3"], choices=list(TORCHVISION_MODELS))
+    parser.add_argument("--skip_silero_vad", action="store_true")
+    parser.add_argument("--skip_transnetv2", action="store_true")
+    args = parser.parse_args()
+
+    if args.populate:
+        populate(args.store, whisper_sizes=args.whisper_sizes, torchvision_names=args.backbones,
+                 silero_vad=not args.skip_silero_vad, transnetv2=not args.skip_transnetv2,
+                 faster_whisper_sizes=args.faster_whisper_sizes)
+    if args.verify or not args.populate:
+        failed = verify(args.store)
+        if failed:
+            raise SystemExit(1)
@@ -0,0 +1,40 @@
+import torch
+import torch.nn as nn
+
+class FeatureAdapter(nn.Module):
+    """
+    경량 백본(MobileNetV3 / EfficientNet-B0 등)의 풀링 특징을
+    PGL_SUM이 입력으로 받는 1024차원(InceptionV3 + PCA) 공간으로 옮기는 투영 헤드
+    선형 투영(skip) + 2층 MLP 보정항의 합
+    """
+
+    def __init__(self, in_size, out_size=1024, h_size=1024, dropout=0.1):
+
+        super(FeatureAdapter, self).__init__()
+
+        self.in_size = in_size
+        self.out_size = out_size
+
+        self.norm = nn.LayerNorm(in_size)
+        self.skip = nn.Linear(in_size, out_size)
+        self.mlp = nn.Sequential(
+            nn.Linear(in_size, h_size),
+            nn.GELU(),
+            nn.Dropout(dropout),
+            nn.Linear(h_size, out_size),
+        )
+
+        self.initialize_weights()
+
+    def forward(self, x):
+        x = self.norm(x)
+        return self.skip(x) + self.mlp(x)
+
+    def initialize_weights(self):
+        for m in self.modules():
+            if isinstance(m, nn.Linear):
+                nn.init.xavier_uniform_(m.weight)
+                if m.bias is not None:
+                    nn.init.zeros_(m.bias)
+        # 학습 초기에 보정항이 선형 투영을 흔들지 않도록 마지막 층은 0에서 시작
+        nn.init.zeros_(self.mlp[-1].weight)
@@ -1,10 +1,57 @@
 #attention.py
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import numpy as np
+import math
+import threading
+from collections import OrderedDict
+
+# Positional encodings shared by every SelfAttention (all heads, the global and the local modules), keyed by
+# (kind, T, freq, d, device, dtype). Least recently used entries are evicted once the cache holds more than
+# ENCODING_CACHE_MAX_BYTES (the most recent entry is always kept; a [10800, 10800] fp32 encoding is ~466 MB).
+ENCODING_CACHE_MAX_BYTES = 1 << 30
+_encoding_cache = OrderedDict()
+_encoding_cache_lock = threading.Lock()
+
+def _cached_encoding(key, build):
+    # while tracing (torch.compile / torch.export / jit) the result is a traced tensor and must not be shared
+    if torch.compiler.is_compiling() or torch.jit.is_tracing():
+        return build()
+    with _encoding_cache_lock:
+        if key in _encoding_cache:
+            _encoding_cache.move_to_end(key)
+            return _encoding_cache[key]
+    encoding = build()
+    with _encoding_cache_lock:
+        _encoding_cache[key] = encoding
+        total = sum(t.numel() * t.element_size() for t in _encoding_cache.values())
+        while total > ENCODING_CACHE_MAX_BYTES and len(_encoding_cache) > 1:
+            _, evicted = _encoding_cache.popitem(last=False)
+            total -= evicted.numel() * evicted.element_size()
+    return encoding
+
+def clear_encoding_cache():
+    with _encoding_cache_lock:
+        _encoding_cache.clear()
+
+def absolute_position_rows(start, stop, T, freq, d, device, dtype):
+    """Rows [start, stop) of the [T, T] absolute positional encoding (see SelfAttention.getAbsolutePosition)."""
+    pos = torch.arange(start, stop, device=device).unsqueeze(1)
+    i = torch.arange(T//2, device=device).unsqueeze(0)
+
+    AP = torch.zeros(stop - start, T, device=device)
+    AP[:, 0:2*(T//2):2] = torch.sin(pos / freq ** ((2 * i) / d))
+    AP[:, 1:2*(T//2):2] = torch.cos(pos / freq ** ((2 * i) / d))
+    return AP.to(dtype)
+
+def absolute_position(T, freq, d, device, dtype):
+    """The full [T, T] absolute positional encoding, through the encoding cache (do not modify in place)."""
+    return _cached_encoding(("absolute", T, freq, d, device, dtype),
+                            lambda: absolute_position_rows(0, T, T, freq, d, device, dtype))
 
 class SelfAttention(nn.Module):
-    def __init__(self, input_size=1024, output_size=1024, freq=10000, heads=1, pos_enc=None):
+    def __init__(self, input_size=1024, output_size=1024, freq=10000, heads=1, pos_enc=None, fused=True):
         """ The basic (multi-head) Attention 'cell' containing the learnable parameters of Q, K and V
 
         :param int input_size: Feature input size of Q, K, V.
@@ -12,6 +59,8 @@ class SelfAttention(nn.Module):
         :param int freq: The frequency of the sinusoidal positional encoding.
         :param int heads: Number of heads for the attention module.
         :param str | None pos_enc: The type of the positional encoding [supported: Absolute, Relative].
+        :param bool fused: Use a single QKV projection and batch all heads in one matmul (default). The per-head
+                           Wk/Wq/Wv weights of existing checkpoints are packed into `qkv` when the state dict is loaded.
         """
         super(SelfAttention, self).__init__()
 
@@ -25,66 +74,80 @@ class SelfAttention(nn.Module):
         self.heads = heads
         self.pos_enc = pos_enc
         self.freq = freq
-        self.Wk, self.Wq, self.Wv = nn.ModuleList(), nn.ModuleList(), nn.ModuleList()
-        for _ in range(self.heads):
-            self.Wk.append(nn.Linear(in_features=input_size, out_features=output_size//heads, bias=False))
-            self.Wq.append(nn.Linear(in_features=input_size, out_features=output_size//heads, bias=False))
-            self.Wv.append(nn.Linear(in_features=input_size, out_features=output_size//heads, bias=False))
+        self.fused = fused
+        if self.fused:
+            # rows: [Q of head 0..H-1, K of head 0..H-1, V of head 0..H-1]
+            self.qkv = nn.Linear(in_features=input_size, out_features=3 * heads * (output_size//heads), bias=False)
+        else:
+            self.Wk, self.Wq, self.Wv = nn.ModuleList(), nn.ModuleList(), nn.ModuleList()
+            for _ in range(self.heads):
+                self.Wk.append(nn.Linear(in_features=input_size, out_features=output_size//heads, bias=False))
+                self.Wq.append(nn.Linear(in_features=input_size, out_features=output_size//heads, bias=False))
+                self.Wv.append(nn.Linear(in_features=input_size, out_features=output_size//heads, bias=False))
         self.out = nn.Linear(in_features=output_size, out_features=input_size, bias=False)
 
         self.softmax = nn.Softmax(dim=-1)
         self.drop = nn.Dropout(p=0.5)
 
+        # Inference-only settings (see `_chunked_forward`), changed through PGL_SUM.set_inference_attention
+        self.query_chunk = None
+        self.return_weights = True
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """Convert between the per-head (Wq/Wk/Wv.{h}.weight) and the packed (qkv.weight) layout before loading."""
+        head_keys = [f"{prefix}{name}.{head}.weight" for name in ("Wq", "Wk", "Wv") for head in range(self.heads)]
+        if self.fused and all(key in state_dict for key in head_keys):
+            state_dict[f"{prefix}qkv.weight"] = torch.cat([state_dict.pop(key) for key in head_keys], dim=0)
+        elif not self.fused and f"{prefix}qkv.weight" in state_dict:
+            for key, weight in zip(head_keys, state_dict.pop(f"{prefix}qkv.weight").chunk(3 * self.heads, dim=0)):
+                state_dict[key] = weight
+        super(SelfAttention, self)._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
     def getAbsolutePosition(self, T):
         """Calculate the sinusoidal positional encoding based on the absolute position of each considered frame.
         Based on 'Attention is all you need' paper (https://arxiv.org/abs/1706.03762)
 
         :param int T: Number of frames contained in Q, K and V
-        :return: Tensor with shape [T, T]
+        :return: Tensor with shape [T, T] (shared through the encoding cache, do not modify in place)
         """
-        freq = self.freq
-        d = self.input_size
-
-        pos = torch.tensor([k for k in range(T)], device=self.out.weight.device)
-        i = torch.tensor([k for k in range(T//2)], device=self.out.weight.device)
+        return absolute_position(T, self.freq, self.input_size, self.out.weight.device, self.out.weight.dtype)
 
-        # Reshape tensors each pos_k for each i indices
-        pos = pos.reshape(pos.shape[0], 1)
-        pos = pos.repeat_interleave(i.shape[0], dim=1)
-        i = i.repeat(pos.shape[0], 1)
+    def _absolute_position_rows(self, start, stop, T):
+        """Rows [start, stop) of getAbsolutePosition(T), built without the full [T, T] matrix (not cached).
 
-        AP = torch.zeros(T, T, device=self.out.weight.device)
-        AP[pos, 2*i] = torch.sin(pos / freq ** ((2 * i) / d))
-        AP[pos, 2*i+1] = torch.cos(pos / freq ** ((2 * i) / d))
-        return AP
+        :return: Tensor with shape [stop - start, T]
+        """
+        return absolute_position_rows(start, stop, T, self.freq, self.input_size,
+                                      self.out.weight.device, self.out.weight.dtype)
 
     def getRelativePosition(self, T):
         """Calculate the sinusoidal positional encoding based on the relative position of each considered frame.
         r_pos calculations as here: https://theaisummer.com/positional-embeddings/
 
         :param int T: Number of frames contained in Q, K and V
-        :return: Tensor with shape [T, T]
+        :return: Tensor with shape [T, T] (shared through the encoding cache, do not modify in place)
         """
         freq = self.freq
-        d = 2 * T
-        min_rpos = -(T - 1)
+        device, dtype = self.out.weight.device, self.out.weight.dtype
 
-        i = torch.tensor([k for k in range(T)], device=self.out.weight.device)
-        j = torch.tensor([k for k in range(T)], device=self.out.weight.device)
+        def build():
+            d = 2 * T
+            min_rpos = -(T - 1)
 
-        # Reshape tensors each i for each j indices
-        i = i.reshape(i.shape[0], 1)
-        i = i.repeat_interleave(i.shape[0], dim=1)
-        j = j.repeat(i.shape[0], 1)
+            # i: row index, j: column index of every (i, j) pair
+            i = torch.arange(T, device=device).unsqueeze(1)
+            j = torch.arange(T, device=device).unsqueeze(0)
 
-        # Calculate the relative positions
-        r_pos = j - i - min_rpos
+            # Calculate the relative positions
+            r_pos = j - i - min_rpos
 
-        RP = torch.zeros(T, T, device=self.out.weight.device)
-        idx = torch.tensor([k for k in range(T//2)], device=self.out.weight.device)
-        RP[:, 2*idx] = torch.sin(r_pos[:, 2*idx] / freq ** ((i[:, 2*idx] + j[:, 2*idx]) / d))
-        RP[:, 2*idx+1] = torch.cos(r_pos[:, 2*idx+1] / freq ** ((i[:, 2*idx+1] + j[:, 2*idx+1]) / d))
-        return RP
+            RP = torch.zeros(T, T, device=device)
+            even, odd = slice(0, 2*(T//2), 2), slice(1, 2*(T//2), 2)
+            RP[:, even] = torch.sin(r_pos[:, even] / freq ** ((i + j[:, even]) / d))
+            RP[:, odd] = torch.cos(r_pos[:, odd] / freq ** ((i + j[:, odd]) / d))
+            return RP.to(dtype)
+
+        return _cached_encoding(("relative", T, freq, device, dtype), build)
 
     def forward(self, x, mask=None):
         """ Compute the weighted frame features, based on either the global or local (multi-head) attention mechanism.
@@ -92,6 +155,12 @@ class SelfAttention(nn.Module):
         :param torch.tensor x: Frame features with shape [BS, seq, dim]
         
         """
+        if self.fused and self.query_chunk and not self.training:
+            # the relative encoding is sized by the batch dimension; only a [1, 1] encoding broadcasts per chunk
+            if self.pos_enc != "relative" or x.shape[0] == 1:
+                return self._chunked_forward(x, mask)
+        if self.fused:
+            return self._fused_forward(x, mask)
         bs = x.shape[0]
         n = x.shape[1]  # sequence length
         dim = x.shape[2]
@@ -134,6 +203,217 @@ class SelfAttention(nn.Module):
         y = self.out(torch.cat(outputs, dim=2))
         return y, att_weights.clone()  # for now we don't deal with the weights (probably max or avg pooling)
 
+    def _fused_forward(self, x, mask=None):
+        """ Same computation as the per-head loop, with one QKV projection and all heads batched as [BS, heads, seq, seq].
+
+        :param torch.tensor x: Frame features with shape [BS, seq, dim]
+        """
+        bs, n = x.shape[0], x.shape[1]
+
+        # [3, BS, heads, seq, dim_head]
+        Q, K, V = self.qkv(x).view(bs, n, 3, self.heads, -1).permute(2, 0, 3, 1, 4)
+
+        energies = torch.matmul(Q, K.transpose(-1, -2))
+        if self.pos_enc is not None:
+            if self.pos_enc == "absolute":
+                AP = self.getAbsolutePosition(T=energies.shape[-1])
+                energies = energies + AP
+            elif self.pos_enc == "relative":
+                # as in the per-head loop, T is taken from the batch dimension
+                RP = self.getRelativePosition(T=energies.shape[0])
+                energies = energies + RP
+
+        if mask is not None:
+            mask2 = mask.unsqueeze(-1)
+            mask2_t = mask2.transpose(2,1)
+            attention_mask = torch.matmul(mask2.float(), mask2_t.float()).bool()
+            energies = energies.masked_fill_(~attention_mask.unsqueeze(1), -1e9)
+
+        att_weights = self.softmax(energies)
+        _att_weights = self.drop(att_weights)
+
+        # per head: (V^T A)^T = A^T V, then concatenate the heads -> [BS, seq, heads * dim_head]
+        y = torch.matmul(_att_weights.transpose(-1, -2), V)
+        y = self.out(y.transpose(1, 2).reshape(bs, n, -1))
+        return y, att_weights[:, -1].clone()  # weights of the last head, as in the per-head loop
+
+    def _chunked_forward(self, x, mask=None):
+        """ Inference-only version of `_fused_forward` that processes `query_chunk` query rows at a time, so the
+        largest intermediate is [BS, heads, query_chunk, seq] instead of [BS, heads, seq, seq]. No [seq, seq]
+        mask or positional encoding is built.
+
+        Every softmax row is complete inside its chunk, and since the output is A^T V (each query row i adds
+        A[i, j] * V[i] to output frame j) the chunks are summed. The result matches `_fused_forward` up to
+        floating point summation order. The attention weights (last head) are only assembled when
+        `return_weights` is set; otherwise None is returned in their place.
+
+        :param torch.tensor x: Frame features with shape [BS, seq, dim]
+        """
+        bs, n = x.shape[0], x.shape[1]
+
+        # [3, BS, heads, seq, dim_head]
+        Q, K, V = self.qkv(x).view(bs, n, 3, self.heads, -1).permute(2, 0, 3, 1, 4)
+        K_t = K.transpose(-1, -2)
+
+        # (mask_i * mask_j != 0) is the same as the [seq, seq] mask of `_fused_forward`; skipped when nothing is masked
+        valid = None
+        if mask is not None:
+            valid = mask != 0
+            if bool(valid.all()):
+                valid = None
+        RP = None
+        if self.pos_enc == "relative":
+            RP = self.getRelativePosition(T=bs)  # [1, 1], as in the per-head loop
+
+        y = torch.zeros_like(V)
+        att_weights = x.new_empty(bs, n, n) if self.return_weights else None
+        for start in range(0, n, self.query_chunk):
+            stop = min(start + self.query_chunk, n)
+            energies = torch.matmul(Q[:, :, start:stop], K_t)  # [BS, heads, chunk, seq]
+            if self.pos_enc == "absolute":
+                energies = energies + self._absolute_position_rows(start, stop, n)
+            elif RP is not None:
+                energies = energies + RP
+            if valid is not None:
+                chunk_mask = valid[:, start:stop, None] & valid[:, None, :]
+                energies = energies.masked_fill_(~chunk_mask.unsqueeze(1), -1e9)
+
+            chunk_weights = self.softmax(energies)
+            y += torch.matmul(chunk_weights.transpose(-1, -2), V[:, :, start:stop])
+            if att_weights is not None:
+                att_weights[:, start:stop] = chunk_weights[:, -1]
+
+        y = self.out(y.transpose(1, 2).reshape(bs, n, -1))
+        return y, att_weights
+
+
+class SegmentedSelfAttention(nn.Module):
+    def __init__(self, num_segments, input_size=1024, output_size=1024, freq=10000, heads=1, pos_enc=None):
+        """ `num_segments` independent SelfAttention modules, one per contiguous segment of the sequence, computed as
+        a single batched operation with stacked weights (the local attention of PGL-SUM). The sequence is split into
+        segments of ceil(seq / num_segments) frames, the last one(s) zero padded, and processed as
+        [BS, num_segments, segment, dim]. Padding is excluded exactly: padded keys get the lowest finite value before
+        the softmax (zero weight, also for rows that are fully masked by `mask`) and padded queries have V = 0.
+
+        :param int num_segments: Number of segments (and of stacked attention modules).
+        :param int input_size: Feature input size of Q, K, V.
+        :param int output_size: Feature -hidden- size of Q, K, V (summed over the heads).
+        :param int freq: The frequency of the sinusoidal positional encoding.
+        :param int heads: Number of heads of each segment's attention.
+        :param str | None pos_enc: The type of the positional encoding [supported: Absolute]. The relative encoding
+                                   is sized by the batch dimension, so it only works with separate modules.
+        """
+        super(SegmentedSelfAttention, self).__init__()
+
+        if pos_enc is not None:
+            pos_enc = pos_enc.lower()
+            assert pos_enc == "absolute", "SegmentedSelfAttention supports the absolute encoding only"
+
+        self.num_segments = num_segments
+        self.input_size = input_size
+        self.output_size = output_size
+        self.heads = heads
+        self.pos_enc = pos_enc
+        self.freq = freq
+        # per segment: the packed `qkv` weight of a fused SelfAttention, and its `out` weight
+        self.qkv_weight = nn.Parameter(torch.empty(num_segments, 3 * heads * (output_size//heads), input_size))
+        self.out_weight = nn.Parameter(torch.empty(num_segments, input_size, output_size))
+        for segment in range(num_segments):
+            # same initialization as nn.Linear
+            nn.init.kaiming_uniform_(self.qkv_weight.data[segment], a=np.sqrt(5))
+            nn.init.kaiming_uniform_(self.out_weight.data[segment], a=np.sqrt(5))
+
+        self.softmax = nn.Softmax(dim=-1)
+        self.drop = nn.Dropout(p=0.5)
+
+        # Inference-only settings, as in SelfAttention
+        self.query_chunk = None
+        self.return_weights = True
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """Stack the weights of separate per-segment SelfAttention modules ({segment}.qkv.weight, or the per-head
+        {segment}.Wq/Wk/Wv.{head}.weight, and {segment}.out.weight) before loading."""
+        qkv, out = [], []
+        for segment in range(self.num_segments):
+            seg_prefix = f"{prefix}{segment}."
+            head_keys = [f"{seg_prefix}{name}.{head}.weight" for name in ("Wq", "Wk", "Wv") for head in range(self.heads)]
+            if f"{seg_prefix}qkv.weight" in state_dict:
+                qkv.append(state_dict.pop(f"{seg_prefix}qkv.weight"))
+            elif all(key in state_dict for key in head_keys):
+                qkv.append(torch.cat([state_dict.pop(key) for key in head_keys], dim=0))
+            if f"{seg_prefix}out.weight" in state_dict:
+                out.append(state_dict.pop(f"{seg_prefix}out.weight"))
+        if len(qkv) == self.num_segments:
+            state_dict[f"{prefix}qkv_weight"] = torch.stack(qkv)
+        if len(out) == self.num_segments:
+            state_dict[f"{prefix}out_weight"] = torch.stack(out)
+        super(SegmentedSelfAttention, self)._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
+    def _encoding(self, start, stop, segment_size, lengths):
+        # rows [start, stop) of every segment's absolute encoding: [num_segments, rows, segment_size] or [rows, segment_size]
+        # (a segment of odd length L has a zero column L - 1, which differs from the [segment_size, segment_size] encoding)
+        device, dtype = self.qkv_weight.device, self.qkv_weight.dtype
+        if start == 0 and stop == segment_size:
+            AP = absolute_position(segment_size, self.freq, self.input_size, device, dtype)
+        else:
+            AP = absolute_position_rows(start, stop, segment_size, self.freq, self.input_size, device, dtype)
+        odd = [segment for segment, length in enumerate(lengths) if length < segment_size and length % 2 == 1]
+        if odd:
+            AP = AP.expand(self.num_segments, *AP.shape).clone()
+            for segment in odd:
+                AP[segment, :, lengths[segment] - 1] = 0
+        return AP
+
+    def forward(self, x, mask=None):
+        """ Compute the weighted frame features of every segment's (multi-head) attention.
+
+        :param torch.tensor x: Frame features with shape [BS, seq, dim]
+        :param None | torch.tensor mask: Valid frames with shape [BS, seq]
+        :return: Tensor with shape [BS, seq, dim]; segment s covers frames [s * ceil(seq / num_segments), ...)
+        """
+        bs, n, dim = x.shape
+        S = self.num_segments
+        segment_size = math.ceil(n / S)
+        lengths = [max(0, min(segment_size, n - segment * segment_size)) for segment in range(S)]
+        pad = S * segment_size - n
+
+        # projections as one bmm over the segments: [segments, BS * segment, dim] x [segments, dim, 3 * heads * dim_head]
+        xs = F.pad(x, (0, 0, 0, pad)).view(bs, S, segment_size, dim).transpose(0, 1).reshape(S, bs * segment_size, dim)
+        # [3, BS, segments, heads, segment, dim_head]
+        Q, K, V = torch.bmm(xs, self.qkv_weight.transpose(-1, -2)) \
+            .view(S, bs, segment_size, 3, self.heads, -1).permute(3, 1, 0, 4, 2, 5)
+        K_t = K.transpose(-1, -2)
+
+        valid = None
+        if mask is not None:
+            valid = F.pad(mask != 0, (0, pad), value=True).view(bs, S, segment_size)
+        padded = None
+        if pad:
+            padded = torch.arange(segment_size, device=x.device) >= torch.tensor(lengths, device=x.device).unsqueeze(1)
+
+        # eval with query_chunk: query_chunk rows at a time, as in SelfAttention._chunked_forward
+        rows = self.query_chunk if (self.query_chunk and not self.training) else segment_size
+        y = torch.zeros_like(V)
+        for start in range(0, segment_size, rows):
+            stop = min(start + rows, segment_size)
+            energies = torch.matmul(Q[..., start:stop, :], K_t)  # [BS, segments, heads, rows, segment]
+            if self.pos_enc == "absolute":
+                AP = self._encoding(start, stop, segment_size, lengths)
+                energies = energies + (AP.unsqueeze(1) if AP.dim() == 3 else AP)
+            if valid is not None:
+                chunk_mask = valid[:, :, start:stop, None] & valid[:, :, None, :]
+                energies = energies.masked_fill_(~chunk_mask.unsqueeze(2), -1e9)
+            if padded is not None:
+                energies = energies.masked_fill_(padded[:, None, None, :], torch.finfo(energies.dtype).min)
+
+            att_weights = self.drop(self.softmax(energies))
+            y += torch.matmul(att_weights.transpose(-1, -2), V[..., start:stop, :])
+
+        # [segments, BS * segment, heads * dim_head] -> per segment output projection -> [BS, seq, dim]
+        y = y.permute(1, 0, 3, 2, 4).reshape(S, bs * segment_size, -1)
+        y = torch.bmm(y, self.out_weight.transpose(-1, -2))
+        return y.view(S, bs, segment_size, dim).transpose(0, 1).reshape(bs, S * segment_size, dim)[:, :n]
+
 
 if __name__ == '__main__':
     pass
@@ -3,11 +3,11 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import math
-from networks.pgl_sum.attention import SelfAttention
+from networks.pgl_sum.attention import SelfAttention, SegmentedSelfAttention
 
 class MultiAttention(nn.Module):
     def __init__(self, input_size=1024, output_size=1024, freq=10000, pos_enc=None,
-                 num_segments=None, heads=1, fusion=None):
+                 num_segments=None, heads=1, fusion=None, fused=True, batched_local=True):
         """ Class wrapping the MultiAttention part of PGL-SUM; its key modules and parameters.
 
         :param int input_size: The expected input feature size.
@@ -17,27 +17,46 @@ class MultiAttention(nn.Module):
         :param None | int num_segments: The selected number of segments to split the videos.
         :param int heads: The selected number of global heads.
         :param None | str fusion: The selected type of feature fusion.
+        :param bool fused: Use the fused (single QKV projection, batched heads) SelfAttention.
+        :param bool batched_local: Compute all local attentions as one SegmentedSelfAttention with stacked weights
+                                   (needs `fused`; the relative encoding always uses separate modules).
         """
         super(MultiAttention, self).__init__()
 
         # Global Attention, considering differences among all frames
         self.attention = SelfAttention(input_size=input_size, output_size=output_size,
-                                       freq=freq, pos_enc=pos_enc, heads=heads)
+                                       freq=freq, pos_enc=pos_enc, heads=heads, fused=fused)
 
         self.num_segments = num_segments
+        self.batched_local = batched_local and fused and (pos_enc is None or pos_enc.lower() != "relative")
         if self.num_segments is not None:
             assert self.num_segments >= 2, "num_segments must be None or 2+"
-            self.local_attention = nn.ModuleList()
-            for _ in range(self.num_segments):
-                # Local Attention, considering differences among the same segment with reduce hidden size
-                self.local_attention.append(SelfAttention(input_size=input_size, output_size=output_size//num_segments,
-                                                          freq=freq, pos_enc=pos_enc, heads=4))
+            if self.batched_local:
+                self.local_attention = SegmentedSelfAttention(num_segments, input_size=input_size,
+                                                              output_size=output_size//num_segments,
+                                                              freq=freq, pos_enc=pos_enc, heads=4)
+            else:
+                self.local_attention = nn.ModuleList()
+                for _ in range(self.num_segments):
+                    # Local Attention, considering differences among the same segment with reduce hidden size
+                    self.local_attention.append(SelfAttention(input_size=input_size, output_size=output_size//num_segments,
+                                                              freq=freq, pos_enc=pos_enc, heads=4, fused=fused))
         self.permitted_fusions = ["add", "mult", "avg", "max"]
         self.fusion = fusion
         if self.fusion is not None:
             self.fusion = self.fusion.lower()
             assert self.fusion in self.permitted_fusions, f"Fusion method must be: {*self.permitted_fusions,}"
 
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """Split stacked local attention weights (SegmentedSelfAttention) for separate per-segment modules."""
+        stacked = [f"{prefix}local_attention.{name}" for name in ("qkv_weight", "out_weight")]
+        if self.num_segments is not None and not self.batched_local and all(key in state_dict for key in stacked):
+            qkv, out = (state_dict.pop(key) for key in stacked)
+            for segment in range(self.num_segments):
+                state_dict[f"{prefix}local_attention.{segment}.qkv.weight"] = qkv[segment]
+                state_dict[f"{prefix}local_attention.{segment}.out.weight"] = out[segment]
+        super(MultiAttention, self)._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
     def forward(self, x, mask=None):
         """ Compute the weighted frame features, based on the global and locals (multi-head) attention mechanisms.
 
@@ -51,12 +70,14 @@ class MultiAttention(nn.Module):
         if self.num_segments is not None and self.fusion is not None:
             B = x.shape[0]
             segment_size = math.ceil(x.shape[1] / self.num_segments)
+            if self.batched_local:
+                return self._fuse_batched(weighted_value, x, mask, segment_size), attn_weights
             for segment in range(self.num_segments): # n_seg = 4
                 left_pos = segment * segment_size
                 right_pos = (segment + 1) * segment_size
                 local_x = x[:, left_pos:right_pos]
                 local_mask = None
-                if mask is not None: 
+                if mask is not None:
                     local_mask = mask[:, left_pos:right_pos]
                 weighted_local_value, attn_local_weights = self.local_attention[segment](local_x, local_mask)  # local attentions
 
@@ -77,10 +98,36 @@ class MultiAttention(nn.Module):
 
         return weighted_value, attn_weights
 
+    def _fuse_batched(self, weighted_value, x, mask, segment_size):
+        """ The segment loop of `forward` as whole-tensor operations, with all local attentions computed at once.
+
+        The loop's "Normalize the features vectors" line slices the batch axis (weighted_value[left_pos:right_pos]),
+        so over all segments it normalizes batch items [0, num_segments * segment_size) once each. It is applied here
+        in one call before the fusion, which matches the loop whenever the batch is not larger than segment_size
+        (a single video, or the windows of pgl_module.predict_scores_windowed). The local outputs cover the whole
+        sequence, so the fusion is a single element-wise op over [BS, seq, dim].
+        """
+        local_values = F.normalize(self.local_attention(x, mask), p=2, dim=2)
+        num_normalized = self.num_segments * segment_size
+        weighted_value = torch.cat([F.normalize(weighted_value[:num_normalized], p=2, dim=2),
+                                    weighted_value[num_normalized:]], dim=0)
+
+        if self.fusion == "add":
+            weighted_value = weighted_value + local_values
+        elif self.fusion == "mult":
+            weighted_value = weighted_value * local_values
+        elif self.fusion == "avg":
+            weighted_value = (weighted_value + local_values) / 2
+        elif self.fusion == "max":
+            # element-wise max over the sequence (the loop compares a batch slice with a segment and fails unless
+            # both have the same shape)
+            weighted_value = torch.max(weighted_value, local_values)
+        return weighted_value
+
 
 class PGL_SUM(nn.Module):
     def __init__(self, input_size=1024, output_size=1024, freq=10000, pos_enc=None,
-                 num_segments=None, heads=1, fusion=None):
+                 num_segments=None, heads=1, fusion=None, fused=True, batched_local=True):
         """ Class wrapping the PGL-SUM model; its key modules and parameters.
 
         :param int input_size: The expected input feature size.
@@ -90,11 +137,14 @@ class PGL_SUM(nn.Module):
         :param None | int num_segments: The selected number of segments to split the videos.
         :param int heads: The selected number of global heads.
         :param None | str fusion: The selected type of feature fusion.
+        :param bool fused: Use the fused (single QKV projection, batched heads) SelfAttention.
+        :param bool batched_local: Compute the local attentions as one batched operation with stacked weights.
         """
         super(PGL_SUM, self).__init__()
 
         self.attention = MultiAttention(input_size=input_size, output_size=output_size, freq=freq,
-                                        pos_enc=pos_enc, num_segments=num_segments, heads=heads, fusion=fusion)
+                                        pos_enc=pos_enc, num_segments=num_segments, heads=heads, fusion=fusion,
+                                        fused=fused, batched_local=batched_local)
         self.linear_1 = nn.Linear(in_features=input_size, out_features=input_size)
         self.linear_2 = nn.Linear(in_features=self.linear_1.out_features, out_features=1)
 
@@ -129,6 +179,19 @@ class PGL_SUM(nn.Module):
         y = y.view(bs, -1)
         return y, attn_weights
 
+    def set_inference_attention(self, query_chunk=None, return_weights=True):
+        """ Configure how the (global and local) attention modules run in eval mode.
+
+        :param None | int query_chunk: Compute attention `query_chunk` query rows at a time instead of building the
+                                       dense [seq, seq] energies / mask (None: dense, as in training).
+        :param bool return_weights: Whether to return the attention weights; with False, None is returned instead.
+        """
+        for module in self.modules():
+            if isinstance(module, (SelfAttention, SegmentedSelfAttention)):
+                module.query_chunk = query_chunk
+                module.return_weights = return_weights
+        return self
+
 
 if __name__ == '__main__':
     pass
@@ -0,0 +1,80 @@
+import argparse
+import time
+import torch
+
+from networks.pgl_sum.pgl_sum import PGL_SUM
+
+def build_pgl_sum(fused, device="cpu", batched_local=True):
+    # run_pgl_module과 같은 설정
+    return PGL_SUM(input_size=1024, output_size=1024, num_segments=4, heads=8, fusion="add", pos_enc="absolute",
+                   fused=fused, batched_local=batched_local).to(device).eval()
+
+def load_state(model, state):
+    """strict=False로 로드하되 (run_pgl_module과 동일) 채워지지 않은 파라미터 이름을 반환"""
+    return model.load_state_dict(state, strict=False).missing_keys
+
+@torch.no_grad()
+def _timed_forward(model, x, mask, repeats):
+    model(x, mask)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        scores, attn_weights = model(x, mask)
+    return scores, attn_weights, (time.perf_counter() - start) / repeats
+
+def run_parity_check(ckpt_path=None, lengths=(40, 120, 600, 1800), device="cpu", atol=1e-4, repeats=3, seed=0,
+                     query_chunk=512):
+    """
+    기존 head별 SelfAttention(fused=False, local attention은 세그먼트별 모듈)과 fused SelfAttention,
+    local attention을 한 번에 계산하는 batched local, query_chunk행씩 계산하는 추론용 attention에
+    같은 가중치를 넣고 요약 점수 / attention 가중치 최대 차이와 순전파 시간을 비교
+    ckpt_path가 없으면 임의 가중치 (head별 형식 state dict를 fused 모델이 변환해 로드하는지도 함께 확인)
+    """
+    torch.manual_seed(seed)
+    reference = build_pgl_sum(fused=False, device=device)
+    fused = build_pgl_sum(fused=True, device=device, batched_local=False)
+    batched = build_pgl_sum(fused=True, device=device)
+    chunked = build_pgl_sum(fused=True, device=device).set_inference_attention(query_chunk=query_chunk)
+    if ckpt_path is not None:
+        checkpoint = torch.load(ckpt_path, map_location=device)
+        state = checkpoint.get("model_state_dict", checkpoint)
+    else:
+        state = reference.state_dict()
+    missing = {"reference": load_state(reference, state), "fused": load_state(fused, state),
+               "batched": load_state(batched, state), "chunked": load_state(chunked, state)}
+    all_passed = all(not missing[name] or len(missing[name]) == len(missing["reference"])
+                     for name in ("fused", "batched", "chunked"))
+    for name, keys in missing.items():
+        if keys:
+            print(f"⚠️ {name}: 체크포인트에 없는 파라미터 {len(keys)}개 ({keys[:4]}...)")
+
+    print(f"\n📊 PGL_SUM attention 일치도 (기준: head별 SelfAttention, 허용 오차 {atol})")
+    for length in lengths:
+        # 두 번째 영상은 뒤쪽 1/4을 패딩으로 두어 mask 경로도 확인
+        x = torch.randn(2, length, 1024, device=device)
+        mask = torch.ones(2, length, dtype=torch.bool, device=device)
+        mask[1, length - length // 4:] = False
+        for bs in (1, 2):
+            ref_scores, ref_weights, ref_sec = _timed_forward(reference, x[:bs], mask[:bs], repeats)
+            for name, model in (("fused", fused), ("batched local", batched), (f"chunk {query_chunk}", chunked)):
+                scores, weights, sec = _timed_forward(model, x[:bs], mask[:bs], repeats)
+                score_diff = (ref_scores - scores).abs().max().item()
+                weight_diff = (ref_weights - weights).abs().max().item()
+                passed = score_diff <= atol and weight_diff <= atol
+                all_passed = all_passed and passed
+                print(f"  - T={length}, batch {bs}, {name}: 점수 최대 차이 {score_diff:.2e}, attention 최대 차이 {weight_diff:.2e}, "
+                      f"{ref_sec * 1000:.1f}ms -> {sec * 1000:.1f}ms (x{ref_sec / sec:.2f}) {'✅' if passed else '❌'}")
+    return all_passed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ckpt_path", default=None, help="PGL_SUM 체크포인트 (.pkl). 지정하지 않으면 임의 가중치")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[40, 120, 600, 1800], help="비교할 입력 길이 (1fps 기준 초)")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--atol", type=float, default=1e-4, help="통과 기준 최대 절대 차이")
+    parser.add_argument("--repeats", type=int, default=3, help="시간 측정 반복 횟수")
+    parser.add_argument("--query_chunk", type=int, default=512, help="추론용 chunk attention의 한 번에 계산할 행 수")
+    args = parser.parse_args()
+
+    ok = run_parity_check(args.ckpt_path, lengths=args.lengths, device=args.device, atol=args.atol,
+                          repeats=args.repeats, query_chunk=args.query_chunk)
+    raise SystemExit(0 if ok else 1)
@@ -1,29 +1,108 @@
 # pgl_module.py
 import torch
 import json
+import math
+import multiprocessing
 import numpy as np
-import h5py
 import os
+from concurrent.futures import ProcessPoolExecutor
 from networks.pgl_sum.pgl_sum import PGL_SUM
 from knapsack_module import run_sub_knapsack_pipeline
+from feature_store import load_features
 
-def load_h5_features(h5_path):
-    """H5 파일에서 프레임 특징(feature)을 로드"""
-    with h5py.File(h5_path, "r") as hf:
-        return np.array(hf["features"])
+# 추론 시 attention을 한 번에 계산할 행 수 (prepare_inference 참고)
+DEFAULT_ATTENTION_CHUNK = 512
 
-def predict_scores(model, features, device="cpu"):
-    """모델을 통해 하이라이트 점수를 예측"""
+def load_h5_features(h5_path, start=None, stop=None):
+    """H5 파일에서 프레임 특징(feature)을 로드 (start/stop으로 필요한 행만 읽을 수 있음, float16 저장분은 float32로 변환)"""
+    return load_features(h5_path, start=start, stop=stop)
+
+def _forward_scores(model, features, device):
+    # features: [T, dim] 또는 [B, T, dim] -> [B, T] 점수 (mask는 전부 유효)
     x = torch.from_numpy(features).float().to(device)
     if x.ndim == 2:
         x = x.unsqueeze(0)
     mask = torch.ones((x.shape[0], x.shape[1]), dtype=torch.bool).to(device)
     with torch.no_grad():
         scores, _ = model(x, mask)
-    scores = scores.cpu().numpy().squeeze()
+    return scores.cpu().numpy()
+
+def predict_scores(model, features, device="cpu"):
+    """모델을 통해 하이라이트 점수를 예측"""
+    scores = _forward_scores(model, features, device).squeeze()
     print(f"📊 요약 점수 리스트: {scores} 길이: {len(scores)}")
     return scores
 
+def score_windows(n, window, overlap):
+    """
+    길이 n 시퀀스를 덮는 [start, stop) 윈도우 목록 (간격 window - overlap)
+    마지막 윈도우는 끝에 맞춰 모든 윈도우 길이가 window로 같음 -> padding / mask 없이 한 배치로 묶을 수 있고,
+    윈도우마다 local attention 세그먼트 분할도 따로 돌렸을 때와 같음
+    """
+    if n <= window:
+        return [(0, n)]
+    step = max(1, window - overlap)
+    starts = list(range(0, n - window, step)) + [n - window]
+    return [(start, start + window) for start in starts]
+
+def window_blend_weights(length, overlap, first, last):
+    """윈도우 안 프레임별 합성 가중치: 다른 윈도우와 겹치는 앞 / 뒤 overlap 프레임은 선형 증가 / 감소 (영상 처음과 끝은 1)"""
+    weights = np.ones(length, dtype=np.float32)
+    overlap = min(overlap, length)
+    if overlap > 0:
+        ramp = np.arange(1, overlap + 1, dtype=np.float32) / (overlap + 1)
+        if not first:
+            weights[:overlap] = np.minimum(weights[:overlap], ramp)
+        if not last:
+            weights[length - overlap:] = np.minimum(weights[length - overlap:], ramp[::-1])
+    return weights
+
+_worker_model = None
+_worker_device = None
+
+def _init_pgl_worker(ckpt_path, device, num_threads, attention_chunk):
+    global _worker_model, _worker_device
+    torch.set_num_threads(num_threads)
+    _worker_model = build_pgl_model(ckpt_path, device, attention_chunk)
+    _worker_device = device
+
+def _score_window_batch(windows):
+    return _forward_scores(_worker_model, windows, _worker_device)
+
+def predict_scores_windowed(model, features, device="cpu", window=600, overlap=60, batch_windows=8, executor=None):
+    """
+    features [T, dim]를 길이 window(겹침 overlap)의 윈도우로 나눠 점수를 계산하고 겹치는 구간은 선형 가중 평균으로 합침
+    윈도우 batch_windows개를 한 번의 순전파로 묶고, executor(_init_pgl_worker로 초기화한 프로세스 풀)가 있으면 배치를 병렬로 계산
+    윈도우당 attention 비용이 고정이라 전체 시간은 영상 길이에 선형
+    """
+    n = len(features)
+    windows = score_windows(n, window, overlap)
+    if len(windows) == 1:
+        return predict_scores(model, features, device)
+
+    # MultiAttention의 정규화 슬라이스(weighted_value[left_pos:right_pos])가 batch 축을 세그먼트 크기 단위로 자르므로
+    # batch가 세그먼트 크기 ceil(window / num_segments)를 넘으면 윈도우 점수가 batch 구성에 따라 달라짐 -> 그 이하로 제한
+    num_segments = model.attention.num_segments
+    if num_segments is not None:
+        batch_windows = min(batch_windows, math.ceil(window / num_segments))
+    batch_windows = max(1, batch_windows)
+    batches = [np.stack([features[start:stop] for start, stop in windows[i:i + batch_windows]])
+               for i in range(0, len(windows), batch_windows)]
+    if executor is not None:
+        window_scores = np.concatenate(list(executor.map(_score_window_batch, batches)))
+    else:
+        window_scores = np.concatenate([_forward_scores(model, batch, device) for batch in batches])
+
+    total = np.zeros(n, dtype=np.float64)
+    weight = np.zeros(n, dtype=np.float64)
+    for (start, stop), scores in zip(windows, window_scores):
+        w = window_blend_weights(stop - start, overlap, start == 0, stop == n)
+        total[start:stop] += scores * w
+        weight[start:stop] += w
+    scores = (total / weight).astype(np.float32)
+    print(f"📊 요약 점수 리스트 (윈도우 {len(windows)}개, 길이 {window} / 겹침 {overlap}): {scores} 길이: {len(scores)}")
+    return scores
+
 def load_model_checkpoint(model, ckpt_path, device):
     """체크포인트에서 모델 파라미터 로드"""
     checkpoint = torch.load(ckpt_path, map_location=device)
@@ -33,6 +112,21 @@ def load_model_checkpoint(model, ckpt_path, device):
         model.load_state_dict(checkpoint, strict=False)
     return model
 
+def prepare_inference(model, attention_chunk=DEFAULT_ATTENTION_CHUNK):
+    """
+    추론 설정: attention을 attention_chunk개 행씩 계산하고 가중치는 반환하지 않음 (T x T 행렬을 만들지 않아 긴 영상에서도 메모리 일정)
+    0 / None이면 학습 때와 같은 전체 T x T 계산. autotune도 같은 설정으로 PGL_SUM 시간을 잼
+    """
+    model.eval()
+    model.set_inference_attention(query_chunk=attention_chunk or None, return_weights=False)
+    return model
+
+def build_pgl_model(ckpt_path, device="cpu", attention_chunk=DEFAULT_ATTENTION_CHUNK):
+    """run_pgl_module 설정의 PGL_SUM을 만들어 체크포인트를 로드한 추론용 모델"""
+    model = PGL_SUM(input_size=1024, output_size=1024, num_segments=4, heads=8, fusion="add", pos_enc="absolute")
+    model = load_model_checkpoint(model, ckpt_path, device)
+    return prepare_inference(model.to(device), attention_chunk)
+
 
 def load_scene_segments(scene_json, fps, thr=0.5):
     """
@@ -155,7 +249,12 @@ def run_pgl_module(
     std_weight=0.3,
     top_ratio=0.2,
     importance_weight=0.8,
-    budget_time=None):
+    budget_time=None,
+    attention_chunk=DEFAULT_ATTENTION_CHUNK,
+    score_window=None,
+    window_overlap=60,
+    window_batch=8,
+    window_workers=1):
 
     print(f"🚀 디바이스: {device}")
 
@@ -172,12 +271,25 @@ def run_pgl_module(
 
     # 모델 초기화 및 체크포인트 로드
     
-    model = PGL_SUM(input_size=1024, output_size=1024, num_segments=4, heads=8, fusion="add", pos_enc="absolute")
-    model = load_model_checkpoint(model, ckpt_path, device)
-    model.to(device).eval()
+    model = build_pgl_model(ckpt_path, device, attention_chunk)
 
     features = load_h5_features(feature_h5)
-    scores = predict_scores(model, features, device=device)
+    if score_window and len(features) > score_window:
+        # 슬라이딩 윈도우 점수 (window_workers > 1이면 워커마다 모델 1개, 코어를 나눠 사용)
+        executor = None
+        if window_workers > 1:
+            threads = max(1, (os.cpu_count() or 1) // window_workers)
+            executor = ProcessPoolExecutor(max_workers=window_workers, mp_context=multiprocessing.get_context("spawn"),
+                                           initializer=_init_pgl_worker,
+                                           initargs=(ckpt_path, device, threads, attention_chunk))
+        try:
+            scores = predict_scores_windowed(model, features, device=device, window=score_window,
+                                             overlap=window_overlap, batch_windows=window_batch, executor=executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+    else:
+        scores = predict_scores(model, features, device=device)
 
     scene_segments = load_scene_segments(scene_json, fps, thr=0.5)
     segment_scores = save_segment_frame_scores_json(scores, scene_segments, output_json, fps)
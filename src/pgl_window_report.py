@@ -0,0 +1,88 @@
+import argparse
+import json
+import time
+import numpy as np
+import torch
+
+from networks.pgl_sum.pgl_sum import PGL_SUM
+from pgl_module import build_pgl_model, load_h5_features, predict_scores, predict_scores_windowed
+
+def _ranks(values):
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[np.argsort(values, kind="stable")] = np.arange(len(values))
+    return ranks
+
+def score_agreement(full, windowed, top_ratio=0.2):
+    """
+    전체 시퀀스 점수와 윈도우 점수의 일치도
+    pearson / spearman 상관계수, 최대 / 평균 절대 차이, top_overlap: 전체 기준 상위 top_ratio 프레임 중 윈도우 기준 상위에도 든 비율
+    """
+    full = np.asarray(full, dtype=np.float64)
+    windowed = np.asarray(windowed, dtype=np.float64)
+    k = max(1, int(len(full) * top_ratio))
+    top_full = set(np.argsort(-full, kind="stable")[:k].tolist())
+    top_windowed = set(np.argsort(-windowed, kind="stable")[:k].tolist())
+    return {
+        "pearson": float(np.corrcoef(full, windowed)[0, 1]),
+        "spearman": float(np.corrcoef(_ranks(full), _ranks(windowed))[0, 1]),
+        "max_abs_diff": float(np.abs(full - windowed).max()),
+        "mean_abs_diff": float(np.abs(full - windowed).mean()),
+        "top_overlap": len(top_full & top_windowed) / k,
+    }
+
+def compare_scores(model, features, windows=(300, 600, 1200), overlap=60, batch_windows=8, device="cpu", top_ratio=0.2):
+    """같은 모델로 전체 시퀀스 점수와 윈도우 길이별 점수를 계산해 일치도와 처리 시간 비교"""
+    t0 = time.perf_counter()
+    full = predict_scores(model, features, device)
+    report = {"frames": len(features), "full_sec": time.perf_counter() - t0, "windows": {}}
+    for window in windows:
+        t0 = time.perf_counter()
+        windowed = predict_scores_windowed(model, features, device, window=window, overlap=overlap,
+                                           batch_windows=batch_windows)
+        result = score_agreement(full, windowed, top_ratio)
+        result["sec"] = time.perf_counter() - t0
+        report["windows"][window] = result
+    return report
+
+def print_report(name, report):
+    print(f"\n📊 {name} ({report['frames']}프레임), 전체 시퀀스 {report['full_sec']:.2f}s")
+    for window, r in report["windows"].items():
+        print(f"  - 윈도우 {window}: {r['sec']:.2f}s, pearson {r['pearson']:.4f}, spearman {r['spearman']:.4f}, "
+              f"최대 차이 {r['max_abs_diff']:.4f} / 평균 {r['mean_abs_diff']:.4f}, 상위 프레임 일치 {r['top_overlap']:.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ckpt_path", default=None, help="PGL_SUM 체크포인트 (.pkl). 지정하지 않으면 임의 가중치")
+    parser.add_argument("--feature_h5s", nargs="+", default=None, help="비교할 특징 H5 파일 (지정하지 않으면 --length 길이의 임의 특징)")
+    parser.add_argument("--length", type=int, default=3600, help="임의 특징 길이 (프레임)")
+    parser.add_argument("--windows", type=int, nargs="+", default=[300, 600, 1200], help="비교할 윈도우 길이 (프레임)")
+    parser.add_argument("--overlap", type=int, default=60, help="윈도우끼리 겹치는 프레임 수")
+    parser.add_argument("--window_batch", type=int, default=8, help="한 번의 순전파로 묶을 윈도우 수")
+    parser.add_argument("--top_ratio", type=float, default=0.2, help="상위 프레임 일치 비율을 볼 상위 비율")
+    parser.add_argument("--attention_chunk", type=int, default=512, help="attention을 한 번에 계산할 행 수 (0이면 전체)")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--output_json", default=None, help="결과를 저장할 JSON 경로")
+    args = parser.parse_args()
+
+    if args.ckpt_path:
+        model = build_pgl_model(args.ckpt_path, args.device, args.attention_chunk)
+    else:
+        torch.manual_seed(0)
+        model = PGL_SUM(input_size=1024, output_size=1024, num_segments=4, heads=8, fusion="add",
+                        pos_enc="absolute").to(args.device).eval()
+        model.set_inference_attention(query_chunk=args.attention_chunk or None, return_weights=False)
+
+    if args.feature_h5s:
+        inputs = [(path, load_h5_features(path)) for path in args.feature_h5s]
+    else:
+        inputs = [("random", np.random.default_rng(0).standard_normal((args.length, 1024)).astype(np.float32))]
+
+    reports = {}
+    for name, features in inputs:
+        reports[name] = compare_scores(model, features, windows=args.windows, overlap=args.overlap,
+                                       batch_windows=args.window_batch, device=args.device, top_ratio=args.top_ratio)
+        print_report(name, reports[name])
+
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=4)
@@ -1,10 +1,14 @@
 import argparse, os, subprocess, json, subprocess
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
-from extract_features_module import extract_features_pipe
-from pgl_module import run_pgl_module
+from extract_features_module import (extract_features_pipe, default_pca_path, default_adapter_path,
+                                     rederive_scenes_json, FEATURE_BACKENDS, FEATURE_BACKBONES, SCENE_ENGINES)
+from pgl_module import run_pgl_module, DEFAULT_ATTENTION_CHUNK
+from feature_store import FEATURE_COMPRESSIONS, DEFAULT_COMPRESSION, has_transitions
+from interval_index import IntervalIndex
+from autotune import load_tune_profile, tuned_settings, apply_thread_settings
 from video_module import create_highlight_video
-from whisper_segmentor import process as whisper_process
+from whisper_segmentor import process as whisper_process, load_audio_pcm, ASR_BACKENDS
 from refine_selected_segments import refine_selected_segments
 from visualize_module import run_visualize_pipeline
 from frame_score_plotter import visualize_all_segments_frame_scores
@@ -12,7 +16,14 @@ from quality_score_calculator import run_evaluation
 
 def run_pipeline(video_path, ckpt_path, output_dir, device="cpu", fps=1.0,
                  alpha=0.7, std_weight=0.3, top_ratio=0.2,
-                 model_size="base", importance_weight=0.8, budget_time=None):
+                 model_size="base", importance_weight=0.8, budget_time=None,
+                 pca_mode="per_video", pca_path=None, feature_backend="eager", feature_threads=None,
+                 static_threshold=None, feature_dtype="float32", resume=True, checkpoint_seconds=60.0,
+                 feature_shards=1, scene_threshold=0.5, scene_engine="transnetv2",
+                 feature_backbone="inception_v3", adapter_path=None, feature_batch_size=None, tune_profile=None,
+                 whisper_vad_gated=False, whisper_workers=1, asr_backend="openai-whisper", asr_compute_type=None,
+                 feature_compression=DEFAULT_COMPRESSION, attention_chunk=DEFAULT_ATTENTION_CHUNK,
+                 score_window=None, window_overlap=60, window_batch=8, window_workers=1):
 
     os.makedirs(output_dir, exist_ok=True)
     base = os.path.splitext(os.path.basename(video_path))[0]
@@ -28,35 +39,62 @@ def run_pipeline(video_path, ckpt_path, output_dir, device="cpu", fps=1.0,
     selected_json  = os.path.join(output_dir, f"{base}_selected_segments.json")
     whisper_json   = os.path.join(output_dir, f"{base}_whisper_segments.json")
     refined_json   = os.path.join(output_dir, f"{base}_refined_segments.json")
-    audio_wav      = os.path.join(output_dir, f"{base}.wav")
     highlight_video= os.path.join(output_dir, f"highlight_{base}.mp4")
     visualize_png  = os.path.join(output_dir, f"{base}_w{importance_weight}.png")
 
+    # autotune.py로 만든 튜닝 프로필: 직접 지정하지 않은 batch_size / 스레드 수에만 적용
+    profile = load_tune_profile(tune_profile)
+    feature_tuned = tuned_settings(profile, "feature", device, backbone=feature_backbone, backend=feature_backend)
+    # PGL_SUM 스레드 수는 같은 attention 설정으로 잰 값만 사용
+    pgl_tuned = tuned_settings(profile, "pgl", device, attention_chunk=attention_chunk or 0)
+    if feature_tuned:
+        print(f"⚙️ 튜닝 프로필 적용: batch {feature_tuned['batch_size']}, 스레드 {feature_tuned['num_threads']} "
+              f"(inter-op {feature_tuned['interop_threads']})")
+        apply_thread_settings(interop_threads=feature_tuned["interop_threads"])
+    if feature_shards == 1:
+        # 프로필의 스레드 수는 단일 프로세스 기준으로 잰 값
+        feature_threads = feature_threads or feature_tuned.get("num_threads")
+    feature_batch_size = feature_batch_size or feature_tuned.get("batch_size", 32)
+
     # 1. 특징 추출
     if os.path.exists(h5_path) and os.path.exists(scene_json):
         print("\n🎬 [1/6] 특징 추출 - 기존 파일 발견, 스킵", flush=True)
+        # 장면 전환 기준만 바뀐 경우 저장된 TransNetV2 예측으로 장면 JSON만 다시 만듦
+        # (예측이 저장되지 않은 예전 파일이면 기존 장면 JSON을 그대로 사용)
+        if has_transitions(h5_path):
+            rederive_scenes_json(h5_path, scene_json, threshold=scene_threshold, only_if_changed=True)
     else:
         print("\n🎬 [1/6] 특징 추출", flush=True)
-        extract_features_pipe(video_path, h5_path, scene_json, device=device)
-
-    # 2. 오디오 추출
-    print("\n🔊 [2/6] Whisper용 오디오 추출", flush=True)
-    subprocess.run([
-        "ffmpeg", "-y", "-i", video_path,
-        "-vn", "-acodec", "pcm_s16le",
-        "-ar", "16000", "-ac", "1",
-        audio_wav
-    ], check=True)
+        extract_features_pipe(video_path, h5_path, scene_json, device=device,
+                              pca_mode=pca_mode, pca_path=pca_path or default_pca_path(ckpt_path),
+                              backend=feature_backend, num_threads=feature_threads,
+                              static_threshold=static_threshold, feature_dtype=feature_dtype,
+                              resumable=resume, checkpoint_seconds=checkpoint_seconds,
+                              num_shards=feature_shards, scene_threshold=scene_threshold,
+                              scene_engine=scene_engine, backbone=feature_backbone,
+                              adapter_path=adapter_path or default_adapter_path(ckpt_path, feature_backbone),
+                              batch_size=feature_batch_size, feature_compression=feature_compression)
+
+    # 2. 오디오 추출 (ffmpeg PCM을 메모리로 바로 읽어 VAD / 언어 감지 / 전사가 공유, 임시 wav 없음)
+    if os.path.exists(whisper_json):
+        print("\n🔊 [2/6] Whisper용 오디오 추출 - Whisper 결과 발견, 스킵", flush=True)
+        audio = None
+    else:
+        print("\n🔊 [2/6] Whisper용 오디오 추출", flush=True)
+        audio = load_audio_pcm(video_path)
 
     # 3. Whisper 세그먼트
-    if os.path.exists(whisper_json):
+    if audio is None:
         print("\n🧠 [3/6] Whisper 자막 기반 문장 세그먼트 생성 - 기존 파일 발견, 스킵", flush=True)
     else:
         print("\n🧠 [3/6] Whisper 자막 기반 문장 세그먼트 생성", flush=True)
-        whisper_process(audio_wav, scene_json, whisper_json, model_size=model_size)
+        whisper_process(audio, scene_json, whisper_json, model_size=model_size, vad_gated=whisper_vad_gated,
+                        num_workers=whisper_workers, backend=asr_backend, compute_type=asr_compute_type)
+        del audio
 
     # 4. 중요도 기반 세그먼트 선택
     print("\n🎯 [4/6] 중요도 기반 상위 세그먼트 선택 (PGL‑SUM)", flush=True)
+    apply_thread_settings(pgl_tuned.get("num_threads"))
     selected_segments = run_pgl_module(
         ckpt_path=ckpt_path,
         feature_h5=h5_path,
@@ -69,7 +107,12 @@ def run_pipeline(video_path, ckpt_path, output_dir, device="cpu", fps=1.0,
         std_weight=std_weight,
         top_ratio=top_ratio,
         importance_weight=importance_weight,
-        budget_time=budget_time
+        budget_time=budget_time,
+        attention_chunk=attention_chunk,
+        score_window=score_window,
+        window_overlap=window_overlap,
+        window_batch=window_batch,
+        window_workers=window_workers
     )
     with open(selected_json, "w", encoding="utf-8") as f:
         json.dump(selected_segments, f, indent=2, ensure_ascii=False)
@@ -120,13 +163,16 @@ def run_pipeline(video_path, ckpt_path, output_dir, device="cpu", fps=1.0,
 
             highlight_transcripts = []
             current_highlight_time = 0.0  
+            # 시작 시각으로 자막을 이분 탐색 (구간마다 전체 자막을 훑지 않음)
+            transcript_index = IntervalIndex.from_dicts(original_transcripts)
 
             for video_segment in selected_video_segments:
                 segment_original_start = video_segment["start_time"]
                 segment_original_end = video_segment["end_time"]
                 segment_duration_in_highlight = segment_original_end - segment_original_start 
 
-                for transcript_segment in original_transcripts:
+                for i in transcript_index.starting_in(segment_original_start, segment_original_end):
+                    transcript_segment = original_transcripts[i]
                     original_transcript_start = transcript_segment["start"]
                     original_transcript_end = transcript_segment["end"]
                     text = transcript_segment["text"]
@@ -344,6 +390,33 @@ if __name__ == "__main__":
     parser.add_argument("--importance_weight", default=0.1, type=float, help="중요도 가중치 (0.0 ~ 1.0) for knapsack selection 0에 가까울 수록 전반적인 요약")  
     parser.add_argument("--budget_time", type=float, default=None, help="요약에 사용할 총 예산 시간(초). 지정하지 않으면 전체 길이의 20% 사용")   
 
+    # 특징 차원 축소 관련 인자
+    parser.add_argument("--pca_mode", default="per_video", choices=["per_video", "fixed", "incremental"], help="PCA 방식 (fixed: 체크포인트 옆 고정 투영 사용)")
+    parser.add_argument("--pca_path", default=None, help="고정 PCA 투영(.npz) 경로. 지정하지 않으면 체크포인트와 같은 디렉토리의 inception_pca_1024.npz")
+    parser.add_argument("--feature_backend", default="eager", choices=FEATURE_BACKENDS, help="InceptionV3 추론 백엔드")
+    parser.add_argument("--feature_backbone", default="inception_v3", choices=list(FEATURE_BACKBONES), help="특징 추출 백본 (inception_v3 외에는 학습된 1024차원 어댑터 필요)")
+    parser.add_argument("--adapter_path", default=None, help="경량 백본용 어댑터(.pt) 경로. 지정하지 않으면 체크포인트와 같은 디렉토리의 feature_adapter_<backbone>.pt")
+    parser.add_argument("--feature_threads", type=int, default=None, help="특징 추출 intra-op 스레드 수 (--feature_shards > 1이면 샤드당 스레드 수)")
+    parser.add_argument("--feature_batch_size", type=int, default=None, help="특징 추출 batch size (지정하지 않으면 튜닝 프로필 값, 없으면 32)")
+    parser.add_argument("--tune_profile", default=None, help="autotune.py로 만든 튜닝 프로필 경로 (기본: VIDEOSUMMARY_TUNE_PROFILE 또는 캐시 디렉토리)")
+    parser.add_argument("--feature_dtype", default="float32", choices=["float32", "float16"], help="특징 저장 dtype")
+    parser.add_argument("--feature_compression", default=DEFAULT_COMPRESSION, choices=FEATURE_COMPRESSIONS, help="특징 H5 압축 (lzf: 빠름, gzip: 더 작음, none: 압축 안 함)")
+    parser.add_argument("--static_threshold", type=float, default=None, help="정지 프레임 판정 기준 (32x32 흑백 썸네일 평균 절대 차이, 0~255). 지정하면 중복 프레임의 추론을 건너뜀")
+    parser.add_argument("--checkpoint_seconds", type=float, default=60.0, help="특징 추출 체크포인트 커밋 간격 (영상 기준 초)")
+    parser.add_argument("--feature_shards", type=int, default=1, help="특징 추출을 시간축으로 나눠 병렬 실행할 프로세스 수 (1이면 단일 프로세스)")
+    parser.add_argument("--scene_threshold", type=float, default=0.5, help="TransNetV2 장면 전환 판정 기준 (0~1)")
+    parser.add_argument("--scene_engine", default="transnetv2", choices=SCENE_ENGINES, help="장면 전환 검출 엔진 (histogram: 신경망 없는 고속 검출기)")
+    parser.add_argument("--whisper_vad_gate", action="store_true", help="VAD 음성 구간만 Whisper로 전사 (음악 / 무음이 긴 영상에서 빠름)")
+    parser.add_argument("--whisper_workers", type=int, default=1, help="Whisper 병렬 전사 워커 프로세스 수 (워커마다 모델 1개, 1이면 순차 전사)")
+    parser.add_argument("--asr_backend", default="openai-whisper", choices=ASR_BACKENDS, help="전사 백엔드 (faster-whisper: CTranslate2, CPU int8)")
+    parser.add_argument("--asr_compute_type", default=None, help="faster-whisper compute_type (기본: CPU int8, GPU float16)")
+    parser.add_argument("--attention_chunk", type=int, default=DEFAULT_ATTENTION_CHUNK, help="PGL-SUM attention을 한 번에 계산할 프레임(행) 수 (0이면 전체 T x T 한 번에 계산, 메모리 많이 사용)")
+    parser.add_argument("--score_window", type=int, default=None, help="PGL-SUM 점수를 이 길이(프레임)의 겹치는 윈도우로 나눠 계산 (지정하지 않으면 전체 시퀀스 한 번에)")
+    parser.add_argument("--window_overlap", type=int, default=60, help="윈도우끼리 겹치는 프레임 수 (겹치는 구간 점수는 선형 가중 평균)")
+    parser.add_argument("--window_batch", type=int, default=8, help="한 번의 순전파로 묶을 윈도우 수")
+    parser.add_argument("--window_workers", type=int, default=1, help="윈도우 배치를 병렬로 계산할 워커 프로세스 수 (1이면 현재 프로세스)")
+    parser.add_argument("--no_resume", action="store_true", help="특징 추출 체크포인트(.partial)를 쓰지 않고 처음부터 추출")
+
     args = parser.parse_args()
 
     run_pipeline(
@@ -357,5 +430,30 @@ if __name__ == "__main__":
         top_ratio=args.top_ratio,
         model_size=args.model_size,
         importance_weight=args.importance_weight,
-        budget_time=args.budget_time
+        budget_time=args.budget_time,
+        pca_mode=args.pca_mode,
+        pca_path=args.pca_path,
+        feature_backend=args.feature_backend,
+        feature_threads=args.feature_threads,
+        static_threshold=args.static_threshold,
+        feature_dtype=args.feature_dtype,
+        feature_compression=args.feature_compression,
+        resume=not args.no_resume,
+        checkpoint_seconds=args.checkpoint_seconds,
+        feature_shards=args.feature_shards,
+        scene_threshold=args.scene_threshold,
+        scene_engine=args.scene_engine,
+        feature_backbone=args.feature_backbone,
+        adapter_path=args.adapter_path,
+        feature_batch_size=args.feature_batch_size,
+        tune_profile=args.tune_profile,
+        whisper_vad_gated=args.whisper_vad_gate,
+        whisper_workers=args.whisper_workers,
+        asr_backend=args.asr_backend,
+        asr_compute_type=args.asr_compute_type,
+        attention_chunk=args.attention_chunk,
+        score_window=args.score_window,
+        window_overlap=args.window_overlap,
+        window_batch=args.window_batch,
+        window_workers=args.window_workers
     )
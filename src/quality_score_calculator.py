@@ -20,25 +20,27 @@ def load_file(json_filename, stringify_segment_id=True):
 def get_segment_average_vectors(h5_filename, segments_metadata_list, verbose=True):
     """
     H5 파일에서 프레임 feature를 불러와 각 세그먼트별 평균 벡터를 계산합니다.
+    features 전체를 메모리에 올리지 않고 세그먼트 구간의 행만 읽습니다.
     """
-    features = None
     try:
         with h5py.File(h5_filename, 'r') as f:
             if 'features' not in f:
                 if verbose: print(f"Error: 'features' key not found in H5 file {h5_filename}")
                 return {}
-            features = f['features'][:]
+            features = f['features']
+            if features.size == 0:
+                if verbose: print(f"Error: Features loaded from {h5_filename} are empty or could not be loaded.")
+                return {}
+            return _average_segment_vectors(features, segments_metadata_list, verbose=verbose)
     except FileNotFoundError:
         if verbose: print(f"Error: H5 file not found at {h5_filename}")
         return {}
     except Exception as e:
         if verbose: print(f"Error loading H5 file {h5_filename}: {e}")
         return {}
-    
-    if features is None or features.size == 0:
-        if verbose: print(f"Error: Features loaded from {h5_filename} are empty or could not be loaded.")
-        return {}
-        
+
+def _average_segment_vectors(features, segments_metadata_list, verbose=True):
+    """features(h5py 데이터셋 또는 배열)에서 세그먼트별 평균 벡터를 계산합니다."""
     segment_avg_dict = {}
     for seg_meta in segments_metadata_list:
         seg_id = str(seg_meta['segment_id']) 
@@ -56,7 +58,7 @@ def get_segment_average_vectors(h5_filename, segments_metadata_list, verbose=Tru
             if verbose: print(f"Warning: start_frame ({start_frame}) > end_frame ({end_frame}) for segment ID '{seg_id}'. Skipping.")
             continue
 
-        seg_frames = features[start_frame : end_frame + 1]
+        seg_frames = np.asarray(features[start_frame : end_frame + 1], dtype=np.float32)
 
         if seg_frames.shape[0] == 0:
             if verbose: print(f"Warning: No frames selected for segment ID '{seg_id}' (start_frame: {start_frame}, end_frame: {end_frame}). Skipping.")
@@ -1,4 +1,5 @@
 import json
+from interval_index import IntervalIndex
 
 def load_json(path):
     """JSON 파일 로드."""
@@ -6,20 +7,18 @@ def load_json(path):
         return json.load(f)
 
 
-def find_covering_whisper(seg, whisper_segments, threshold=0.3):
-    """세그먼트와 겹치는 Whisper 문장 중 overlap >= threshold인 것만 반환."""
-    relevant = []
-    for w in whisper_segments:
-        overlap = min(w.get('end', 0), seg.get('end_time', 0)) - \
-                  max(w.get('start', 0), seg.get('start_time', 0))
-        if overlap >= threshold:
-            relevant.append(w)
-    return relevant
+def find_covering_whisper(seg, whisper_segments, threshold=0.3, index=None):
+    """세그먼트와 겹치는 Whisper 문장 중 overlap >= threshold인 것만 반환.
+    index: whisper_segments로 만든 IntervalIndex (여러 세그먼트에 재사용하면 이분 탐색으로 후보만 확인)"""
+    if index is None:
+        index = IntervalIndex.from_dicts(whisper_segments)
+    idx = index.query(seg.get('start_time', 0), seg.get('end_time', 0), min_overlap=threshold)
+    return [whisper_segments[i] for i in idx]
 
 
-def refine_boundaries(seg, whisper_segments, margin_before=0.2, margin_after=0.35):
+def refine_boundaries(seg, whisper_segments, margin_before=0.2, margin_after=0.35, index=None):
     """Whisper 문장을 기준으로 세그먼트 경계를 보정."""
-    relevant = find_covering_whisper(seg, whisper_segments)
+    relevant = find_covering_whisper(seg, whisper_segments, index=index)
     if not relevant:
         return seg
 
@@ -51,6 +50,7 @@ def refine_selected_segments(selected_json, whisper_json, output_json, min_durat
     """
     selected_segments = load_json(selected_json)
     whisper_segments = load_json(whisper_json)
+    whisper_index = IntervalIndex.from_dicts(whisper_segments)
 
     print(f"📌 선택된 세그먼트 개수 (원본): {len(selected_segments)}")
 
@@ -68,7 +68,7 @@ def refine_selected_segments(selected_json, whisper_json, output_json, min_durat
         duration_original = original_end - original_start
         total_duration_original += duration_original
 
-        refined_seg_after_boundaries = refine_boundaries(seg_data, whisper_segments)
+        refined_seg_after_boundaries = refine_boundaries(seg_data, whisper_segments, index=whisper_index)
 
         duration_after_boundaries = refined_seg_after_boundaries.get('end_time',0) - refined_seg_after_boundaries.get('start_time',0)
         total_duration_after_boundaries_refinement += duration_after_boundaries
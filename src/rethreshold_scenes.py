@@ -0,0 +1,14 @@
+import argparse
+
+from extract_features_module import rederive_scenes_json
+
+# 특징 파일(.h5)에 저장된 TransNetV2 프레임별 전환 확률로 장면 JSON만 다시 생성 (모델 재실행 없음)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--h5_path", required=True, help="extract_features_pipe가 만든 특징 파일 (.h5)")
+    parser.add_argument("--output_json", required=True, help="다시 만들 장면 구간 JSON 경로")
+    parser.add_argument("--threshold", type=float, default=0.5, help="장면 전환 판정 기준 (0~1)")
+    args = parser.parse_args()
+
+    ok = rederive_scenes_json(args.h5_path, args.output_json, threshold=args.threshold)
+    raise SystemExit(0 if ok else 1)
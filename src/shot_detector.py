@@ -0,0 +1,130 @@
+import warnings
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+class HistogramShotDetector:
+    """
+    색 히스토그램 + 프레임 차이 기반의 고전적 장면 전환 검출기 (신경망 없이 저해상도 uint8 NHWC 프레임만 사용)
+    TransNetV2Stream과 같은 push / take_predictions / finish 인터페이스로 프레임별 전환 점수(0~1)를 낸다.
+    - D[t]: 프레임 t와 t+1 사이 거리 = hist_weight * 채널별 히스토그램 L1 거리 + (1 - hist_weight) * 평균 픽셀 차이
+    - 점수 = D[t] / (D[t] + ref[t]), ref[t] = k * median(D[t-window:t]) + min_distance
+      즉 점수 > 0.5는 "직전 window 프레임 거리 중앙값의 k배 + min_distance보다 큼" (움직임이 많은 구간일수록 기준이 올라감)
+    - ±min_gap 프레임 안에서 가장 큰 D만 남기고 나머지 점수는 0 (한 전환이 여러 프레임으로 잡히지 않도록)
+    start_frame을 주면 체크포인트에서 이어서 계산: 이때 push는 max(0, start_frame - context) 프레임부터 시작
+    """
+
+    def __init__(self, total_frames=None, start_frame=0, bins=16, hist_weight=0.5, window=50, k=3.0,
+                 min_distance=0.08, min_gap=5):
+        self.total_frames = total_frames
+        self.start_frame = start_frame
+        self.bins = bins
+        self.hist_weight = hist_weight
+        self.window = window
+        self.k = k
+        self.min_distance = min_distance
+        self.min_gap = min_gap
+        # 점수 계산에 필요한 앞쪽 프레임 수 (중앙값 window + 비최대 억제 min_gap + 거리 계산용 1)
+        self.context = window + min_gap + 1
+        self._shift = 8 - int(np.log2(bins))
+        self._emit = start_frame
+        self._offset = max(0, start_frame - self.context)
+        self._dist = np.zeros(0, dtype=np.float32)
+        self._last = None
+        self._scores = []
+
+    def _frame_stats(self, frames):
+        # 채널별 bins개 구간 히스토그램(정규화)과 int16 픽셀을 한 번에 계산
+        n = len(frames)
+        q = (frames >> self._shift).reshape(n, -1, 3).astype(np.int64)
+        q += np.arange(3) * self.bins + np.arange(n)[:, None, None] * 3 * self.bins
+        hist = np.bincount(q.ravel(), minlength=n * 3 * self.bins).reshape(n, 3 * self.bins)
+        return (hist / (frames.shape[1] * frames.shape[2])).astype(np.float32), frames.astype(np.int16)
+
+    def push(self, frames):
+        if len(frames) == 0:
+            return
+        hist, pixels = self._frame_stats(frames)
+        if self._last is not None:
+            hist = np.concatenate([self._last[0][np.newaxis], hist])
+            pixels = np.concatenate([self._last[1][np.newaxis], pixels])
+        self._last = (hist[-1], pixels[-1])
+        if len(hist) < 2:
+            return
+        hist_dist = 0.5 * np.abs(np.diff(hist, axis=0)).sum(axis=1) / 3
+        pixel_dist = np.abs(np.diff(pixels, axis=0)).mean(axis=(1, 2, 3)) / 255
+        dist = self.hist_weight * hist_dist + (1 - self.hist_weight) * pixel_dist
+        self._dist = np.concatenate([self._dist, dist.astype(np.float32)])
+        # 뒤쪽 min_gap 프레임의 거리가 나와야 비최대 억제를 확정할 수 있음
+        self._emit_scores(self._offset + len(self._dist) - self.min_gap)
+
+    def _slice(self, start, stop):
+        # 전역 프레임 번호 [start, stop)의 거리. 아직 모르거나 영상 밖이면 NaN
+        out = np.full(stop - start, np.nan, dtype=np.float32)
+        lo = max(start, self._offset)
+        hi = min(stop, self._offset + len(self._dist))
+        if hi > lo:
+            out[lo - start:hi - start] = self._dist[lo - self._offset:hi - self._offset]
+        return out
+
+    def _emit_scores(self, stop):
+        n = stop - self._emit
+        if n <= 0:
+            return
+        g, w = self.min_gap, self.window
+        seg = self._slice(self._emit - w - g, stop + g)
+        dist = seg[w + g:w + g + n]
+        with warnings.catch_warnings():
+            # 영상 맨 앞은 이전 거리가 없어 중앙값이 NaN -> 0으로 취급
+            warnings.simplefilter("ignore", RuntimeWarning)
+            median = np.nanmedian(sliding_window_view(seg, w)[g:g + n], axis=1)
+        ref = self.k * np.nan_to_num(median) + self.min_distance
+        scores = dist / (dist + ref)
+        # ±min_gap 안에서 처음 나온 최대값만 남김
+        peak = np.nanargmax(np.nan_to_num(sliding_window_view(seg, 2 * g + 1)[w:w + n], nan=-1.0), axis=1) == g
+        self._scores.append(np.where(peak, scores, 0.0).astype(np.float32))
+        self._emit = stop
+
+        # 이후 계산에 필요 없는 앞부분 거리는 버림 (메모리 일정하게 유지)
+        drop = max(0, self._emit - w - g - self._offset)
+        self._dist = self._dist[drop:]
+        self._offset += drop
+
+    def take_predictions(self):
+        """지금까지 확정된 점수 중 아직 가져가지 않은 (single, all)을 반환 (두 값은 같음)"""
+        if not self._scores:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+        scores = np.concatenate(self._scores)
+        self._scores = []
+        return scores, scores
+
+    def finish(self):
+        """마지막 프레임(다음 프레임 없음, 거리 0)까지 점수를 확정하고 남은 (single, all)을 반환"""
+        if self._last is None:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+        self._dist = np.concatenate([self._dist, np.zeros(1, dtype=np.float32)])
+        self._emit_scores(self._offset + len(self._dist))
+        return self.take_predictions()
+
+def boundary_agreement(reference, candidate, tolerance=2):
+    """
+    기준(reference) 장면 전환 프레임과 후보(candidate)를 tolerance 프레임 이내에서 1:1로 짝지어
+    precision / recall / f1 계산 (양쪽 모두 정렬된 프레임 인덱스)
+    """
+    reference = np.sort(np.asarray(reference))
+    candidate = np.sort(np.asarray(candidate))
+    matched = 0
+    i = j = 0
+    while i < len(reference) and j < len(candidate):
+        if abs(int(reference[i]) - int(candidate[j])) <= tolerance:
+            matched += 1
+            i += 1
+            j += 1
+        elif candidate[j] < reference[i]:
+            j += 1
+        else:
+            i += 1
+    precision = matched / len(candidate) if len(candidate) else 1.0
+    recall = matched / len(reference) if len(reference) else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1, "matched": matched,
+            "reference": len(reference), "candidate": len(candidate)}
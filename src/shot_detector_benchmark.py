@@ -0,0 +1,76 @@
+import argparse
+import json
+import time
+
+from extract_features_module import _open_video_reader, _make_scene_stream, _threshold_scenes
+from shot_detector import boundary_agreement
+
+def benchmark_video(video_path, threshold=0.5, tolerance=2, chunk_size=256, engines=("transnetv2", "histogram")):
+    """
+    48x27로 한 번 디코딩한 프레임을 각 엔진에 똑같이 넣고 엔진별 처리 시간(디코딩 제외)과
+    실시간 대비 속도, 그리고 TransNetV2 기준 장면 전환 일치도(precision / recall / f1)를 계산
+    """
+    vr = _open_video_reader(video_path, (27, 48))
+    total_frames = len(vr)
+    duration = total_frames / vr.get_avg_fps()
+    streams = {engine: _make_scene_stream(engine, total_frames=total_frames) for engine in engines}
+    timings = {engine: 0.0 for engine in engines}
+
+    decode_time = 0.0
+    for start in range(0, total_frames, chunk_size):
+        t0 = time.perf_counter()
+        frames = vr.get_batch(list(range(start, min(start + chunk_size, total_frames)))).asnumpy()
+        decode_time += time.perf_counter() - t0
+        for engine, stream in streams.items():
+            t0 = time.perf_counter()
+            stream.push(frames)
+            timings[engine] += time.perf_counter() - t0
+
+    boundaries = {}
+    for engine, stream in streams.items():
+        t0 = time.perf_counter()
+        single_frame_predictions, _ = stream.finish()
+        timings[engine] += time.perf_counter() - t0
+        boundaries[engine] = _threshold_scenes(single_frame_predictions, threshold)
+
+    report = {"video": video_path, "frames": total_frames, "duration_sec": duration,
+              "decode_sec": decode_time, "engines": {}}
+    for engine in engines:
+        report["engines"][engine] = {
+            "sec": timings[engine],
+            "realtime_factor": duration / max(timings[engine], 1e-9),
+            "boundaries": len(boundaries[engine]),
+        }
+        if engine != "transnetv2" and "transnetv2" in boundaries:
+            report["engines"][engine]["agreement"] = boundary_agreement(
+                boundaries["transnetv2"], boundaries[engine], tolerance=tolerance)
+    return report
+
+def print_report(report):
+    print(f"\n📊 {report['video']} ({report['frames']} 프레임, {report['duration_sec']:.1f}s, "
+          f"48x27 디코딩 {report['decode_sec']:.2f}s)")
+    for engine, result in report["engines"].items():
+        line = (f"  - {engine}: {result['sec']:.2f}s (실시간 x{result['realtime_factor']:.1f}), "
+                f"장면 전환 {result['boundaries']}개")
+        if "agreement" in result:
+            a = result["agreement"]
+            line += f", TransNetV2 대비 P {a['precision']:.3f} / R {a['recall']:.3f} / F1 {a['f1']:.3f}"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video_paths", nargs="+", required=True, help="비교할 영상 목록")
+    parser.add_argument("--threshold", type=float, default=0.5, help="장면 전환 판정 기준 (두 엔진 공통)")
+    parser.add_argument("--tolerance", type=int, default=2, help="일치로 인정할 최대 프레임 차이")
+    parser.add_argument("--output_json", default=None, help="결과를 저장할 JSON 경로")
+    args = parser.parse_args()
+
+    reports = []
+    for video_path in args.video_paths:
+        report = benchmark_video(video_path, threshold=args.threshold, tolerance=args.tolerance)
+        print_report(report)
+        reports.append(report)
+
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=4)
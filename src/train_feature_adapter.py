@@ -0,0 +1,163 @@
+import argparse
+import csv
+import json
+import os
+import h5py
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from extract_features_module import load_backbone, extract_features, FEATURE_BACKBONES
+from fit_pca_projection import list_videos
+from networks.feature_adapter import FeatureAdapter
+
+# MrHiSumDataset과 같은 위치
+DATASET_H5 = "dataset/mr_hisum.h5"
+SPLIT_FILE = "dataset/mr_hisum_split.json"
+
+def load_video_map(video_dir, metadata_csv=None):
+    """
+    MrHiSum 키(video_1, ...) -> 영상 파일 경로
+    metadata_csv(video_id, youtube_id 열)가 있으면 <youtube_id>.mp4, 없으면 키와 같은 이름의 파일을 찾음
+    """
+    files = {os.path.splitext(os.path.basename(path))[0]: path for path in list_videos(video_dir)}
+    if metadata_csv is None:
+        return files
+    video_map = {}
+    with open(metadata_csv, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row["youtube_id"] in files:
+                video_map[row["video_id"]] = files[row["youtube_id"]]
+    return video_map
+
+def align_rows(features, num_rows):
+    """1fps 샘플 수가 데이터셋과 1~2행 다를 수 있으므로 num_rows에 맞춰 자르거나 마지막 행을 반복"""
+    if features.shape[0] >= num_rows:
+        return features[:num_rows]
+    pad = np.repeat(features[-1:], num_rows - features.shape[0], axis=0)
+    return np.concatenate([features, pad])
+
+def cache_backbone_features(keys, video_map, backbone, cache_dir, device="cpu"):
+    """영상별 백본 특징(1fps, 어댑터 적용 전)을 cache_dir/<backbone>/<key>.npy에 저장해 두고 {key: 경로} 반환"""
+    os.makedirs(os.path.join(cache_dir, backbone), exist_ok=True)
+    model = None
+    cached = {}
+    for i, key in enumerate(keys):
+        if key not in video_map:
+            continue
+        path = os.path.join(cache_dir, backbone, f"{key}.npy")
+        if not os.path.exists(path):
+            print(f"🎞️ [{i + 1}/{len(keys)}] {key}: {video_map[key]}", flush=True)
+            if model is None:
+                model = load_backbone(backbone, device)
+            try:
+                feats = extract_features(video_map[key], model, device,
+                                         decode_size=FEATURE_BACKBONES[backbone]["input_size"])
+            except Exception as e:
+                print(f"⚠️ 특징 추출 실패, 건너뜀: {e}")
+                continue
+            np.save(path, feats.astype(np.float32))
+        cached[key] = path
+    return cached
+
+def load_pairs(keys, cached, dataset_h5=DATASET_H5):
+    """(백본 특징, 데이터셋의 InceptionV3 + PCA 특징) 행 쌍"""
+    inputs, targets = [], []
+    with h5py.File(dataset_h5, "r") as hf:
+        for key in keys:
+            if key not in cached or f"{key}/features" not in hf:
+                continue
+            target = np.asarray(hf[f"{key}/features"], dtype=np.float32)
+            inputs.append(align_rows(np.load(cached[key]), target.shape[0]))
+            targets.append(target)
+    if not inputs:
+        raise ValueError("학습에 사용할 수 있는 영상이 없습니다. video_dir / metadata_csv를 확인하세요.")
+    return np.concatenate(inputs), np.concatenate(targets)
+
+def adapter_loss(pred, target):
+    """MSE + (1 - cosine): 크기와 방향을 함께 맞춤"""
+    return F.mse_loss(pred, target) + (1 - F.cosine_similarity(pred, target, dim=1)).mean()
+
+@torch.no_grad()
+def evaluate_adapter(adapter, inputs, targets, device="cpu", batch_rows=4096):
+    adapter.eval()
+    losses, cosines = [], []
+    for start in range(0, inputs.shape[0], batch_rows):
+        x = torch.from_numpy(inputs[start:start + batch_rows]).to(device)
+        y = torch.from_numpy(targets[start:start + batch_rows]).to(device)
+        pred = adapter(x)
+        losses.append(adapter_loss(pred, y).item() * x.shape[0])
+        cosines.append(F.cosine_similarity(pred, y, dim=1).sum().item())
+    return sum(losses) / inputs.shape[0], sum(cosines) / inputs.shape[0]
+
+def train_feature_adapter(backbone, video_dir, output_path, metadata_csv=None, cache_dir="dataset/backbone_cache",
+                          device="cpu", epochs=30, batch_rows=512, lr=1e-3, weight_decay=1e-4, seed=0):
+    """
+    MrHiSum train 영상의 백본 특징 -> 데이터셋 1024차원 특징 회귀로 FeatureAdapter 학습
+    val 영상 손실이 가장 낮은 epoch의 어댑터를 output_path에 저장 (extract_features_module.load_adapted_backbone 형식)
+    """
+    torch.manual_seed(seed)
+    rng = np.random.default_rng(seed)
+    with open(SPLIT_FILE, "r") as f:
+        split = json.load(f)
+    video_map = load_video_map(video_dir, metadata_csv)
+    cached = cache_backbone_features(split["train_keys"] + split["val_keys"], video_map, backbone, cache_dir, device)
+    x_train, y_train = load_pairs(split["train_keys"], cached)
+    x_val, y_val = load_pairs(split["val_keys"], cached)
+    print(f"📚 학습 {x_train.shape[0]}행 / 검증 {x_val.shape[0]}행 ({backbone}: {x_train.shape[1]} -> {y_train.shape[1]})")
+
+    adapter = FeatureAdapter(x_train.shape[1], out_size=y_train.shape[1]).to(device)
+    optimizer = torch.optim.AdamW(adapter.parameters(), lr=lr, weight_decay=weight_decay)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=epochs)
+
+    best_loss = float("inf")
+    for epoch in range(epochs):
+        adapter.train()
+        order = rng.permutation(x_train.shape[0])
+        train_losses = []
+        for start in range(0, len(order), batch_rows):
+            idx = order[start:start + batch_rows]
+            x = torch.from_numpy(x_train[idx]).to(device)
+            y = torch.from_numpy(y_train[idx]).to(device)
+            optimizer.zero_grad()
+            loss = adapter_loss(adapter(x), y)
+            loss.backward()
+            optimizer.step()
+            train_losses.append(loss.item())
+        scheduler.step()
+
+        val_loss, val_cosine = evaluate_adapter(adapter, x_val, y_val, device)
+        print(f"[Epoch {epoch}/{epochs}] train loss {np.mean(train_losses):.5f} | "
+              f"val loss {val_loss:.5f} | val cosine {val_cosine:.5f}")
+        if val_loss < best_loss:
+            best_loss = val_loss
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+            torch.save({
+                "backbone": backbone,
+                "in_size": x_train.shape[1],
+                "out_size": y_train.shape[1],
+                "state_dict": adapter.state_dict(),
+                "val_loss": val_loss,
+                "val_cosine": val_cosine,
+            }, output_path)
+
+    print(f"✅ 어댑터 저장 완료: {output_path} (best val loss {best_loss:.5f})")
+    return output_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backbone", default="mobilenet_v3_large",
+                        choices=[b for b in FEATURE_BACKBONES if b != "inception_v3"])
+    parser.add_argument("--video_dir", required=True, help="MrHiSum 원본 영상 디렉토리")
+    parser.add_argument("--metadata_csv", default=None, help="video_id, youtube_id 열이 있는 MrHiSum 메타데이터 CSV")
+    parser.add_argument("--output", required=True, help="저장할 어댑터 경로 (.pt)")
+    parser.add_argument("--cache_dir", default="dataset/backbone_cache", help="백본 특징 캐시 디렉토리")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--batch_rows", type=int, default=512)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    args = parser.parse_args()
+
+    train_feature_adapter(args.backbone, args.video_dir, args.output, metadata_csv=args.metadata_csv,
+                          cache_dir=args.cache_dir, device=args.device, epochs=args.epochs,
+                          batch_rows=args.batch_rows, lr=args.lr)
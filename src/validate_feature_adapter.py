@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+from types import SimpleNamespace
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+from model.mrhisum_dataset import MrHiSumDataset, BatchCollator
+from model.solver import Solver
+from networks.pgl_sum.pgl_sum import PGL_SUM
+from pgl_module import load_model_checkpoint
+from extract_features_module import load_adapted_backbone
+from train_feature_adapter import SPLIT_FILE, load_video_map, cache_backbone_features, align_rows
+
+class AdaptedMrHiSumDataset(MrHiSumDataset):
+    """
+    MrHiSumDataset에서 영상 목록을 keys로 제한하고, adapted가 있으면 features를 어댑터 특징으로 바꿔서 반환
+    (gtscore / change_points 등은 그대로 사용하므로 두 특징을 같은 기준으로 평가할 수 있음)
+    """
+
+    def __init__(self, mode, keys, adapted=None):
+        super().__init__(mode)
+        self.video_list = [key for key in self.video_list if key in keys]
+        self.adapted = adapted
+
+    def __getitem__(self, index):
+        d = super().__getitem__(index)
+        if d is None or self.adapted is None:
+            return d
+        features = align_rows(self.adapted[d['video_name']], d['features'].shape[0])
+        d['features'] = torch.from_numpy(features).float()
+        return d
+
+@torch.no_grad()
+def adapt_cached_features(adapter_path, cached, device="cpu"):
+    """캐시된 백본 특징에 어댑터를 적용한 1024차원 특징 {key: array}"""
+    adapter = load_adapted_backbone(adapter_path, device).adapter
+    return {key: adapter(torch.from_numpy(np.load(path)).to(device)).cpu().numpy() for key, path in cached.items()}
+
+def validate_feature_adapter(adapter_path, ckpt_path, video_dir, metadata_csv=None, mode="test",
+                             cache_dir="dataset/backbone_cache", device="cpu"):
+    """
+    같은 PGL_SUM 체크포인트로 (1) 데이터셋 InceptionV3 + PCA 특징, (2) 경량 백본 + 어댑터 특징을
+    Solver.evaluate로 평가해 F1 / mAP50 / mAP15와 그 차이를 반환
+    원본 영상이 있는 영상만 두 경우 모두에 사용
+    """
+    backbone = torch.load(adapter_path, map_location="cpu")["backbone"]
+    with open(SPLIT_FILE, "r") as f:
+        keys = json.load(f)[f"{mode}_keys"]
+    cached = cache_backbone_features(keys, load_video_map(video_dir, metadata_csv), backbone, cache_dir, device)
+    if not cached:
+        raise ValueError("평가에 사용할 수 있는 영상이 없습니다. video_dir / metadata_csv를 확인하세요.")
+    adapted = adapt_cached_features(adapter_path, cached, device)
+
+    solver = Solver(config=SimpleNamespace(device=torch.device(device)))
+    solver.model = PGL_SUM(input_size=1024, output_size=1024, num_segments=4, heads=8, fusion="add", pos_enc="absolute")
+    solver.model = load_model_checkpoint(solver.model, ckpt_path, device).to(device)
+
+    results = {"backbone": backbone, "num_videos": len(cached)}
+    for name, features in (("inception_pca", None), ("adapter", adapted)):
+        loader = DataLoader(AdaptedMrHiSumDataset(mode, set(cached), adapted=features),
+                            batch_size=1, shuffle=False, collate_fn=BatchCollator())
+        f1, map50, map15 = solver.evaluate(dataloader=loader)
+        results[name] = {"f1": float(f1), "map50": float(map50), "map15": float(map15)}
+    results["delta"] = {metric: results["adapter"][metric] - results["inception_pca"][metric]
+                        for metric in ("f1", "map50", "map15")}
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--adapter", required=True, help="train_feature_adapter.py로 학습한 어댑터 (.pt)")
+    parser.add_argument("--fine_ckpt", required=True, help="PGL_SUM 체크포인트 경로 (.pkl)")
+    parser.add_argument("--video_dir", required=True, help="MrHiSum 원본 영상 디렉토리")
+    parser.add_argument("--metadata_csv", default=None, help="video_id, youtube_id 열이 있는 MrHiSum 메타데이터 CSV")
+    parser.add_argument("--mode", default="test", choices=["val", "test"])
+    parser.add_argument("--cache_dir", default="dataset/backbone_cache")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--output_json", default=None, help="결과를 저장할 JSON 경로")
+    args = parser.parse_args()
+
+    results = validate_feature_adapter(args.adapter, args.fine_ckpt, args.video_dir, metadata_csv=args.metadata_csv,
+                                       mode=args.mode, cache_dir=args.cache_dir, device=args.device)
+    print("------------------------------------------------------")
+    print(f"   {args.mode.upper()} ({results['num_videos']}개 영상, 백본 {results['backbone']})")
+    for name in ("inception_pca", "adapter", "delta"):
+        r = results[name]
+        sign = "+" if name == "delta" else ""
+        print(f"   {name:<14} F-score {r['f1']:{sign}0.5f} | MAP50 {r['map50']:{sign}0.5f} | MAP15 {r['map15']:{sign}0.5f}")
+    print("------------------------------------------------------")
+    if args.output_json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output_json)), exist_ok=True)
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
@@ -1,27 +1,252 @@
+import multiprocessing
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
 import whisper
 import torchaudio
 import torch
 import json
 import numpy as np
+from interval_index import IntervalIndex
+from model_store import load_silero_vad, whisper_model, faster_whisper_model
 
-def check_overlap(whisper_start, whisper_end, vad_start, vad_end):
-    """두 시간 범위가 겹치는지 확인"""
-    return whisper_start < vad_end and whisper_end > vad_start
+SAMPLE_RATE = 16000
 
-def process(audio_path, scene_json_path, output_json_path, model_size="small", max_segment_gap_ms=500): # 최대 세그먼트 간격 추가
+# 전사 백엔드
+#  - "openai-whisper": openai-whisper (기본값)
+#  - "faster-whisper": CTranslate2 기반 faster-whisper (CPU에서는 int8 양자화, 별도 설치 필요)
+ASR_BACKENDS = ["openai-whisper", "faster-whisper"]
+
+class FasterWhisperASR:
+    """faster-whisper 모델을 openai-whisper 모델처럼 호출하기 위한 래퍼 (transcribe 결과를 같은 dict 형식으로 반환)"""
+
+    def __init__(self, model_size, device="cpu", compute_type=None, num_threads=0):
+        from faster_whisper import WhisperModel
+        self.compute_type = compute_type or ("int8" if device == "cpu" else "float16")
+        self.model = WhisperModel(faster_whisper_model(model_size), device=device,
+                                  compute_type=self.compute_type, cpu_threads=num_threads)
+
+    def transcribe(self, audio, language=None, word_timestamps=True):
+        segments, _ = self.model.transcribe(audio, language=language, word_timestamps=word_timestamps)
+        return {"segments": [{
+            "id": i,
+            "start": segment.start,
+            "end": segment.end,
+            "text": segment.text,
+            "words": [{"word": w.word, "start": w.start, "end": w.end} for w in segment.words or []],
+        } for i, segment in enumerate(segments)]}
+
+    def language_probs(self, audio):
+        _, _, all_language_probs = self.model.detect_language(audio)
+        return dict(all_language_probs)
+
+# 백엔드별 전사 모델 로드 (둘 다 model.transcribe(audio, language=..., word_timestamps=True)로 같은 형식의 결과를 냄)
+def load_asr_model(model_size, device="cpu", backend="openai-whisper", compute_type=None, num_threads=0):
+    if backend == "openai-whisper":
+        return whisper.load_model(whisper_model(model_size)).to(device)
+    if backend == "faster-whisper":
+        return FasterWhisperASR(model_size, device=device, compute_type=compute_type, num_threads=num_threads)
+    raise ValueError(f"지원하지 않는 ASR 백엔드입니다: {backend} (지원: {ASR_BACKENDS})")
+
+def group_words_into_sentences(words, max_segment_gap_ms=500):
+    """
+    시간순 단어 [{"text", "start", "end"}, ...]를 다음 단어와의 간격이 max_segment_gap_ms를 넘는 곳에서 끊어
+    문장 세그먼트 [{"start", "end", "text"}, ...]로 묶음 (간격 계산과 끊는 위치는 NumPy로 한 번에)
+    """
+    if not words:
+        return []
+    starts = np.array([w['start'] for w in words], dtype=np.float64)
+    ends = np.array([w['end'] for w in words], dtype=np.float64)
+    gaps_ms = (starts[1:] - ends[:-1]) * 1000
+    bounds = np.concatenate([[0], np.flatnonzero(gaps_ms > max_segment_gap_ms) + 1, [len(words)]])
+    return [{
+        "start": round(float(starts[a]), 2),
+        "end": round(float(ends[b - 1]), 2),
+        "text": " ".join(w['text'] for w in words[a:b]).strip()
+    } for a, b in zip(bounds[:-1], bounds[1:])]
+
+def load_audio_pcm(media_path, sample_rate=SAMPLE_RATE):
+    """
+    ffmpeg로 영상/오디오 파일을 mono 16-bit PCM으로 디코딩해 파이프로 바로 읽음 (임시 wav 없음)
+    반환값: [-1, 1] 범위의 float32 배열 (VAD / 언어 감지 / 전사가 같은 버퍼를 공유)
+    """
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-i", media_path,
+           "-vn", "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(sample_rate), "-"]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg 오디오 디코딩 실패: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+def merge_speech_ranges(vad_time_ranges, duration, pad=0.3, max_gap=1.0, pack_seconds=30.0):
+    """
+    VAD 음성 구간을 Whisper에 넘길 음성 chunk [(start, end), ...]로 병합 (초 단위)
+    - 각 구간 앞뒤로 pad초를 붙이고 [0, duration]으로 자름
+    - 간격이 max_gap 이하이거나, 합쳐도 pack_seconds(Whisper 한 번의 입력 창 30초) 이내면 하나로 합침
+      (Whisper는 짧은 입력도 30초로 채워 인코딩하므로 짧은 chunk를 여러 개 만들면 오히려 느려짐)
+    """
+    chunks = []
+    for start, end in sorted(vad_time_ranges):
+        start, end = max(0.0, start - pad), min(duration, end + pad)
+        if end <= start:
+            continue
+        if chunks and (start - chunks[-1][1] <= max_gap or end - chunks[-1][0] <= pack_seconds):
+            chunks[-1][1] = max(chunks[-1][1], end)
+        else:
+            chunks.append([start, end])
+    return [(start, end) for start, end in chunks]
+
+def split_at_silences(vad_time_ranges, duration, chunk_seconds=300.0, overlap=2.0):
+    """
+    병렬 전사용으로 전체 타임라인을 약 chunk_seconds 길이의 chunk로 나눔 (초 단위)
+    - 자르는 위치는 VAD 음성 구간 사이 무음의 가운데 (chunk_seconds를 넘긴 뒤 처음 나오는 무음)
+    - chunk_seconds * 1.5 안에 무음이 없으면 강제로 자름
+    - 각 chunk는 앞뒤로 overlap초를 더 전사하고, 자른 위치 [keep_start, keep_end] 안의 단어만 가짐
+    반환값: [(start, end, keep_start, keep_end), ...]
+    """
+    ranges = sorted(vad_time_ranges)
+    silences = [(a_end + b_start) / 2 for (_, a_end), (b_start, _) in zip(ranges, ranges[1:]) if b_start > a_end]
+    cuts = [0.0]
+    for point in silences + [duration]:
+        while point - cuts[-1] > chunk_seconds * 1.5:
+            cuts.append(cuts[-1] + chunk_seconds)
+        if point - cuts[-1] >= chunk_seconds and point < duration:
+            cuts.append(point)
+    if duration > cuts[-1]:
+        cuts.append(duration)
+    return [(max(0.0, a - overlap), min(duration, b + overlap), a, b) for a, b in zip(cuts, cuts[1:])]
+
+def _shift_result(result, offset):
+    # chunk 기준 시간을 원래 오디오 기준 시간으로
+    for segment in result.get('segments', []):
+        segment['start'] += offset
+        segment['end'] += offset
+        for word_info in segment.get('words') or []:
+            word_info['start'] += offset
+            word_info['end'] += offset
+    return result
+
+def _owns(start, end, keep_start, keep_end):
+    return keep_start <= (start + end) / 2 <= keep_end
+
+def _repeats_tail(word_info, tail):
+    # 이전 chunk 끝부분에 같은 단어가 (시작 0.5초 이내로) 이미 있는지
+    text = word_info['word'].strip()
+    return any(text == prev['word'].strip() and abs(word_info['start'] - prev['start']) < 0.5 for prev in tail)
+
+def stitch_chunk_results(results, chunks):
+    """
+    chunk별 전사 결과(원래 시간 기준)를 하나의 결과로 합침
+    - overlap 구간의 단어는 중심 시각이 [keep_start, keep_end] 안에 있는 chunk의 것만 사용
+    - 경계에 걸친 같은 단어가 양쪽에서 모두 남으면 (같은 텍스트, 시작 0.5초 이내) 하나만 남김
+      이전 chunk의 overlap 범위(keep_end ± overlap) 안의 단어끼리만 비교하므로 chunk 안에서 실제로 반복된 단어는 그대로 둠
+    반환값은 model.transcribe 결과와 같은 형식 ({"text", "segments"})
+    """
+    segments = []
+    prev_tail, prev_limit = [], None
+    for result, (_, end, keep_start, keep_end) in zip(results, chunks):
+        margin = end - keep_end  # 이 chunk가 keep_end 뒤로 더 전사한 길이 (overlap이 없으면 0)
+        chunk_words = []
+        for segment in result.get('segments', []):
+            words = segment.get('words')
+            if not words:
+                if _owns(segment['start'], segment['end'], keep_start, keep_end):
+                    segment['id'] = len(segments)
+                    segments.append(segment)
+                continue
+            owned = []
+            for word_info in words:
+                if not _owns(word_info['start'], word_info['end'], keep_start, keep_end):
+                    continue
+                if prev_limit is not None and word_info['start'] < prev_limit and _repeats_tail(word_info, prev_tail):
+                    continue
+                owned.append(word_info)
+            chunk_words.extend(owned)
+            if not owned:
+                continue
+            if len(owned) < len(words):
+                segment['words'] = owned
+                segment['start'], segment['end'] = owned[0]['start'], owned[-1]['end']
+                segment['text'] = "".join(word_info['word'] for word_info in owned)
+            segment['id'] = len(segments)
+            segments.append(segment)
+        if margin > 0:
+            prev_tail = [w for w in chunk_words if w['end'] > keep_end - margin]
+            prev_limit = keep_end + margin
+        else:
+            prev_tail, prev_limit = [], None
+    return {"text": "".join(segment['text'] for segment in segments), "segments": segments}
+
+# 병렬 전사 워커 프로세스: 각자 Whisper 모델을 하나씩 들고 제한된 스레드로 실행
+_worker_model = None
+
+def _init_whisper_worker(model_size, device, num_threads, backend="openai-whisper", compute_type=None):
+    global _worker_model
+    torch.set_num_threads(num_threads)
+    _worker_model = load_asr_model(model_size, device, backend=backend, compute_type=compute_type,
+                                   num_threads=num_threads)
+
+def _transcribe_piece(piece, language):
+    return _worker_model.transcribe(piece, language=language, word_timestamps=True)
+
+def _detect_language_piece(piece, device):
+    return detect_language(_worker_model, piece, device)
+
+def transcribe_chunks(audio, chunks, language=None, model=None, executor=None):
+    """
+    audio(16kHz float32)의 chunks [(start, end, keep_start, keep_end), ...] 구간만 전사하고 원래 시간 기준으로 합침
+    executor(_init_whisper_worker로 초기화한 프로세스 풀)가 있으면 chunk를 병렬로, 없으면 model로 순서대로 전사
+    """
+    pieces = [audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)] for start, end, *_ in chunks]
+    if executor is not None:
+        futures = [executor.submit(_transcribe_piece, piece, language) for piece in pieces]
+    results = []
+    for i, (start, end, *_) in enumerate(chunks):
+        if executor is not None:
+            result = futures[i].result()
+        else:
+            result = model.transcribe(pieces[i], language=language, word_timestamps=True)
+        print(f"Whisper 구간 전사 [{i + 1}/{len(chunks)}] {start:.1f}s ~ {end:.1f}s", flush=True)
+        results.append(_shift_result(result, start))
+    return stitch_chunk_results(results, chunks)
+
+def detect_language(model, audio, device):
+    """audio 앞 30초로 언어 감지. ko / en이 아니거나 실패하면 None (Whisper 자동 감지)"""
+    try:
+        if isinstance(model, FasterWhisperASR):
+            probs = model.language_probs(whisper.pad_or_trim(audio))
+        else:
+            mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio)).to(device)
+            _, probs = model.detect_language(mel)
+        detected_lang = max(probs, key=probs.get)
+        print(f"감지된 언어: {detected_lang} (신뢰도: {probs[detected_lang]:.2f})")
+        if detected_lang not in ["ko", "en"]:
+            print(f"지원하지 않는 언어({detected_lang}) 감지. 기본 언어(None) 사용.")
+            detected_lang = None # 
+    except Exception as e:
+        print(f"경고: 언어 감지 중 오류 발생 - {e}. 기본 언어 사용.")
+        detected_lang = None
+    return detected_lang
+
+# audio: 영상/오디오 파일 경로 또는 load_audio_pcm으로 디코딩한 16kHz float32 배열 (한 번만 디코딩해 모두 공유)
+# vad_gated=True면 전체 오디오 대신 VAD 음성 구간(merge_speech_ranges)만 Whisper로 전사
+# (음악 / B-roll / 무음이 긴 영상일수록 비음성 비율만큼 전사 시간이 줄어듦)
+# num_workers > 1이면 chunk(vad_gated가 아니면 split_at_silences로 VAD 무음에서 나눈 chunk_seconds 단위)를
+# 워커 프로세스마다 모델을 하나씩 두고 병렬로 전사 (워커당 스레드 수 = 코어 수 / num_workers)
+# backend: ASR_BACKENDS 중 하나 (faster-whisper의 compute_type 기본값은 CPU int8, GPU float16)
+def process(audio, scene_json_path, output_json_path, model_size="small", max_segment_gap_ms=500, # 최대 세그먼트 간격 추가
+            vad_gated=False, speech_pad=0.3, speech_max_gap=1.0, num_workers=1, chunk_seconds=300.0,
+            chunk_overlap=2.0, backend="openai-whisper", compute_type=None):
     device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"디바이스: {device} (Silero VAD + Whisper {model_size})")
+    print(f"디바이스: {device} (Silero VAD + Whisper {model_size}, {backend})")
 
     try:
-        vad_model, utils = torch.hub.load(
-            repo_or_dir='snakers4/silero-vad',
-            model='silero_vad',
-            trust_repo=True
-        )
+        vad_model, utils = load_silero_vad()
         vad_model.to(device)
-        get_speech_timestamps, _, read_audio, *_ = utils
-        audio_tensor = read_audio(audio_path, sampling_rate=16000)
-        audio_tensor = audio_tensor.to(device)
+        get_speech_timestamps, *_ = utils
+        if isinstance(audio, str):
+            audio = load_audio_pcm(audio)
+        audio_tensor = torch.from_numpy(audio).to(device)
     except Exception as e:
         print(f"오류: Silero VAD 모델 로드 또는 오디오 처리 중 문제 발생 - {e}")
         with open(output_json_path, 'w', encoding='utf-8') as f:
@@ -41,6 +266,16 @@ def process(audio_path, scene_json_path, output_json_path, model_size="small", m
         print(f"VAD 감지된 음성 구간 수: {len(vad_time_ranges)}")
         if not vad_time_ranges:
             print("경고: VAD가 음성 구간을 감지하지 못했습니다.")
+        duration = len(audio) / SAMPLE_RATE
+        chunks = None
+        if vad_gated:
+            chunks = [(start, end, start, end) for start, end in
+                      merge_speech_ranges(vad_time_ranges, duration, pad=speech_pad, max_gap=speech_max_gap)]
+            speech_seconds = sum(end - start for start, end, *_ in chunks)
+            print(f"전사할 음성 chunk 수: {len(chunks)} ({speech_seconds:.1f}s / 전체 {duration:.1f}s)")
+        elif num_workers > 1:
+            chunks = split_at_silences(vad_time_ranges, duration, chunk_seconds=chunk_seconds, overlap=chunk_overlap)
+            print(f"병렬 전사 chunk 수: {len(chunks)} (워커 {num_workers}개)")
 
     except Exception as e:
         print(f"오류: Silero VAD 실행 중 문제 발생 - {e}")
@@ -48,34 +283,41 @@ def process(audio_path, scene_json_path, output_json_path, model_size="small", m
             json.dump([], f)
         return
 
-    # Whisper 모델 로드
+    # Whisper 모델 로드 (병렬 전사면 워커마다 하나씩)
+    model, executor = None, None
     try:
-        model = whisper.load_model(model_size).to(device)
+        if chunks is not None and num_workers > 1:
+            threads = max(1, (os.cpu_count() or 1) // num_workers)
+            executor = ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn"),
+                                           initializer=_init_whisper_worker,
+                                           initargs=(model_size, device, threads, backend, compute_type))
+        else:
+            model = load_asr_model(model_size, device, backend=backend, compute_type=compute_type)
     except Exception as e:
         print(f"오류: Whisper 모델 로드 중 문제 발생 ({model_size}) - {e}")
         with open(output_json_path, 'w', encoding='utf-8') as f:
             json.dump([], f)
         return
 
-    detected_lang = None
-    if model_size != "tiny":
-        try:
-            audio_for_detect = whisper.load_audio(audio_path)
+    try:
+        detected_lang = None
+        if model_size != "tiny":
+            # vad_gated면 앞부분이 음악 / 무음이어도 실제 음성으로 언어 감지
+            audio_for_detect = audio
+            if vad_gated and chunks:
+                start, end, *_ = chunks[0]
+                audio_for_detect = audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
             audio_for_detect = whisper.pad_or_trim(audio_for_detect)
-            mel = whisper.log_mel_spectrogram(audio_for_detect).to(device)
-            _, probs = model.detect_language(mel)
-            detected_lang = max(probs, key=probs.get)
-            print(f"감지된 언어: {detected_lang} (신뢰도: {probs[detected_lang]:.2f})")
-            if detected_lang not in ["ko", "en"]:
-                print(f"지원하지 않는 언어({detected_lang}) 감지. 기본 언어(None) 사용.")
-                detected_lang = None # 
-        except Exception as e:
-            print(f"경고: 언어 감지 중 오류 발생 - {e}. 기본 언어 사용.")
-            detected_lang = None
+            if executor is not None:
+                detected_lang = executor.submit(_detect_language_piece, audio_for_detect, device).result()
+            else:
+                detected_lang = detect_language(model, audio_for_detect, device)
 
-    try:
         print("Whisper 전사 시작...")
-        result = model.transcribe(audio_path, language=detected_lang, word_timestamps=True)
+        if chunks is not None:
+            result = transcribe_chunks(audio, chunks, language=detected_lang, model=model, executor=executor)
+        else:
+            result = model.transcribe(audio, language=detected_lang, word_timestamps=True)
         print("Whisper 전사 완료.")
 
     except Exception as e:
@@ -83,6 +325,9 @@ def process(audio_path, scene_json_path, output_json_path, model_size="small", m
         with open(output_json_path, 'w', encoding='utf-8') as f:
             json.dump([], f)
         return
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
     # VAD 결과와 단어 타임스탬프 결합
     valid_words = []
@@ -91,25 +336,25 @@ def process(audio_path, scene_json_path, output_json_path, model_size="small", m
     else:
         print(f"Whisper 추출 세그먼트 수: {len(result['segments'])}")
         total_word_count = 0
+        words = []
         for segment in result['segments']:
             if 'words' in segment and isinstance(segment['words'], list):
                 total_word_count += len(segment['words'])
                 for word_info in segment['words']:
                     if all(k in word_info for k in ['start', 'end', 'word']):
-                        w_start, w_end = word_info['start'], word_info['end']
-                        # 단어가 VAD 구간과 겹치는지 확인
-                        for v_start, v_end in vad_time_ranges:
-                            if check_overlap(w_start, w_end, v_start, v_end):
-                                valid_words.append({
-                                    "text": word_info['word'].strip(),
-                                    "start": w_start,
-                                    "end": w_end
-                                })
-                                break 
+                        words.append({
+                            "text": word_info['word'].strip(),
+                            "start": word_info['start'],
+                            "end": word_info['end']
+                        })
                     else:
                         print(f"경고: 유효하지 않은 단어 정보 발견: {word_info}")
             else:
                  print(f"경고: 세그먼트에 'words' 정보가 없거나 유효하지 않음: {segment.get('id', 'ID 없음')}")
+        # 단어가 VAD 구간과 겹치는지 확인 (start < VAD 끝 and end > VAD 시작, 모든 단어를 한 번에 이분 탐색)
+        vad_index = IntervalIndex([v[0] for v in vad_time_ranges], [v[1] for v in vad_time_ranges])
+        keep = vad_index.any_overlap([w['start'] for w in words], [w['end'] for w in words])
+        valid_words = [word for word, valid in zip(words, keep) if valid]
         print(f"Whisper 추출 총 단어 수: {total_word_count}")
         print(f"VAD 필터링 후 유효 단어 수: {len(valid_words)}")
 
@@ -129,30 +374,7 @@ def process(audio_path, scene_json_path, output_json_path, model_size="small", m
         print(f"Whisper (Fallback) 자막 세그먼트 저장 완료: {output_json_path}")
         return 
 
-    final_segments = []
-    if valid_words:
-        current_segment_words = []
-        current_segment_start = valid_words[0]['start']
-
-        for i, word in enumerate(valid_words):
-            current_segment_words.append(word['text'])
-
-            is_last_word = (i == len(valid_words) - 1)
-            gap_to_next = 0
-            if not is_last_word:
-                gap_to_next = valid_words[i+1]['start'] - word['end']
-
-            if is_last_word or gap_to_next * 1000 > max_segment_gap_ms:
-                segment_text = " ".join(current_segment_words)
-                segment_end = word['end'] # 현재 단어의 끝 시간
-                final_segments.append({
-                    "start": round(current_segment_start, 2), 
-                    "end": round(segment_end, 2),   
-                    "text": segment_text.strip()
-                })
-                if not is_last_word:
-                    current_segment_words = []
-                    current_segment_start = valid_words[i+1]['start']
+    final_segments = group_words_into_sentences(valid_words, max_segment_gap_ms)
 
     # 최종 결과 JSON 저장
     with open(output_json_path, 'w', encoding='utf-8') as f:
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# src/의 모듈은 패키지가 아니라 평평한 스크립트 모음이라 경로로 import
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
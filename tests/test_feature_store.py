@@ -0,0 +1,33 @@
+import h5py
+import numpy as np
+import pytest
+
+from feature_store import FEATURES_KEY, FeatureStoreWriter, has_transitions, load_features, save_transitions
+
+@pytest.mark.parametrize("compression", ["lzf", "gzip", "none"])
+def test_writer_round_trip_with_compression(tmp_path, compression):
+    path = str(tmp_path / "features.h5")
+    rows = np.random.default_rng(0).standard_normal((600, 16)).astype(np.float32)
+    with FeatureStoreWriter(path, chunk_rows=128, compression=compression) as writer:
+        for start in range(0, len(rows), 100):
+            writer.append(rows[start:start + 100])
+
+    with h5py.File(path, "r") as hf:
+        assert hf[FEATURES_KEY].compression == (None if compression == "none" else compression)
+    np.testing.assert_array_equal(load_features(path), rows)
+    np.testing.assert_array_equal(load_features(path, start=250, stop=390), rows[250:390])
+
+def test_store_is_compressed_by_default(tmp_path):
+    path = str(tmp_path / "features.h5")
+    with FeatureStoreWriter(path) as writer:
+        writer.append(np.zeros((10, 4), dtype=np.float32))
+    with h5py.File(path, "r") as hf:
+        assert hf[FEATURES_KEY].compression is not None
+
+def test_has_transitions_only_after_saving_predictions(tmp_path):
+    path = str(tmp_path / "features.h5")
+    with FeatureStoreWriter(path) as writer:
+        writer.append(np.zeros((10, 4), dtype=np.float32))
+    assert not has_transitions(path)
+    save_transitions(path, np.zeros(30, dtype=np.float32), np.zeros(30, dtype=np.float32), 30.0, threshold=0.5)
+    assert has_transitions(path)
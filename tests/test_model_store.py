@@ -0,0 +1,51 @@
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+import model_store
+
+def _fake_transnetv2_package(tmp_path):
+    # transnetv2 패키지와 같은 구조: transnetv2/__init__.py + transnetv2-weights/ (SavedModel)
+    package = tmp_path / "site" / "transnetv2"
+    weights = package / "transnetv2-weights"
+    (weights / "variables").mkdir(parents=True)
+    (package / "__init__.py").write_text("")
+    (weights / "saved_model.pb").write_bytes(b"graph")
+    (weights / "variables" / "variables.index").write_bytes(b"index")
+    (weights / "variables" / "variables.data-00000-of-00001").write_bytes(b"data" * 1000)
+    return str(tmp_path / "site")
+
+def test_populate_then_resolve_transnetv2(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(_fake_transnetv2_package(tmp_path))
+    importlib.invalidate_caches()
+    sys.modules.pop("transnetv2", None)
+    root = str(tmp_path / "store")
+
+    manifest = model_store.populate(root, whisper_sizes=(), torchvision_names=(), silero_vad=False, transnetv2=True)
+
+    path = model_store.resolve("transnetv2", root)
+    assert path == os.path.join(root, "transnetv2")
+    assert os.path.isfile(os.path.join(path, "saved_model.pb"))
+    assert os.path.isfile(os.path.join(path, "variables", "variables.index"))
+    entry = manifest["models"]["transnetv2"]
+    assert entry["sha256"] == model_store.file_sha256(path)
+    with open(os.path.join(root, model_store.MANIFEST_FILE), encoding="utf-8") as f:
+        assert json.load(f)["models"]["transnetv2"]["sha256"] == entry["sha256"]
+
+    monkeypatch.setenv("VIDEOSUMMARY_MODEL_STORE", root)
+    assert model_store.transnetv2_model_dir() == path
+
+def test_resolve_detects_changed_transnetv2_weights(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(_fake_transnetv2_package(tmp_path))
+    importlib.invalidate_caches()
+    root = str(tmp_path / "store")
+    model_store.populate(root, whisper_sizes=(), torchvision_names=(), silero_vad=False, transnetv2=True)
+
+    model_store._verified_in_process.clear()
+    with open(os.path.join(root, "transnetv2", "saved_model.pb"), "wb") as f:
+        f.write(b"tampered")
+    with pytest.raises(RuntimeError):
+        model_store.resolve("transnetv2", root)
@@ -0,0 +1,34 @@
+import pytest
+import torch
+
+from networks.pgl_sum.pgl_sum import PGL_SUM
+
+def _pair(fusion):
+    torch.manual_seed(0)
+    loop = PGL_SUM(input_size=64, output_size=64, num_segments=4, heads=2, fusion=fusion, pos_enc="absolute",
+                   batched_local=False).eval()
+    batched = PGL_SUM(input_size=64, output_size=64, num_segments=4, heads=2, fusion=fusion, pos_enc="absolute").eval()
+    batched.load_state_dict(loop.state_dict(), strict=True)
+    return loop, batched
+
+@pytest.mark.parametrize("fusion", ["add", "mult", "avg"])
+@pytest.mark.parametrize("length", [10, 40, 123])
+def test_batched_local_matches_segment_loop(fusion, length):
+    loop, batched = _pair(fusion)
+    x = torch.randn(2, length, 64)
+    mask = torch.ones(2, length, dtype=torch.bool)
+    mask[1, length - length // 4:] = False
+    with torch.no_grad():
+        for bs in (1, 2):
+            expected, _ = loop(x[:bs], mask[:bs])
+            scores, _ = batched(x[:bs], mask[:bs])
+            torch.testing.assert_close(scores, expected, rtol=0, atol=1e-5)
+
+def test_stacked_weights_load_back_into_segment_modules():
+    loop, batched = _pair("add")
+    restored = PGL_SUM(input_size=64, output_size=64, num_segments=4, heads=2, fusion="add", pos_enc="absolute",
+                       batched_local=False).eval()
+    restored.load_state_dict(batched.state_dict(), strict=True)
+    x = torch.randn(1, 50, 64)
+    with torch.no_grad():
+        torch.testing.assert_close(restored(x)[0], loop(x)[0], rtol=0, atol=0)
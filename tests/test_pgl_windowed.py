@@ -0,0 +1,24 @@
+import numpy as np
+import torch
+
+from networks.pgl_sum.pgl_sum import PGL_SUM
+from pgl_module import predict_scores_windowed, score_windows
+
+def _model():
+    torch.manual_seed(0)
+    model = PGL_SUM(input_size=1024, output_size=1024, num_segments=4, heads=8, fusion="add", pos_enc="absolute").eval()
+    return model.set_inference_attention(query_chunk=512, return_weights=False)
+
+def test_batched_and_unbatched_windowed_scores_match():
+    # window=20 -> 세그먼트 크기 5: batch 8을 요청해도 결과가 batch 1과 같아야 함
+    model = _model()
+    features = np.random.default_rng(0).standard_normal((200, 1024)).astype(np.float32)
+    single = predict_scores_windowed(model, features, window=20, overlap=4, batch_windows=1)
+    batched = predict_scores_windowed(model, features, window=20, overlap=4, batch_windows=8)
+    # batch 구성이 바뀌어 생기는 matmul 반올림 차이만 허용 (배치 축 정규화가 섞이면 ~1e-2)
+    np.testing.assert_allclose(batched, single, rtol=0, atol=1e-6)
+
+def test_score_windows_cover_sequence_with_equal_lengths():
+    windows = score_windows(1000, 300, 50)
+    assert windows[0][0] == 0 and windows[-1][1] == 1000
+    assert {stop - start for start, stop in windows} == {300}
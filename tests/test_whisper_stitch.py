@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("whisper")
+pytest.importorskip("torchaudio")
+from whisper_segmentor import stitch_chunk_results
+
+def _result(words):
+    # [(단어, 시작, 끝), ...] -> 단어마다 세그먼트 하나인 transcribe 결과
+    return {"segments": [{"start": s, "end": e, "text": w, "words": [{"word": w, "start": s, "end": e}]}
+                         for w, s, e in words]}
+
+def _texts(result):
+    return [(w['word'], w['start']) for segment in result['segments'] for w in segment['words']]
+
+def test_repeated_word_inside_one_chunk_is_kept():
+    chunks = [(0.0, 12.0, 0.0, 10.0), (8.0, 20.0, 10.0, 20.0)]
+    results = [_result([(" no", 3.0, 3.2), (" no", 3.3, 3.5), (" yes", 9.0, 9.3)]),
+               _result([(" yes", 9.0, 9.3), (" okay", 15.0, 15.4), (" okay", 15.3, 15.6)])]
+    stitched = stitch_chunk_results(results, chunks)
+    assert _texts(stitched) == [(" no", 3.0), (" no", 3.3), (" yes", 9.0), (" okay", 15.0), (" okay", 15.3)]
+
+def test_boundary_word_transcribed_by_both_chunks_is_kept_once():
+    # 경계(10초)에 걸친 단어를 두 chunk가 조금 다른 시각으로 전사 -> 중심 시각으로 둘 다 자기 것이 되는 경우
+    chunks = [(0.0, 12.0, 0.0, 10.0), (8.0, 20.0, 10.0, 20.0)]
+    results = [_result([(" hello", 9.7, 10.2)]), _result([(" hello", 9.9, 10.4), (" world", 10.5, 10.9)])]
+    stitched = stitch_chunk_results(results, chunks)
+    assert _texts(stitched) == [(" hello", 9.7), (" world", 10.5)]
+
+def test_vad_gated_chunks_without_overlap_keep_repeats():
+    # VAD 게이트 경로: keep 범위가 chunk 전체라 overlap이 없음
+    chunks = [(0.0, 5.0, 0.0, 5.0), (5.0, 9.0, 5.0, 9.0)]
+    results = [_result([(" no", 4.6, 4.9)]), _result([(" no", 5.0, 5.3)])]
+    assert _texts(stitch_chunk_results(results, chunks)) == [(" no", 4.6), (" no", 5.0)]